@@ -0,0 +1,68 @@
+"""
+Compares the latency and response size of the HTML task and category pages with their
+JSON API counterparts, calling the ASGI app directly so that only the application work
+is measured.
+
+Usage:
+    python -m benchmarks.api_vs_html --username some_user --requests 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.asgi import call, response_status, body_chunks
+from concerns.authentication import create_access_token
+from main import app
+from models.connection import async_engine
+
+PAIRS = (
+    ("tasks", "/tasks/page", "/api/v1/tasks"),
+    ("categories", "/categories/", "/api/v1/categories"),
+)
+
+
+async def get(path: str, token: str, query_string: bytes = b"") -> tuple[int, int]:
+    """
+    Sends a GET request straight to the ASGI app and returns the response status and the
+    size of its body.
+    """
+    messages = await call(app, path, query_string=query_string, headers=[
+        (b"authorization", f"Bearer {token}".encode()), (b"cookie", f"access_token={token}".encode())
+    ])
+    return response_status(messages), sum(len(chunk) for chunk in body_chunks(messages))
+
+
+async def measure(path: str, token: str, requests: int, query_string: bytes) -> tuple[list[float], int]:
+    durations, size = [], 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        status, size = await get(path, token, query_string)
+        durations.append(time.perf_counter() - start)
+        if status != 200:
+            raise SystemExit(f"{path} answered {status}")
+    return durations, size
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    token = create_access_token(data={"sub": args.username})
+    # Both task endpoints list the first page, the HTML one needs an explicit cursor
+    first_page = b"before_created_at=9999-12-31T00:00:00&before_id=0"
+    for name, html_path, api_path in PAIRS:
+        for kind, path in (("html", html_path), ("json", api_path)):
+            query_string = first_page if path == "/tasks/page" else b""
+            await get(path, token, query_string)
+            durations, size = await measure(path, token, args.requests, query_string)
+            print(f"{name:<11} {kind:<5} median {statistics.median(durations) * 1e3:7.2f} ms   "
+                  f"p99 {statistics.quantiles(durations, n=100)[98] * 1e3:7.2f} ms   {size:>8} bytes")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+"""
+Sends requests straight to an ASGI application, with no server nor HTTP client in
+between, so that the benchmarks only measure the application.
+"""
+import asyncio
+
+
+async def call(application, path: str, headers: list = (), query_string: bytes = b"") -> list[dict]:
+    """
+    Sends a GET request to the ASGI application and returns the messages it sent back.
+    """
+    messages = []
+    request_sent = False
+    response_complete = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Streaming responses listen for the disconnect while they send, it only comes
+        # once the whole body was sent
+        await response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+        if message["type"] == "http.response.body" and not message.get("more_body", False):
+            response_complete.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "server": ("testserver", 80), "client": ("127.0.0.1", 0),
+        "root_path": "", "path": path, "raw_path": path.encode(), "query_string": query_string,
+        "headers": [(b"host", b"testserver"), *headers],
+    }
+    await application(scope, receive, send)
+    return messages
+
+
+def response_status(messages: list[dict]) -> int:
+    return next(message["status"] for message in messages if message["type"] == "http.response.start")
+
+
+def body_chunks(messages: list[dict]) -> list[bytes]:
+    return [message.get("body", b"") for message in messages if message["type"] == "http.response.body"]
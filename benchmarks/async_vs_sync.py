@@ -0,0 +1,84 @@
+"""
+Compares requests/sec of the blocking psycopg2 path against the async path.
+
+Every simulated request runs `get_tasks_by_username` the way a handler does, first
+through the sync `Querier` inside a coroutine (the old behaviour), then through the
+`AsyncQuerier` over a `SyncConnection` (what `DATABASE_MODE=sync` runs) and last on the
+async engine. A probe coroutine measures how long the event loop is stalled.
+
+Usage:
+    python -m benchmarks.async_vs_sync --username some_user --concurrency 50 --seconds 10
+"""
+import argparse
+import asyncio
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from models.connection import SyncConnection, engine, async_engine
+from models.tasks import Querier, AsyncQuerier
+
+
+async def sync_request(username: str):
+    with engine.connect() as connection:
+        list(Querier(connection).get_tasks_by_username(username=username))
+
+
+async def threaded_request(username: str):
+    connection = SyncConnection(await run_in_threadpool(engine.connect))
+    try:
+        [task async for task in AsyncQuerier(connection).get_tasks_by_username(username=username)]
+    finally:
+        await connection.close()
+
+
+async def async_request(username: str):
+    async with async_engine.connect() as connection:
+        [task async for task in AsyncQuerier(connection).get_tasks_by_username(username=username)]
+
+
+async def loop_lag_probe(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start - 0.01)
+
+
+async def run(request, username: str, concurrency: int, seconds: float):
+    deadline = time.perf_counter() + seconds
+    completed = 0
+
+    async def worker():
+        nonlocal completed
+        while time.perf_counter() < deadline:
+            await request(username)
+            completed += 1
+
+    stop = asyncio.Event()
+    lags = []
+    probe = asyncio.create_task(loop_lag_probe(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    max_lag = max(lags) if lags else elapsed
+    return completed / elapsed, max_lag
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    for name, request in (("blocking", sync_request), ("sync", threaded_request), ("async", async_request)):
+        requests_per_second, max_lag = await run(request, args.username, args.concurrency, args.seconds)
+        print(f"{name:>8}: {requests_per_second:10.1f} req/s   max event loop lag {max_lag * 1000:8.1f} ms")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
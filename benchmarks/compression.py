@@ -0,0 +1,105 @@
+"""
+Measures the bytes on the wire and the CPU cost of compressing a streamed task page with
+1,000 tasks, for every encoding the compression middleware negotiates. The page is
+rendered from in-memory tasks, so no database is needed.
+
+Usage:
+    python -m benchmarks.compression --tasks 1000 --requests 50
+"""
+import argparse
+import asyncio
+import datetime
+import statistics
+import time
+
+from fastapi import Request
+
+from benchmarks.asgi import call, body_chunks
+from concerns.compression import CompressionMiddleware, brotli, _GZipResponder, _BrotliResponder
+from concerns.rendering import stream_template
+from config import COMPRESSION_MINIMUM_SIZE, GZIP_LEVEL, BROTLI_QUALITY
+from main import app
+from models import models
+from models.models import State
+
+
+def make_context(request: Request, task_count: int) -> dict:
+    now = datetime.datetime.now()
+    categories = [models.Category(id=i, name=f"Category {i}", description="Benchmark category", updated_at=now)
+                  for i in range(1, 11)]
+    tasks = [
+        models.Task(
+            id=i,
+            description=f"Benchmark task number {i} with a description of ordinary length",
+            created_at=now - datetime.timedelta(minutes=i),
+            expected_finished_at=now + datetime.timedelta(days=i % 30),
+            state=list(State)[i % len(State)],
+            person_id=1,
+            category_id=categories[i % len(categories)].id,
+            updated_at=now,
+        )
+        for i in range(task_count)
+    ]
+    user = models.Person(id=1, username="benchmark", email="benchmark@example.com", password_hash="", image_path=None)
+    # A plain list has no `next_page_url`, so the whole list is rendered without a sentinel
+    return {"request": request, "title": "All tasks", "tasks": tasks, "categories": categories,
+            "user": user, "states": State}
+
+
+async def render_page(scope, receive, send, task_count: int):
+    # The app in the scope resolves the `url_for` calls of the templates
+    request = Request({**scope, "app": app})
+    await stream_template("tasks/index.html", make_context(request, task_count))(scope, receive, send)
+
+
+async def request(application, encoding: str) -> list[bytes]:
+    """
+    Sends one GET request to the ASGI application and returns the body chunks sent.
+    """
+    return body_chunks(await call(application, "/tasks/", headers=[(b"accept-encoding", encoding.encode())]))
+
+
+def compression_seconds(encoding: str, chunks: list[bytes]) -> float:
+    """
+    CPU time the responder of an encoding spends compressing the chunks of one page, timed
+    apart from the render, whose own variance would hide it.
+    """
+    if encoding == "gzip":
+        responder = _GZipResponder(None, COMPRESSION_MINIMUM_SIZE, GZIP_LEVEL)
+    else:
+        responder = _BrotliResponder(None, COMPRESSION_MINIMUM_SIZE, BROTLI_QUALITY)
+    start = time.process_time()
+    for index, chunk in enumerate(chunks, start=1):
+        responder.apply_compression(chunk, more_body=index < len(chunks))
+    return time.process_time() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    async def page(scope, receive, send):
+        await render_page(scope, receive, send, args.tasks)
+
+    application = CompressionMiddleware(
+        page, minimum_size=COMPRESSION_MINIMUM_SIZE, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY
+    )
+    page_chunks = await request(application, "identity")
+    for encoding in ["identity", "gzip"] + (["br"] if brotli is not None else []):
+        wall = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            chunks = await request(application, encoding)
+            wall.append(time.perf_counter() - start)
+        if encoding == "identity":
+            cpu = 0.0
+        else:
+            cpu = statistics.median(compression_seconds(encoding, page_chunks) for _ in range(args.requests))
+        print(f"{encoding:<9} {sum(len(chunk) for chunk in chunks):>9} bytes in {len(chunks):>4} chunks   "
+              f"request {statistics.median(wall) * 1e3:7.2f} ms   compression cpu {cpu * 1e3:6.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
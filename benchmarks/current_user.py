@@ -0,0 +1,48 @@
+"""
+Measures the per-request latency of the `get_current_user` dependency with a cold and
+with a warm user cache.
+
+Usage:
+    python -m benchmarks.current_user --username some_user --requests 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from concerns.authentication import get_current_user
+from concerns.user import user_cache
+from models.connection import async_engine
+
+
+async def measure(username: str, requests: int, warm: bool) -> list[float]:
+    durations = []
+    async with async_engine.connect() as connection:
+        for _ in range(requests):
+            if not warm:
+                user_cache.invalidate()
+            start = time.perf_counter()
+            user = await get_current_user(username=username, connection=connection)
+            durations.append(time.perf_counter() - start)
+            if user is None:
+                raise SystemExit(f"User {username} does not exist")
+    return durations
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    for name, warm in (("cold", False), ("warm", True)):
+        durations = await measure(args.username, args.requests, warm)
+        print(f"{name}: median {statistics.median(durations) * 1e6:9.1f} us   "
+              f"p99 {statistics.quantiles(durations, n=100)[98] * 1e6:9.1f} us")
+    print(user_cache.stats())
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
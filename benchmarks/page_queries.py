@@ -0,0 +1,63 @@
+"""
+Counts the SQL statements executed by one view of each task page, with the user cache
+cold, and fails if any page needs more than one.
+
+Usage:
+    python -m benchmarks.page_queries --username some_user --category-id 1
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import event
+
+from benchmarks.asgi import call, response_status
+from concerns.authentication import create_access_token
+from concerns.user import user_cache
+from main import app
+from models.connection import async_engine
+
+EXPECTED_QUERIES = 1
+
+
+async def get(path: str, token: str) -> int:
+    """
+    Sends a GET request straight to the ASGI app and returns the response status.
+    """
+    messages = await call(app, path, headers=[(b"cookie", f"access_token={token}".encode())])
+    return response_status(messages)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--category-id", type=int, required=True)
+    args = parser.parse_args()
+
+    statements = []
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def count(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    token = create_access_token(data={"sub": args.username})
+    # The first request loads the worker state that is not per page (revoked tokens filter)
+    await get("/tasks/", token)
+
+    failures = 0
+    for path in ("/tasks/", f"/tasks/category/{args.category_id}"):
+        user_cache.invalidate()
+        statements.clear()
+        status = await get(path, token)
+        print(f"{path:<30} status {status}   {len(statements)} queries")
+        if status != 200 or len(statements) > EXPECTED_QUERIES:
+            failures += 1
+            for statement in statements:
+                print("   ", statement.splitlines()[0])
+
+    await async_engine.dispose()
+    if failures:
+        raise SystemExit(f"{failures} page(s) ran more than {EXPECTED_QUERIES} query")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
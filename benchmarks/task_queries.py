@@ -0,0 +1,119 @@
+"""
+Times the task list queries on a seeded dataset, to compare them before and after a
+migration, e.g.
+
+    python -m benchmarks.task_queries --seed 200000
+    python manage.py migrate down --steps 1
+    python -m benchmarks.task_queries
+    python manage.py migrate up
+
+`--seed` creates the user `benchmark_user` with the given number of tasks spread over
+the existing categories, among other users' tasks so that the filters matter.
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models.connection import engine
+from models.tasks import Querier, GetTasksPageByUsernameAndCategoryIdParams
+
+BENCHMARK_USERNAME = "benchmark_user"
+
+SEED_USERS = """
+INSERT INTO persons (username, email, password_hash)
+SELECT 'benchmark_user' || suffix, 'benchmark_user' || suffix || '@example.com', 'not-a-hash'
+FROM (SELECT '' AS suffix UNION ALL SELECT '_' || i FROM generate_series(1, 9) AS i) AS suffixes
+ON CONFLICT DO NOTHING
+"""
+
+SEED_CATEGORIES = """
+INSERT INTO categories (name, description)
+SELECT 'benchmark category ' || i, 'seeded by benchmarks.task_queries'
+FROM generate_series(1, 10) AS i
+WHERE NOT EXISTS (SELECT 1 FROM categories)
+"""
+
+SEED_TASKS = """
+INSERT INTO tasks (description, created_at, state, person_id, category_id)
+SELECT 'benchmark task ' || i,
+       CURRENT_TIMESTAMP - i * INTERVAL '1 minute',
+       (ARRAY ['backlog', 'started', 'finished']::state[])[1 + i % 3],
+       persons.id,
+       categories.ids[1 + i % array_length(categories.ids, 1)]
+FROM generate_series(1, :count) AS i,
+     (SELECT array_agg(id) AS ids FROM categories) AS categories,
+     persons
+WHERE persons.username LIKE 'benchmark_user%'
+"""
+
+
+def seed(count: int):
+    with engine.begin() as connection:
+        connection.execute(text(SEED_USERS))
+        connection.execute(text(SEED_CATEGORIES))
+        connection.execute(text(SEED_TASKS), {"count": count})
+        connection.execute(text("ANALYZE tasks"))
+
+
+def timed(function, repetitions: int) -> float:
+    durations = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Tasks to create per seeded user before timing")
+    parser.add_argument("--repetitions", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.seed)
+
+    with engine.connect() as connection:
+        querier = Querier(connection)
+        category_id = connection.execute(
+            text("SELECT category_id FROM tasks JOIN persons ON tasks.person_id = persons.id "
+                 "WHERE persons.username = :username LIMIT 1"),
+            {"username": BENCHMARK_USERNAME},
+        ).scalar()
+        middle = connection.execute(
+            text("SELECT tasks.created_at, tasks.id FROM tasks JOIN persons ON tasks.person_id = persons.id "
+                 "WHERE persons.username = :username ORDER BY tasks.created_at DESC, tasks.id DESC "
+                 "OFFSET (SELECT count(*) / 2 FROM tasks JOIN persons ON tasks.person_id = persons.id "
+                 "WHERE persons.username = :username) LIMIT 1"),
+            {"username": BENCHMARK_USERNAME},
+        ).first()
+        if middle is None:
+            raise SystemExit(f"{BENCHMARK_USERNAME} has no tasks, run with --seed first")
+
+        cases = {
+            "get_tasks_by_username": lambda: list(querier.get_tasks_by_username(username=BENCHMARK_USERNAME)),
+            "get_task_username_and_by_category_id": lambda: list(querier.get_task_username_and_by_category_id(
+                username=BENCHMARK_USERNAME, category_id=category_id
+            )),
+            "get_tasks_page_by_username (first page)": lambda: list(querier.get_tasks_page_by_username(
+                username=BENCHMARK_USERNAME, before_created_at=datetime.max, before_id=0, page_size=51
+            )),
+            "get_tasks_page_by_username (middle page)": lambda: list(querier.get_tasks_page_by_username(
+                username=BENCHMARK_USERNAME, before_created_at=middle[0], before_id=middle[1], page_size=51
+            )),
+            "get_tasks_page_by_username_and_category_id": lambda: list(
+                querier.get_tasks_page_by_username_and_category_id(GetTasksPageByUsernameAndCategoryIdParams(
+                    username=BENCHMARK_USERNAME, category_id=category_id,
+                    before_created_at=datetime.max, before_id=0, page_size=51,
+                ))
+            ),
+        }
+        for name, case in cases.items():
+            print(f"{name:<45} {timed(case, args.repetitions):10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
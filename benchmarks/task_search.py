@@ -0,0 +1,120 @@
+"""
+Compares the full-text task search with the `ILIKE` scan it replaces, on a seeded table,
+for rare, common, prefix and two word searches, e.g.
+
+    python -m benchmarks.task_search --seed 200000
+    python -m benchmarks.task_search --explain
+
+`--seed` creates the user `search_benchmark_user` with the given number of tasks, whose
+descriptions are drawn from a vocabulary where words are far from equally frequent.
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+
+from concerns.search import search_query
+from models.connection import engine
+from models.tasks import Querier, SearchTasksByUsernameParams, SEARCH_TASKS_BY_USERNAME
+
+BENCHMARK_USERNAME = "search_benchmark_user"
+PAGE_SIZE = 51
+# The earlier a word is in the seeded vocabulary the more often it is drawn, `deploy` ends
+# up in nearly every task and `zeppelin` in about one in seven
+SEARCHES = {"rare": "zeppelin", "common": "deploy", "prefix": "migr", "two words": "review datab"}
+
+SEED_USER = """
+INSERT INTO persons (username, email, password_hash)
+VALUES ('search_benchmark_user', 'search_benchmark_user@example.com', 'not-a-hash')
+ON CONFLICT DO NOTHING
+"""
+
+SEED_TASKS = """
+INSERT INTO tasks (description, created_at, person_id)
+SELECT (SELECT string_agg(words[1 + CAST(floor(power(random(), 3) * array_length(words, 1)) AS int)], ' ')
+        FROM generate_series(1, 6 + i % 10)),
+       CURRENT_TIMESTAMP - i * INTERVAL '1 minute',
+       persons.id
+FROM generate_series(1, :count) AS i,
+     (SELECT ARRAY ['deploy', 'review', 'fix', 'update', 'database', 'write', 'tests', 'migrate', 'call',
+                    'client', 'invoice', 'backup', 'meeting', 'report', 'design', 'refactor', 'cleanup',
+                    'schedule', 'budget', 'onboarding', 'migration', 'release', 'dashboard', 'zeppelin'] AS words) AS vocabulary,
+     persons
+WHERE persons.username = 'search_benchmark_user'
+"""
+
+ILIKE_SEARCH = """
+SELECT tasks.id, tasks.description
+FROM tasks
+         JOIN persons ON tasks.person_id = persons.id AND persons.username = :username
+WHERE tasks.description ILIKE ALL (CAST(:patterns AS text[]))
+ORDER BY tasks.created_at DESC, tasks.id DESC
+LIMIT :page_size
+"""
+
+
+def seed(count: int):
+    with engine.begin() as connection:
+        connection.execute(text(SEED_USER))
+        connection.execute(text(SEED_TASKS), {"count": count})
+        connection.execute(text("ANALYZE tasks"))
+
+
+def timed(function, repetitions: int) -> float:
+    durations = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Tasks to create for the benchmark user before timing")
+    parser.add_argument("--repetitions", type=int, default=20)
+    parser.add_argument("--explain", action="store_true", help="Print the plan of each full-text search")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.seed)
+
+    with engine.connect() as connection:
+        task_count = connection.execute(
+            text("SELECT count(*) FROM tasks JOIN persons ON tasks.person_id = persons.id "
+                 "WHERE persons.username = :username"),
+            {"username": BENCHMARK_USERNAME},
+        ).scalar()
+        if not task_count:
+            raise SystemExit(f"{BENCHMARK_USERNAME} has no tasks, run with --seed first")
+        print(f"{task_count} tasks")
+        querier = Querier(connection)
+        for name, search in SEARCHES.items():
+            parameters = SearchTasksByUsernameParams(
+                username=BENCHMARK_USERNAME, query=search_query(search),
+                before_rank=float("inf"), before_id=0, page_size=PAGE_SIZE,
+            )
+            patterns = [f"%{word}%" for word in search.split()]
+            full_text = timed(lambda: list(querier.search_tasks_by_username(parameters)), args.repetitions)
+            ilike = timed(lambda: connection.execute(text(ILIKE_SEARCH), {
+                "username": BENCHMARK_USERNAME, "patterns": patterns, "page_size": PAGE_SIZE,
+            }).all(), args.repetitions)
+            matches = connection.execute(
+                text("SELECT count(*) FROM tasks JOIN persons ON tasks.person_id = persons.id "
+                     "WHERE persons.username = :username AND tasks.description ILIKE ALL (CAST(:patterns AS text[]))"),
+                {"username": BENCHMARK_USERNAME, "patterns": patterns},
+            ).scalar()
+            print(f"{name:<10} {search!r:<14} {matches:>8} matches   "
+                  f"full-text {full_text:9.2f} ms   ILIKE {ilike:9.2f} ms")
+            if args.explain:
+                plan = connection.execute(
+                    text("EXPLAIN (ANALYZE, BUFFERS) " + SEARCH_TASKS_BY_USERNAME),
+                    {"p1": parameters.username, "p2": parameters.query, "p3": parameters.before_rank,
+                     "p4": parameters.before_id, "p5": parameters.page_size},
+                ).scalars()
+                print("\n".join(f"    {line}" for line in plan))
+
+
+if __name__ == "__main__":
+    main()
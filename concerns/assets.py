@@ -0,0 +1,198 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import urllib.request
+from base64 import b64encode
+from pathlib import Path
+
+from jinja2 import pass_context
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles, NotModifiedResponse
+from starlette.types import Scope
+
+from concerns.compression import accepted_encodings
+from config import STATIC_DIR, STATIC_BUILD_DIR, PROFILE_PICS_DIR, templates, streaming_templates
+
+try:
+    import brotli
+except ImportError:  # brotli variants are skipped, clients get the gzip one
+    brotli = None
+
+MANIFEST_PATH = os.path.join(STATIC_BUILD_DIR, "manifest.json")
+HASH_LENGTH = 12
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".map", ".json", ".svg", ".txt", ".html", ".ico"}
+COMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# Third party scripts served from our own origin, downloaded once by the build and
+# checked against their pinned subresource integrity hash. The CDN url is used as is
+# while they have not been vendored yet, e.g. in development
+VENDORED_ASSETS = {
+    "vendor/htmx.min.js": (
+        "https://unpkg.com/htmx.org@2.0.4/dist/htmx.min.js",
+        "sha384-HGfztofotfshcF7+8n44JQL2oJmowVChPTg48S+jvZoztPfvwD79OC/LTtG6dMp+",
+    ),
+    "vendor/alpine.min.js": (
+        "https://cdn.jsdelivr.net/npm/alpinejs@3.14.9/dist/cdn.min.js",
+        "sha384-9Ax3MmS9AClxJyd5/zafcXXjxmwFhZCdsT6HJoJjarvCaAkJlk5QDzjLJm+Wdx5F",
+    ),
+    "vendor/htmx-ext-sse.js": (
+        "https://unpkg.com/htmx-ext-sse@2.2.2/sse.js",
+        "sha384-Y4gc0CK6Kg+hmulDc6rZPJu0tqvk7EWlih0Oh+2OkAi1ZDlCbBDCQEE2uVk472Ky",
+    ),
+}
+
+
+def vendor_assets(refresh: bool = False) -> list[str]:
+    """
+    Downloads the `VENDORED_ASSETS` that are not in the static directory yet, checking
+    their pinned subresource integrity hash.
+
+    :param refresh: Download them again even if they are already there.
+    :return: The downloaded paths.
+    """
+    downloaded = []
+    for path, (url, integrity) in VENDORED_ASSETS.items():
+        destination = Path(STATIC_DIR, path)
+        if destination.exists() and not refresh:
+            continue
+        with urllib.request.urlopen(url, timeout=30) as response:
+            content = response.read()
+        algorithm, expected = integrity.split("-", 1)
+        actual = b64encode(hashlib.new(algorithm, content).digest()).decode("ascii")
+        if actual != expected:
+            raise RuntimeError(f"Integrity check failed for {url}")
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        destination.write_bytes(content)
+        downloaded.append(path)
+    return downloaded
+
+
+def _source_files() -> list[Path]:
+    excluded = (Path(STATIC_BUILD_DIR).resolve(), Path(PROFILE_PICS_DIR).resolve())
+    files = []
+    for path in sorted(Path(STATIC_DIR).rglob("*")):
+        resolved = path.resolve()
+        if not path.is_file() or path.name.startswith(".") or any(resolved.is_relative_to(e) for e in excluded):
+            continue
+        files.append(path)
+    return files
+
+
+def _write_compressed(path: Path, content: bytes) -> list[str]:
+    encodings = []
+    variants = [("gzip", gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.insert(0, ("br", brotli.compress(content, quality=11)))
+    for encoding, compressed in variants:
+        # Variants that do not save anything are not worth a second file
+        if len(compressed) < len(content):
+            Path(f"{path}{COMPRESSED_SUFFIXES[encoding]}").write_bytes(compressed)
+            encodings.append(encoding)
+    return encodings
+
+
+def build_assets() -> dict:
+    """
+    Copies every file of the static directory (except the uploaded profile pictures) to
+    the build directory under a content hashed name, e.g. `css/output.3f9a0c1b2d4e.css`,
+    next to its gzip and brotli variants, and writes the manifest that maps the original
+    names to the built ones. The build directory is recreated from scratch.
+
+    :return: The manifest.
+    """
+    shutil.rmtree(STATIC_BUILD_DIR, ignore_errors=True)
+    manifest = {}
+    for source in _source_files():
+        content = source.read_bytes()
+        name = source.relative_to(STATIC_DIR).as_posix()
+        digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+        built_name = Path(name).with_name(f"{Path(name).stem}.{digest}{Path(name).suffix}").as_posix()
+        destination = Path(STATIC_BUILD_DIR, built_name)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        destination.write_bytes(content)
+        encodings = _write_compressed(destination, content) if source.suffix in COMPRESSIBLE_EXTENSIONS else []
+        manifest[name] = {
+            "path": Path(STATIC_BUILD_DIR, built_name).relative_to(STATIC_DIR).as_posix(),
+            "encodings": encodings,
+        }
+    Path(MANIFEST_PATH).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return manifest
+
+
+def load_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH) as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return {}
+
+
+manifest = load_manifest()
+
+
+@pass_context
+def asset_url(context, path: str) -> str:
+    """
+    Template helper resolving a static file to its content hashed name, with the same
+    path argument as `url_for('static', path=...)`. Without a build (development) the
+    original file is used, and vendored scripts not downloaded yet use their CDN url.
+    """
+    name = path.lstrip("/")
+    if name in manifest:
+        return str(context["request"].url_for("static", path=manifest[name]["path"]))
+    if name in VENDORED_ASSETS and not Path(STATIC_DIR, name).exists():
+        return VENDORED_ASSETS[name][0]
+    return str(context["request"].url_for("static", path=name))
+
+
+for environment in (templates.env, streaming_templates.env):
+    environment.globals["asset_url"] = asset_url
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    Static files handler that serves the brotli or gzip variant written by the build
+    when the client accepts it, and marks the content hashed files as immutable so
+    browsers never revalidate them. Other files are served as `StaticFiles` does.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Keyed like the resolved paths `lookup_path` hands to `file_response`
+        self.built_files = {
+            os.path.realpath(os.path.join(STATIC_DIR, entry["path"])): entry["encodings"]
+            for entry in manifest.values()
+        }
+
+    def file_response(
+            self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200
+    ) -> Response:
+        encodings = self.built_files.get(str(full_path))
+        if encodings is None:
+            return super().file_response(full_path, stat_result, scope, status_code)
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        encoding = next((encoding for encoding in encodings if encoding in accepted), None)
+        headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+        if encodings:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        else:
+            headers["Content-Encoding"] = encoding
+            compressed_path = f"{full_path}{COMPRESSED_SUFFIXES[encoding]}"
+            response = FileResponse(
+                compressed_path,
+                status_code=status_code,
+                stat_result=os.stat(compressed_path),
+                headers=headers,
+                media_type=mimetypes.guess_type(str(full_path))[0] or "application/octet-stream",
+            )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -1,13 +1,22 @@
+import hashlib
+import time
+import uuid
 from datetime import timedelta, datetime, timezone
 
-import bcrypt
 from fastapi import Depends, HTTPException, Request
 from fastapi.responses import RedirectResponse
 from jose import jwt, JWTError
 
-from config import SECRET_KEY, ALGORITHM, LOGIN_URL
+from concerns.cache import LRUCache
+from concerns.passwords import password_hasher
+from concerns.revocation import token_blacklist
+from concerns.user import user_cache
+from config import SECRET_KEY, ALGORITHM, LOGIN_URL, TOKEN_CACHE_SIZE, ADMIN_USERNAMES
 from models.connection import get_connection
-from models.users import Querier
+from models.users import AsyncQuerier as Querier
+
+# Verified payloads by token digest, each one kept until the token expires
+token_cache = LRUCache("tokens", max_size=TOKEN_CACHE_SIZE, ttl=0)
 
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
@@ -16,18 +25,28 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
         expire = datetime.now(timezone.utc)
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-# Function to verify the token
+# Function to verify the token, the signature is only checked the first time a token is seen
 def verify_access_token(token: str):
+    if not token:
+        return None
+    key = hashlib.sha256(token.encode('utf-8')).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+    version = token_cache.version
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         return None
+    expires_in = payload.get("exp", 0) - time.time()
+    if expires_in > 0:
+        token_cache.set(key, payload, version, ttl=expires_in)
+    return payload
 
 
 def get_token(request: Request):
@@ -35,49 +54,88 @@ def get_token(request: Request):
     return token
 
 
-def get_current_username(token: str = Depends(get_token)) -> str | RedirectResponse:
+def get_token_id(token: str, payload: dict) -> str:
+    # Tokens issued before they carried a jti are identified by their digest
+    return payload.get("jti") or hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+async def get_current_username(
+        token: str = Depends(get_token), connection=Depends(get_connection)) -> str | RedirectResponse:
     if not token:
         raise HTTPException(status_code=307, headers={"Location": LOGIN_URL})
-    check_blacklist(token)
     payload = verify_access_token(token)
     if payload is None:
         raise HTTPException(status_code=307, headers={"Location": LOGIN_URL})
+    await check_blacklist(token, payload, connection)
     username = payload.get("sub")
     return username
 
 
-def get_current_user(username: str = Depends(get_current_username), connection=Depends(get_connection)):
-    querier = Querier(connection)
-    return querier.get_user_by_username(username=username)
+async def get_current_user(username: str = Depends(get_current_username), connection=Depends(get_connection)):
+    user = user_cache.get(username)
+    if user is None:
+        version = user_cache.version
+        querier = Querier(connection)
+        user = await querier.get_user_by_username(username=username)
+        if user is not None:
+            user_cache.set(username, user, version)
+    return user
+
+
+def get_api_token(request: Request):
+    # API clients send a bearer token, the browser session cookie is accepted as well
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token
+    return get_token(request)
 
 
-def get_current_token(token: str = Depends(get_token)) -> str | RedirectResponse:
-    check_blacklist(token)
+async def get_api_username(token: str = Depends(get_api_token), connection=Depends(get_connection)) -> str:
     payload = verify_access_token(token)
     if payload is None:
-        return RedirectResponse(url="/users/login", status_code=303)
-    return token
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    await check_blacklist(token, payload, connection)
+    return payload.get("sub")
 
 
-def check_password(password_hash: str, entered_password: str):
-    return bcrypt.checkpw(entered_password.encode('utf-8'), password_hash.encode('utf-8'))
+async def get_admin_username(username: str = Depends(get_api_username)) -> str:
+    if username not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=403, detail="Not allowed")
+    return username
+
 
+async def get_api_user(username: str = Depends(get_api_username), connection=Depends(get_connection)):
+    user = await get_current_user(username=username, connection=connection)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return user
 
-def hash_password(password: str):
-    password = password.encode('utf-8')
-    salt = bcrypt.gensalt()
-    password_hash = bcrypt.hashpw(password, salt)
-    return password_hash.decode(
-        'utf-8')
 
+async def get_current_token(
+        token: str = Depends(get_token), connection=Depends(get_connection)) -> str | RedirectResponse:
+    payload = verify_access_token(token)
+    if payload is None:
+        return RedirectResponse(url="/users/login", status_code=303)
+    await check_blacklist(token, payload, connection)
+    return token
 
-blacklisted_tokens = set()
 
+async def check_password(password_hash: str, entered_password: str):
+    return await password_hasher.check(password_hash, entered_password)
 
-def black_list_token(token: str):
-    blacklisted_tokens.add(token)
+
+async def hash_password(password: str):
+    return await password_hasher.hash(password)
+
+
+async def black_list_token(token: str, connection):
+    payload = verify_access_token(token)
+    if payload is None:
+        return
+    expires_at = datetime.fromtimestamp(payload.get("exp", time.time()), timezone.utc)
+    await token_blacklist.revoke(connection, get_token_id(token, payload), expires_at)
 
 
-def check_blacklist(token: str):
-    if token in blacklisted_tokens:
+async def check_blacklist(token: str, payload: dict, connection):
+    if await token_blacklist.is_revoked(connection, get_token_id(token, payload)):
         raise HTTPException(status_code=401, detail="Token is blacklisted")
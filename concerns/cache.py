@@ -0,0 +1,130 @@
+import contextlib
+import fcntl
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from config import CACHE_DIR
+
+COUNTER_FORMAT = "<Q"
+COUNTER_SIZE = struct.calcsize(COUNTER_FORMAT)
+
+
+class SharedCounter:
+    """
+    A 64-bit counter stored in a memory-mapped file under `CACHE_DIR`, so every uvicorn
+    worker on the host sees the same value. Reading it is a memory access, which makes
+    it cheap enough to check on every request; increments are serialized with a file
+    lock.
+    """
+
+    def __init__(self, name: str, directory: str = CACHE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self._path = os.path.join(directory, f"{name}.counter")
+        self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            if os.fstat(self._fd).st_size < COUNTER_SIZE:
+                os.ftruncate(self._fd, COUNTER_SIZE)
+        self._map = mmap.mmap(self._fd, COUNTER_SIZE)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @property
+    def value(self) -> int:
+        return struct.unpack_from(COUNTER_FORMAT, self._map)[0]
+
+    def increment(self) -> int:
+        with self._locked():
+            value = self.value + 1
+            struct.pack_into(COUNTER_FORMAT, self._map, 0, value)
+        return value
+
+
+
+class LRUCache:
+    """
+    A bounded least-recently-used mapping whose entries expire `ttl` seconds after being
+    stored. It is bound to a `SharedCounter`: `invalidate` bumps it and every worker drops
+    its entries the next time it touches the cache.
+
+    `evict` drops a single entry from the worker that changed it, and every entry from
+    the others.
+
+    To avoid storing rows that were read before a concurrent invalidation, read
+    `version` before loading a value and pass it to `set`, which ignores stale loads.
+    """
+
+    def __init__(self, name: str, max_size: int, ttl: float):
+        self._version = SharedCounter(name)
+        self._loaded_version = self._version.value
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self) -> int:
+        return self._version.value
+
+    def _sync(self) -> int:
+        version = self._version.value
+        if version != self._loaded_version:
+            self._entries.clear()
+            self._loaded_version = version
+        return version
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        self._sync()
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, version: int, ttl: Optional[float] = None):
+        if self._sync() != version:
+            return
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        self._version.increment()
+        self._sync()
+
+    def evict(self, key: Hashable):
+        """
+        Drops a single entry. The shared counter is still bumped, as the other workers
+        cannot tell which entry changed, but this worker keeps the rest of its entries
+        unless another invalidation happened meanwhile.
+        """
+        version = self._sync()
+        self._entries.pop(key, None)
+        if self._version.increment() == version + 1:
+            self._loaded_version = version + 1
+        else:
+            self._sync()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": self._loaded_version,
+        }
@@ -0,0 +1,60 @@
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from concerns.cache import SharedCounter
+from models import models
+from models.categories import AsyncQuerier
+
+
+class CategoryCache:
+    """
+    Keeps the category list in memory together with the version it was loaded at. The
+    version is a `SharedCounter`, so a write in any worker makes every worker reload the
+    list on its next read.
+
+    Writers must call `invalidate` only after their transaction is committed, otherwise
+    another worker could reload the old rows and keep them under the new version.
+
+    The list is loaded together with `fingerprint`, the version the database keeps for
+    the categories, which the category page builds its ETag from.
+    """
+
+    def __init__(self):
+        self._version = SharedCounter("categories")
+        self._loaded_version: Optional[int] = None
+        self._categories: list[models.Category] = []
+        self._by_id: dict[int, models.Category] = {}
+        self._fingerprint: Optional[int] = None
+
+    @property
+    def version(self) -> int:
+        return self._version.value
+
+    @property
+    def fingerprint(self) -> Optional[int]:
+        # Of the list the last `get_all` returned, read it before awaiting anything else
+        return self._fingerprint
+
+    async def get_all(self, connection: AsyncConnection) -> list[models.Category]:
+        version = self._version.value
+        if version != self._loaded_version:
+            querier = AsyncQuerier(connection)
+            # Read before the rows, so they are never older than the fingerprint kept with them
+            fingerprint = await querier.get_categories_fingerprint()
+            categories = [category async for category in querier.get_all_categories()]
+            self._categories = categories
+            self._by_id = {category.id: category for category in categories}
+            self._fingerprint = fingerprint
+            self._loaded_version = version
+        return self._categories
+
+    async def get_by_id(self, connection: AsyncConnection, category_id: int) -> Optional[models.Category]:
+        await self.get_all(connection)
+        return self._by_id.get(category_id)
+
+    def invalidate(self):
+        self._version.increment()
+
+
+category_cache = CategoryCache()
@@ -0,0 +1,100 @@
+import zlib
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # only gzip is negotiated
+    brotli = None
+
+COMPRESSIBLE_CONTENT_TYPES = (
+    "text/html", "text/css", "text/plain", "text/csv", "text/javascript", "application/javascript",
+    "application/json", "application/x-ndjson", "application/xml", "image/svg+xml",
+)
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """
+    Parses an `Accept-Encoding` header into the set of codings the client accepts,
+    leaving out those with `q=0`.
+    """
+    accepted = set()
+    for item in accept_encoding.split(","):
+        encoding, _, parameters = item.partition(";")
+        name, _, quality = parameters.strip().partition("=")
+        try:
+            if name.strip() == "q" and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+class _CompressingResponder(IdentityResponder):
+    """
+    Starlette's responder, which already handles the minimum size, streamed bodies and
+    responses that are encoded already, restricted to compressible content types.
+    """
+
+    async def send_with_compression(self, message: Message) -> None:
+        await super().send_with_compression(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            self.content_type_is_excluded = not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES)
+
+
+class _GZipResponder(_CompressingResponder):
+    content_encoding = "gzip"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, level: int):
+        super().__init__(app, minimum_size)
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        # A sync flush per chunk, unlike GzipFile, sends what each chunk compressed to
+        # right away, so streamed pages keep rendering progressively in the browser
+        flush_mode = zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH
+        return self.compressor.compress(body) + self.compressor.flush(flush_mode)
+
+
+class _BrotliResponder(_CompressingResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int):
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        compressed = self.compressor.process(body)
+        return compressed + (self.compressor.flush() if more_body else self.compressor.finish())
+
+
+class CompressionMiddleware:
+    """
+    Compresses text responses with brotli or gzip, whichever the client accepts,
+    preferring brotli. Bodies smaller than `minimum_size` and responses that already
+    carry a `Content-Encoding`, such as the precompressed static files, are sent as is.
+    Streamed responses are compressed chunk by chunk and every chunk is flushed.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            responder = _BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+        elif "gzip" in accepted:
+            responder = _GZipResponder(self.app, self.minimum_size, self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
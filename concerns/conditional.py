@@ -0,0 +1,70 @@
+import hashlib
+import json
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Optional
+
+from fastapi import Request, Response
+
+from concerns.assets import manifest
+
+
+def _templates_digest(directory: str = "templates") -> str:
+    # Part of every ETag, so that a deploy changing the markup never answers 304
+    digest = hashlib.sha1()
+    for path in sorted(Path(directory).rglob("*.html")):
+        digest.update(path.as_posix().encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+TEMPLATES_DIGEST = _templates_digest()
+# The pages link the hashed asset names of the manifest, and a build removes the previous
+# ones, so a deploy changing only the CSS or JS must not answer 304 either
+MANIFEST_DIGEST = hashlib.sha1(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def page_etag(request: Request, username: Optional[str], *fingerprint) -> str:
+    """
+    Builds the weak ETag of a rendered page from the data fingerprint it was rendered
+    from, the user, the exact url (so each page of a list has its own tag), the
+    templates in use and the asset manifest.
+
+    :param request: The HTTP request of the page.
+    :param username: The user the page is rendered for, None when it is the same for all.
+    :param fingerprint: Values that change whenever the data shown on the page changes.
+    :return: The weak ETag, quoted.
+    """
+    key = (TEMPLATES_DIGEST, MANIFEST_DIGEST, str(request.url), username, fingerprint)
+    digest = hashlib.sha1(repr(key).encode("utf-8"))
+    return f'W/"{digest.hexdigest()}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    # If-None-Match always uses the weak comparison
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag.removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def not_modified_since(request: Request, mtime: float) -> bool:
+    # Only consulted when there is no If-None-Match, which takes precedence
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since:
+        return False
+    try:
+        return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def cache_headers(etag: str) -> dict:
+    # Private since pages differ per user, no-cache so the browser revalidates every time
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Cookie"}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+
+from config import PROFILE_PICS_DIR, PROFILE_IMAGE_MAX_BYTES, IMAGE_WORKERS, IMAGE_QUEUE_SIZE
+
+# Square thumbnails written for every uploaded profile image, by name and side in pixels
+PROFILE_IMAGE_SIZES = {"small": 64, "medium": 192, "large": 384}
+MAX_IMAGE_PIXELS = 50_000_000
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOADS_DIR = os.path.join(PROFILE_PICS_DIR, ".uploads")
+
+
+def image_directory(digest: str) -> str:
+    # Two levels so no directory ends up with every image
+    return os.path.join(PROFILE_PICS_DIR, digest[:2], digest)
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        while chunk := source.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _make_thumbnails(source: str, destination: str, sizes: dict[str, int]):
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    # Written next to the destination and renamed, so a directory that exists is complete
+    staging = tempfile.mkdtemp(dir=os.path.dirname(destination), prefix=".staging-")
+    try:
+        try:
+            with Image.open(source) as image:
+                if image.width * image.height > MAX_IMAGE_PIXELS:
+                    raise ValueError(f"Images can have at most {MAX_IMAGE_PIXELS} pixels")
+                # JPEGs are decoded at a reduced scale, close to the largest thumbnail
+                largest = max(sizes.values())
+                image.draft("RGB", (largest * 2, largest * 2))
+                image = ImageOps.exif_transpose(image).convert("RGB")
+                for name, size in sizes.items():
+                    thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+                    thumbnail.save(os.path.join(staging, f"{name}.jpg"), "JPEG", quality=85, optimize=True)
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as error:
+            raise ValueError(f"Not a valid image: {error}") from None
+        try:
+            os.rename(staging, destination)
+        except OSError:
+            pass  # the same image was stored meanwhile by another request
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+class ImageProcessor:
+    """
+    Resizes the uploaded profile images in a dedicated process pool, so the event loop
+    never decodes an image. Like the password hasher, at most `queue_size` images may be
+    waiting or being processed at once, beyond that callers get a 503.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.in_flight = 0
+        self.completed = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.seconds_total = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def store(self, source: str, digest: str) -> str:
+        """
+        Stores the thumbnails of an uploaded image under its content digest. An image that
+        was already uploaded, by this or any other user, is not processed again.
+
+        :param source: Path of the uploaded file.
+        :param digest: SHA-256 of the uploaded file.
+        :return: The digest, to be saved as the user's `image_path`.
+        :raises ValueError: If the file is not an image.
+        :raises HTTPException: 503 when too many images are being processed.
+        """
+        destination = image_directory(digest)
+        try:
+            # Refreshed so the garbage collection does not take it while it is being referenced
+            await run_in_threadpool(os.utime, destination)
+            self.deduplicated += 1
+            return digest
+        except FileNotFoundError:
+            pass
+        if self.in_flight >= self.queue_size:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many images being processed, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await run_in_threadpool(os.makedirs, os.path.dirname(destination), exist_ok=True)
+            await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), _make_thumbnails, source, destination, PROFILE_IMAGE_SIZES
+            )
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.seconds_total += time.perf_counter() - start
+        return digest
+
+    def stats(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queue_depth": self.in_flight,
+            "completed": self.completed,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "seconds_avg": self.seconds_total / self.completed if self.completed else 0.0,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+image_processor = ImageProcessor(workers=IMAGE_WORKERS, queue_size=IMAGE_QUEUE_SIZE)
+
+
+async def save_upload(file: UploadFile, max_bytes: int = PROFILE_IMAGE_MAX_BYTES) -> tuple[str, str]:
+    """
+    Copies an upload to a temporary file chunk by chunk, with the disk writes off the event
+    loop, hashing it on the way.
+
+    :param file: The uploaded file.
+    :param max_bytes: Largest accepted upload.
+    :return: The temporary file path, to be removed by the caller, and the SHA-256 of the content.
+    :raises HTTPException: 413 when the upload is larger than `max_bytes`.
+    """
+    await run_in_threadpool(os.makedirs, UPLOADS_DIR, exist_ok=True)
+    descriptor, path = await run_in_threadpool(tempfile.mkstemp, dir=UPLOADS_DIR)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(descriptor, "wb") as destination:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Images can be at most {max_bytes // (1024 * 1024)} MiB",
+                    )
+                digest.update(chunk)
+                await run_in_threadpool(destination.write, chunk)
+    except BaseException:
+        await run_in_threadpool(os.remove, path)
+        raise
+    return path, digest.hexdigest()
+
+
+def _stored_digests() -> list[str]:
+    digests = []
+    for prefix in os.listdir(PROFILE_PICS_DIR):
+        prefix_path = os.path.join(PROFILE_PICS_DIR, prefix)
+        if len(prefix) != 2 or not os.path.isdir(prefix_path):
+            continue
+        digests.extend(entry for entry in os.listdir(prefix_path) if len(entry) == 64)
+    return digests
+
+
+def remove_images(digests: list[str], min_age: float = 0) -> list[str]:
+    """
+    Deletes the stored thumbnails of the given digests, skipping the ones written less
+    than `min_age` seconds ago, which may belong to an upload not committed yet.
+
+    :return: The removed digests.
+    """
+    removed = []
+    for digest in digests:
+        directory = image_directory(digest)
+        try:
+            if time.time() - os.stat(directory).st_mtime < min_age:
+                continue
+        except FileNotFoundError:
+            continue
+        shutil.rmtree(directory, ignore_errors=True)
+        removed.append(digest)
+    return removed
+
+
+def collect_garbage(referenced: set[str], min_age: float = 3600) -> list[str]:
+    """
+    Deletes every stored image no user references any more, along with the temporary
+    files of uploads that were interrupted.
+
+    :param referenced: The `image_path` values in `persons`.
+    :param min_age: Seconds an unreferenced image is kept, to leave in-flight uploads alone.
+    :return: The removed digests.
+    """
+    if not os.path.isdir(PROFILE_PICS_DIR):
+        return []
+    if os.path.isdir(UPLOADS_DIR):
+        for entry in os.listdir(UPLOADS_DIR):
+            path = os.path.join(UPLOADS_DIR, entry)
+            if time.time() - os.stat(path).st_mtime >= min_age:
+                os.remove(path)
+    return remove_images([digest for digest in _stored_digests() if digest not in referenced], min_age)
@@ -0,0 +1,276 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import AsyncIterator, Optional
+
+import asyncpg
+from fastapi import HTTPException, Request, status
+from sqlalchemy.engine import make_url
+
+from concerns.category import category_cache
+from config import DATABASE_URL, LIVE_MAX_STREAMS, LIVE_MAX_PENDING, LIVE_HEARTBEAT_SECONDS, LIVE_IDLE_SECONDS, \
+    LIVE_MAX_STREAM_SECONDS, templates
+from models import models
+from models.connection import connection_scope
+from models.models import State
+from models.tasks import AsyncQuerier
+
+logger = logging.getLogger(__name__)
+
+# Channel the `tasks_notify_*` triggers notify, once per statement and person
+TASK_CHANGES_CHANNEL = "task_changes"
+# Notifications arriving this close together are read from the database with one query
+BATCH_SECONDS = 0.05
+RECONNECT_SECONDS = 5
+# Browsers reconnect a closed stream after this many milliseconds, plus some jitter so a
+# restarted worker is not hit by all its clients at once
+RETRY_MILLISECONDS = 3000
+
+
+class Subscription:
+    """
+    The changes waiting to be sent to one open stream. Changes to the same task are
+    coalesced, so a stream that reads slowly holds at most one entry per task, and at
+    most `max_pending` of them: past that they are dropped and the stream only tells
+    the page it is out of date.
+    """
+
+    def __init__(self, person_id: int, max_pending: int):
+        self.person_id = person_id
+        self.max_pending = max_pending
+        # Task id to its new version, None when it was deleted
+        self.changes: dict[int, Optional[models.Task]] = {}
+        self.created = 0
+        self.stale = False
+        self.categories: list[models.Category] = []
+        self.ready = asyncio.Event()
+
+    def push(self, task_id: int, task: Optional[models.Task], created: bool = False):
+        if created:
+            self.created += 1
+        elif not self.stale:
+            self.changes[task_id] = task
+            if len(self.changes) > self.max_pending:
+                self.changes.clear()
+                self.stale = True
+        self.ready.set()
+
+    def mark_stale(self):
+        self.changes.clear()
+        self.stale = True
+        self.ready.set()
+
+    def take(self) -> tuple[dict[int, Optional[models.Task]], int, bool]:
+        changes, created, stale = self.changes, self.created, self.stale
+        self.changes, self.created, self.stale = {}, 0, False
+        self.ready.clear()
+        return changes, created, stale
+
+
+class TaskChangeBroker:
+    """
+    Fans the task change notifications out to the live streams of a worker. The worker
+    listens on a single asyncpg connection, opened with the first stream, whatever the
+    number of streams. Notifications are batched, and the changed tasks are read once
+    per batch for all the streams of their owner, with a pooled connection held only for
+    that query. No stream holds a connection of its own.
+    """
+
+    def __init__(self, max_streams: int, max_pending: int):
+        self.max_streams = max_streams
+        self.max_pending = max_pending
+        self.subscriptions: dict[int, set[Subscription]] = {}
+        self.stream_count = 0
+        self._listener: Optional[asyncio.Task] = None
+        self._connection: Optional[asyncpg.Connection] = None
+        self._pending: dict[tuple[int, int], str] = {}
+        self._flush: Optional[asyncio.Task] = None
+        self.notifications = 0
+        self.batches = 0
+        self.rejected = 0
+        self.reconnects = 0
+
+    def check_capacity(self):
+        """
+        :raises HTTPException: 503 when the worker already serves `max_streams` streams.
+        """
+        if self.stream_count >= self.max_streams:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many live streams, try again later",
+                headers={"Retry-After": str(random.randint(10, 60))},
+            )
+
+    def subscribe(self, person_id: int) -> Subscription:
+        """
+        Registers a stream for the changes to the tasks of a person, starting the listener
+        if it is the first stream of the worker.
+        """
+        if self._listener is None:
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        subscription = Subscription(person_id, self.max_pending)
+        self.subscriptions.setdefault(person_id, set()).add(subscription)
+        self.stream_count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self.subscriptions.get(subscription.person_id, set())
+        if subscription in subscriptions:
+            subscriptions.remove(subscription)
+            self.stream_count -= 1
+        if not subscriptions:
+            self.subscriptions.pop(subscription.person_id, None)
+
+    async def _listen(self):
+        dsn = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            lost = asyncio.Event()
+            try:
+                self._connection = await asyncpg.connect(dsn)
+                self._connection.add_termination_listener(lambda connection: lost.set())
+                await self._connection.add_listener(TASK_CHANGES_CHANNEL, self._on_notification)
+                await lost.wait()
+            except Exception as error:
+                logger.warning("Task change listener failed: %s", error)
+            finally:
+                if self._connection is not None and not self._connection.is_closed():
+                    await self._connection.close()
+                self._connection = None
+            # Whatever changed while nobody was listening is lost, the pages are told so
+            for subscriptions in self.subscriptions.values():
+                for subscription in subscriptions:
+                    subscription.mark_stale()
+            self.reconnects += 1
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        self.notifications += 1
+        change = json.loads(payload)
+        person_id = change["person_id"]
+        if person_id not in self.subscriptions:
+            return
+        # Sent instead of the ids when a statement changed too many tasks
+        if change.get("stale"):
+            for subscription in self.subscriptions[person_id]:
+                subscription.mark_stale()
+            return
+        for op, task_ids in (("INSERT", change["inserted"]), ("UPDATE", change["updated"]),
+                             ("DELETE", change["deleted"])):
+            for task_id in task_ids:
+                key = (task_id, person_id)
+                previous = self._pending.get(key)
+                # A task created and then updated within a batch is still new to the page
+                self._pending[key] = "INSERT" if previous == "INSERT" and op == "UPDATE" else op
+        if self._flush is None:
+            self._flush = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def _dispatch(self):
+        await asyncio.sleep(BATCH_SECONDS)
+        pending, self._pending, self._flush = self._pending, {}, None
+        self.batches += 1
+        ids = [task_id for (task_id, _), op in pending.items() if op == "UPDATE"]
+        tasks, categories = {}, None
+        if ids:
+            try:
+                async with connection_scope() as connection:
+                    tasks = {task.id: task async for task in AsyncQuerier(connection).get_tasks_by_ids(ids=ids)}
+                    categories = await category_cache.get_all(connection)
+            except Exception:
+                logger.exception("Could not read the changed tasks")
+                for (_, person_id) in pending:
+                    for subscription in self.subscriptions.get(person_id, ()):
+                        subscription.mark_stale()
+                return
+        for (task_id, person_id), op in pending.items():
+            task = tasks.get(task_id)
+            # Read after the notification, the task may have changed owner meanwhile
+            if task is not None and task.person_id != person_id:
+                task = None
+            for subscription in self.subscriptions.get(person_id, ()):
+                if categories is not None:
+                    subscription.categories = categories
+                subscription.push(task_id, task, created=op == "INSERT")
+
+    def stats(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "listening": self._connection is not None and not self._connection.is_closed(),
+            "streams": self.stream_count,
+            "max_streams": self.max_streams,
+            "persons": len(self.subscriptions),
+            "notifications": self.notifications,
+            "batches": self.batches,
+            "rejected": self.rejected,
+            "reconnects": self.reconnects,
+        }
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+task_changes = TaskChangeBroker(max_streams=LIVE_MAX_STREAMS, max_pending=LIVE_MAX_PENDING)
+
+
+def server_sent_event(data: str, event: str) -> str:
+    # Every line of the data gets its own field, a blank line ends the event
+    return f"event: {event}\n" + "".join(f"data: {line}\n" for line in data.splitlines()) + "\n"
+
+
+def render_changes(request: Request, subscription: Subscription) -> str:
+    """
+    Renders the pending changes of a stream as out of band swaps: the list item of every
+    updated task, a deletion for every deleted one, and a notice when tasks were created
+    or changes were dropped, since those need the list to be reloaded.
+    """
+    changes, created, stale = subscription.take()
+    parts = []
+    for task_id, task in changes.items():
+        if task is None:
+            parts.append(f'<li id="task-item-{task_id}" hx-swap-oob="delete"></li>')
+        else:
+            parts.append(templates.get_template("tasks/list_item.html").render(
+                request=request, task=task, categories=subscription.categories, states=State, swap_oob=True
+            ))
+    if created or stale:
+        parts.append(templates.get_template("tasks/live_notice.html").render(
+            request=request, created=created, stale=stale
+        ))
+    return "\n".join(parts)
+
+
+async def live_task_events(request: Request, person_id: int) -> AsyncIterator[str]:
+    """
+    The body of a live stream. It sends the changes as they come, a comment every
+    `LIVE_HEARTBEAT_SECONDS` so dead connections are noticed and proxies keep the live
+    ones open, and ends after `LIVE_IDLE_SECONDS` without changes or
+    `LIVE_MAX_STREAM_SECONDS` in total, when the browser reconnects and the user is
+    authenticated again. It subscribes only once the response is being sent, so the
+    subscription is always released however the stream ends.
+    """
+    started = last_change = time.monotonic()
+    subscription = task_changes.subscribe(person_id)
+    try:
+        yield f"retry: {RETRY_MILLISECONDS + random.randint(0, RETRY_MILLISECONDS)}\n\n"
+        while True:
+            now = time.monotonic()
+            if now - last_change > LIVE_IDLE_SECONDS or now - started > LIVE_MAX_STREAM_SECONDS:
+                return
+            try:
+                await asyncio.wait_for(subscription.ready.wait(), LIVE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            last_change = time.monotonic()
+            yield server_sent_event(render_changes(request, subscription), "task")
+    finally:
+        task_changes.unsubscribe(subscription)
@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import random
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+import jinja2
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, \
+    generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import METRICS_DIR, SQL_LOG_SAMPLE_RATE, templates, streaming_templates
+from models.connection import async_engine, engine, request_engine, streaming_engine, sync_streaming_engine
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# sqlc starts every statement with `-- name: <function> :<kind>`
+_STATEMENT_NAME = re.compile(r"--\s*name:\s*(\w+)")
+_FIRST_KEYWORD = re.compile(r"\s*(\w+)")
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the last byte of the response",
+    ["method", "route"],
+)
+REQUESTS = Counter("http_requests_total", "Responses sent", ["method", "route", "status"])
+# Labelled by method only, the route is not known until the request has been routed
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests being served", ["method"], multiprocess_mode="livesum"
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Database statements executed per request", ["route"], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_QUERY_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent executing database statements per request", ["route"]
+)
+QUERY_DURATION = Histogram("db_query_duration_seconds", "Time to execute a database statement", ["statement"])
+CONNECTIONS_IN_USE = Gauge(
+    "db_connections_in_use", "Pooled connections checked out", multiprocess_mode="livesum"
+)
+TEMPLATE_RENDER = Histogram("template_render_seconds", "Time to render a template", ["template"])
+
+
+def statement_name(statement: str) -> str:
+    """
+    Names a statement for the metrics and logs: the function sqlc generated for it, or
+    its first keyword, e.g. `begin`, for the statements written by hand.
+    """
+    match = _STATEMENT_NAME.match(statement) or _FIRST_KEYWORD.match(statement)
+    return match.group(1).lower() if match else "unknown"
+
+
+@dataclass
+class RequestQueries:
+    count: int = 0
+    seconds: float = 0.0
+
+
+# Statements executed while serving the current request, None outside of one
+_request_queries: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    connection.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - connection.info["query_start"].pop()
+    name = statement_name(statement)
+    QUERY_DURATION.labels(name).observe(seconds)
+    # SQLAlchemy runs the events of the async engines in the context of the calling task
+    queries = _request_queries.get()
+    if queries is not None:
+        queries.count += 1
+        queries.seconds += seconds
+    if SQL_LOG_SAMPLE_RATE and random.random() < SQL_LOG_SAMPLE_RATE:
+        logger.info(json.dumps({
+            "event": "sql", "statement": name, "duration_ms": round(seconds * 1000, 3),
+            "rows": cursor.rowcount, "executemany": executemany, "pid": os.getpid(),
+        }))
+
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(instrumented: Engine):
+    event.listen(instrumented, "before_cursor_execute", _before_cursor_execute)
+    event.listen(instrumented, "after_cursor_execute", _after_cursor_execute)
+    event.listen(instrumented, "handle_error", _handle_error)
+
+
+for instrumented_engine in (engine, async_engine.sync_engine, streaming_engine.sync_engine, sync_streaming_engine):
+    instrument_engine(instrumented_engine)
+
+
+@event.listens_for(request_engine.pool, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    CONNECTIONS_IN_USE.inc()
+
+
+@event.listens_for(request_engine.pool, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    CONNECTIONS_IN_USE.dec()
+
+
+class TimedTemplate(jinja2.Template):
+    """
+    A template that records how long it takes to render. Streamed templates are timed
+    until their last fragment, which includes the time spent waiting for the rows they
+    pull from the database.
+    """
+
+    def render(self, *args, **kwargs) -> str:
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            TEMPLATE_RENDER.labels(self.name or "<string>").observe(time.perf_counter() - start)
+
+    async def generate_async(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            async for fragment in super().generate_async(*args, **kwargs):
+                yield fragment
+        finally:
+            TEMPLATE_RENDER.labels(self.name or "<string>").observe(time.perf_counter() - start)
+
+
+for environment in (templates.env, streaming_templates.env):
+    environment.template_class = TimedTemplate
+    environment.cache.clear()
+
+
+def route_label(scope: Scope) -> str:
+    # The path template of the matched route, or the path of the mounted app, so that
+    # the number of label values stays bounded
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    return scope.get("root_path") or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, status and database statements of every HTTP request, and the
+    requests in progress. Event streams are counted but left out of the latency
+    histogram, as they stay open for as long as the page does.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        method = scope["method"]
+        queries = RequestQueries()
+        token = _request_queries.set(queries)
+        response = {"status": 500, "event_stream": False}
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+
+        async def send_with_metrics(message: Message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                content_type = Headers(raw=message["headers"]).get("content-type", "")
+                response["event_stream"] = content_type.startswith("text/event-stream")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            _request_queries.reset(token)
+            in_progress.dec()
+            route = route_label(scope)
+            REQUESTS.labels(method, route, str(response["status"])).inc()
+            if not response["event_stream"]:
+                REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - start)
+            REQUEST_QUERIES.labels(route).observe(queries.count)
+            REQUEST_QUERY_SECONDS.labels(route).observe(queries.seconds)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Renders the metrics in the Prometheus text format. With `PROMETHEUS_MULTIPROC_DIR`
+    set they are read from the files every worker writes there, so any worker answers
+    for all of them.
+    """
+    if METRICS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_stopped():
+    # Drops the live gauges of this worker, its counters and histograms are kept
+    if METRICS_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,93 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+import bcrypt
+from fastapi import HTTPException, status
+
+from config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE
+
+
+def _hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _check(password: bytes, password_hash: bytes) -> bool:
+    return bcrypt.checkpw(password, password_hash)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated process pool so that hashing never blocks the event loop.
+    At most `queue_size` operations may be waiting or running at once; beyond that
+    callers get an immediate 503 instead of queueing behind a login burst.
+    """
+
+    def __init__(self, workers: int, queue_size: int, rounds: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.rounds = rounds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def _run(self, function: Callable, *args):
+        if self.in_flight >= self.queue_size:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password operations in progress, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), function, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.in_flight -= 1
+            self.completed += 1
+            self.seconds_total += elapsed
+            self.seconds_max = max(self.seconds_max, elapsed)
+
+    async def hash(self, password: str) -> str:
+        password_hash = await self._run(_hash, password.encode('utf-8'), self.rounds)
+        return password_hash.decode('utf-8')
+
+    async def check(self, password_hash: str, entered_password: str) -> bool:
+        return await self._run(_check, entered_password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    def stats(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queue_depth": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "seconds_avg": self.seconds_total / self.completed if self.completed else 0.0,
+            "seconds_max": self.seconds_max,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=PASSWORD_HASH_WORKERS, queue_size=PASSWORD_HASH_QUEUE_SIZE, rounds=BCRYPT_ROUNDS
+)
@@ -0,0 +1,43 @@
+from typing import AsyncIterator, Optional
+
+from fastapi.responses import StreamingResponse
+
+from config import streaming_templates
+
+# Jinja yields a fragment per template node, a large page has hundreds of thousands of
+# them. They are joined into chunks of about this many characters before being sent
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+async def _join_fragments(fragments: AsyncIterator[str], chunk_size: int) -> AsyncIterator[str]:
+    chunk, size = [], 0
+    async for fragment in fragments:
+        chunk.append(fragment)
+        size += len(fragment)
+        if size >= chunk_size:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def stream_template(
+        name: str, context: dict, status_code: int = 200, headers: Optional[dict] = None
+) -> StreamingResponse:
+    """
+    Renders a template chunk by chunk while the response is being sent, instead of
+    building the whole page in memory first. Async iterables in the context are consumed
+    lazily by the template loops, so rows can be pulled from the database as the HTML is
+    flushed. The rendered fragments are sent in chunks of `STREAM_CHUNK_SIZE`.
+
+    :param name: Template name, relative to the templates directory.
+    :param context: Template context, it must contain the `request`.
+    :param status_code: Status code of the response.
+    :param headers: Extra response headers.
+    :return: A streaming HTML response.
+    """
+    template = streaming_templates.get_template(name)
+    return StreamingResponse(
+        _join_fragments(template.generate_async(context), STREAM_CHUNK_SIZE),
+        status_code=status_code, headers=headers, media_type="text/html"
+    )
@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import logging
+import math
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from concerns.cache import SharedCounter
+from config import REVOKED_TOKENS_PRUNE_INTERVAL
+from models.connection import connection_scope
+from models.revoked_tokens import AsyncQuerier
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings. Membership tests may return false positives at
+    roughly `error_rate` but never false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class TokenBlacklist:
+    """
+    Revoked token ids live in the `revoked_tokens` table, shared by every worker, until
+    the token expires. Each worker keeps a Bloom filter of the active ids, rebuilt when
+    the shared version changes, so a token that was never revoked is accepted without
+    touching the database. Only filter hits are confirmed with a query.
+    """
+
+    def __init__(self):
+        self._version = SharedCounter("revoked_tokens")
+        self._loaded_version: Optional[int] = None
+        self._filter = BloomFilter(0)
+
+    async def _refresh(self, connection: AsyncConnection):
+        version = self._version.value
+        if version == self._loaded_version:
+            return
+        querier = AsyncQuerier(connection)
+        token_ids = [token_id async for token_id in querier.get_active_revoked_token_ids()]
+        bloom_filter = BloomFilter(max(len(token_ids) * 2, 1024))
+        for token_id in token_ids:
+            bloom_filter.add(token_id)
+        self._filter, self._loaded_version = bloom_filter, version
+
+    async def is_revoked(self, connection: AsyncConnection, token_id: str) -> bool:
+        await self._refresh(connection)
+        if token_id not in self._filter:
+            return False
+        return bool(await AsyncQuerier(connection).is_token_revoked(jti=token_id))
+
+    async def revoke(self, connection: AsyncConnection, token_id: str, expires_at: datetime):
+        """
+        Stores the token id and notifies the other workers. Commits the connection first
+        so the workers that rebuild their filter see the new row.
+        """
+        await AsyncQuerier(connection).revoke_token(jti=token_id, expires_at=expires_at)
+        await connection.commit()
+        self._version.increment()
+
+    async def prune(self) -> int:
+        async with connection_scope() as connection:
+            deleted = await AsyncQuerier(connection).delete_expired_revoked_tokens()
+        if deleted:
+            self._version.increment()
+        return deleted
+
+    async def prune_periodically(self, interval: float = REVOKED_TOKENS_PRUNE_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.prune()
+            except Exception:
+                logger.exception("Could not prune the expired revoked tokens")
+
+
+token_blacklist = TokenBlacklist()
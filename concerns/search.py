@@ -0,0 +1,38 @@
+import re
+from typing import Optional
+
+from markupsafe import Markup, escape
+
+from config import templates, streaming_templates
+
+# Words of a search beyond this many are ignored, each one narrows the results further
+SEARCH_MAX_TERMS = 8
+# Markers `SearchTasksByUsername` wraps the matches of a snippet in, as they cannot be
+# confused with the HTML escaped description
+MATCH_START, MATCH_END = "\x02", "\x03"
+_SEARCH_TERM = re.compile(r"[^\W_]+")
+
+
+def search_query(text: str) -> Optional[str]:
+    """
+    Turns what the user typed into a `to_tsquery` expression matching the tasks that
+    contain every word, each one as a prefix, e.g. `impl tes` -> `impl:* & tes:*`. Only
+    letters and digits are kept, so the expression is always valid.
+
+    :param text: The search box content.
+    :return: The query, or None when there is no word to search for.
+    """
+    terms = _SEARCH_TERM.findall(text.lower())[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def highlight(snippet: str) -> Markup:
+    # Escaped first, the description is user input, then the markers become tags
+    escaped = str(escape(snippet))
+    return Markup(escaped.replace(MATCH_START, "<mark>").replace(MATCH_END, "</mark>"))
+
+
+for environment in (templates.env, streaming_templates.env):
+    environment.filters["highlight"] = highlight
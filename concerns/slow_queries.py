@@ -0,0 +1,167 @@
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from concerns.metrics import statement_name
+from config import SLOW_QUERY_SECONDS, SLOW_QUERY_EXPLAIN_RATE, SLOW_QUERY_LOG_SIZE
+from models.connection import async_engine, engine, streaming_engine, sync_streaming_engine
+
+logger = logging.getLogger(__name__)
+
+# Statements run with this execution option set to False are not logged, such as the EXPLAINs
+LOG_OPTION = "slow_query_log"
+EXPLAIN_TIMEOUT_MILLISECONDS = 10_000
+# Past every leading comment line, e.g. the name sqlc writes and the comments of the query
+_READ_STATEMENT = re.compile(r"\s*(?:--[^\n]*(?:\n|$)\s*)*(SELECT|WITH)\b", re.IGNORECASE)
+
+
+def bind_shape(value: Any) -> str:
+    """
+    Describes a bind parameter without its value, which may be user data: its type, and
+    its length for strings and arrays, e.g. `str[12]` or `int[250]`.
+    """
+    if value is None:
+        return "null"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, (list, tuple)):
+        element = next((type(item).__name__ for item in value if item is not None), "null")
+        return f"{element}[{len(value)}]"
+    return type(value).__name__
+
+
+def bind_shapes(parameters) -> Any:
+    if isinstance(parameters, dict):
+        return {key: bind_shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [bind_shape(value) for value in parameters]
+    return bind_shape(parameters)
+
+
+@dataclass
+class SlowQuery:
+    name: str
+    duration_ms: float
+    at: datetime
+    pid: int
+    sql: str
+    binds: Any
+    executemany: bool
+    # Filled in later for the sampled queries, `plan` or `explain_error`
+    plan: Optional[list[str]] = None
+    explain_error: Optional[str] = None
+    explained: bool = False
+
+
+class SlowQueryLog:
+    """
+    Keeps the last `size` statements of the worker that took longer than `threshold`
+    seconds, with the name sqlc gives them and the shape of their binds. A sample of the
+    reads is run again with `EXPLAIN (ANALYZE, BUFFERS)` in the background, one at a
+    time, on a separate read-only connection that is rolled back, so the plan capture
+    can neither write nor hold a pooled connection.
+    """
+
+    def __init__(self, threshold: float, explain_rate: float, size: int):
+        self.threshold = threshold
+        self.explain_rate = explain_rate
+        self.entries: deque[SlowQuery] = deque(maxlen=size)
+        self.recorded = 0
+        self.explains = 0
+        self._explaining = False
+
+    def instrument(self, instrumented: Engine):
+        event.listen(instrumented, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(instrumented, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(instrumented, "handle_error", self._handle_error)
+
+    def _before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    def _handle_error(self, exception_context):
+        connection = exception_context.connection
+        starts = connection.info.get("slow_query_start") if connection is not None else None
+        if starts:
+            starts.pop()
+
+    def _after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - connection.info["slow_query_start"].pop()
+        if seconds < self.threshold or not connection.get_execution_options().get(LOG_OPTION, True):
+            return
+        entry = SlowQuery(
+            name=statement_name(statement),
+            duration_ms=round(seconds * 1000, 3),
+            at=datetime.now(timezone.utc),
+            pid=os.getpid(),
+            sql=statement,
+            binds=bind_shapes(parameters),
+            executemany=executemany,
+        )
+        self.entries.append(entry)
+        self.recorded += 1
+        logger.warning("Slow query %s took %.1f ms", entry.name, entry.duration_ms)
+        if self._should_explain(statement, executemany):
+            # The async engines run their events on the event loop, the scripts using the
+            # sync engine have none and are never explained
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._explaining = True
+            # In a context of its own, so its statements are not counted for the request
+            loop.create_task(self._explain(entry, statement, parameters), context=contextvars.Context())
+
+    def _should_explain(self, statement: str, executemany: bool) -> bool:
+        if executemany or self._explaining or random.random() >= self.explain_rate:
+            return False
+        return _READ_STATEMENT.match(statement) is not None
+
+    async def _explain(self, entry: SlowQuery, statement: str, parameters):
+        try:
+            # The unpooled engine of the streams, so a slow plan never holds a pooled connection
+            async with streaming_engine.connect() as connection:
+                connection = await connection.execution_options(**{LOG_OPTION: False})
+                await connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+                await connection.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MILLISECONDS}")
+                result = await connection.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+                entry.plan = [row[0] for row in result]
+                await connection.rollback()
+        except Exception as error:
+            entry.explain_error = str(error)
+        finally:
+            entry.explained = True
+            self.explains += 1
+            self._explaining = False
+
+    def recent(self, limit: Optional[int] = None) -> list[SlowQuery]:
+        entries = list(reversed(self.entries))
+        return entries[:limit] if limit is not None else entries
+
+    def stats(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "threshold_ms": self.threshold * 1000,
+            "explain_rate": self.explain_rate,
+            "recorded": self.recorded,
+            "kept": len(self.entries),
+            "explains": self.explains,
+        }
+
+
+slow_queries = SlowQueryLog(
+    threshold=SLOW_QUERY_SECONDS, explain_rate=SLOW_QUERY_EXPLAIN_RATE, size=SLOW_QUERY_LOG_SIZE
+)
+
+for instrumented_engine in (engine, async_engine.sync_engine, streaming_engine.sync_engine, sync_streaming_engine):
+    slow_queries.instrument(instrumented_engine)
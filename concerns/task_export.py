@@ -0,0 +1,152 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, status
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from config import EXPORT_FETCH_SIZE, EXPORT_MAX_STREAMS
+from models.connection import streaming_scope
+from models.models import State
+from models.tasks import AsyncQuerier as Querier, ExportTasksByUsernameRow
+
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_COLUMNS = ("description", "category", "state", "expected_finished_at", "created_at")
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+class ExportLimiter:
+    """
+    Every export holds a connection outside the pool for as long as the client takes to
+    read it, so a worker streams at most `max_streams` exports at once, beyond that
+    callers get a 503 like the password hasher and the image processor.
+    """
+
+    def __init__(self, max_streams: int):
+        self.max_streams = max_streams
+        self.in_flight = 0
+        self.rejected = 0
+
+    def acquire(self):
+        """
+        :raises HTTPException: 503 when the worker already streams `max_streams` exports.
+        """
+        if self.in_flight >= self.max_streams:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many exports in progress, try again later",
+                headers={"Retry-After": "10"},
+            )
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+
+
+export_limiter = ExportLimiter(EXPORT_MAX_STREAMS)
+
+
+class ExportResponse(StreamingResponse):
+    """
+    Streams an export holding one of the slots of `export_limiter`, given back once the
+    response is sent or the client is gone, even if the body was never started.
+    """
+
+    def __init__(self, username: str, export_format: str):
+        export_limiter.acquire()
+        super().__init__(
+            export_tasks(username, export_format),
+            media_type=EXPORT_MEDIA_TYPES[export_format],
+            headers={"Content-Disposition": f'attachment; filename="tasks.{export_format}"'},
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            export_limiter.release()
+
+
+def _format_timestamp(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _to_record(row: ExportTasksByUsernameRow) -> tuple:
+    return (
+        row.description,
+        row.category,
+        # asyncpg returns the enum as its plain string value
+        State(row.state).value,
+        _format_timestamp(row.expected_finished_at),
+        _format_timestamp(row.created_at),
+    )
+
+
+class _CsvWriter:
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def header(self) -> str:
+        self.writer.writerow(EXPORT_COLUMNS)
+        return self.flush()
+
+    def write(self, record: tuple):
+        self.writer.writerow(record)
+
+    def flush(self) -> str:
+        content = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return content
+
+
+class _NdjsonWriter:
+    def __init__(self):
+        self.lines = []
+
+    def header(self) -> str:
+        return ""
+
+    def write(self, record: tuple):
+        self.lines.append(json.dumps(dict(zip(EXPORT_COLUMNS, record)), ensure_ascii=False) + "\n")
+
+    def flush(self) -> str:
+        content = "".join(self.lines)
+        self.lines.clear()
+        return content
+
+
+async def export_tasks(username: str, export_format: str) -> AsyncIterator[bytes]:
+    """
+    Streams all the tasks of a user, oldest first, in the columns `import_tasks` reads.
+    The rows come from a server-side cursor that fetches `EXPORT_FETCH_SIZE` rows per
+    round trip, and every fetched batch is serialized and sent before the next one is
+    requested, so memory stays flat whatever the number of tasks. The connection is
+    opened by the generator itself, outside the request pool, and closed as soon as the
+    last row is read.
+
+    :param username: Owner of the tasks.
+    :param export_format: Either "csv" or "ndjson".
+    :return: Async iterator of encoded chunks, one per fetched batch.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format {export_format}")
+    writer = _CsvWriter() if export_format == "csv" else _NdjsonWriter()
+    if header := writer.header():
+        yield header.encode("utf-8")
+    async with streaming_scope() as connection:
+        await connection.execution_options(yield_per=EXPORT_FETCH_SIZE)
+        pending = 0
+        async for row in Querier(connection).export_tasks_by_username(username=username):
+            writer.write(_to_record(row))
+            pending += 1
+            if pending == EXPORT_FETCH_SIZE:
+                yield writer.flush().encode("utf-8")
+                pending = 0
+    if content := writer.flush():
+        yield content.encode("utf-8")
@@ -0,0 +1,249 @@
+import csv
+import io
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from starlette.concurrency import run_in_threadpool
+
+from models.models import State
+
+IMPORT_FORMATS = ("csv", "ndjson")
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+STAGING_COLUMNS = ("line", "description", "category_name", "state", "expected_finished_at", "created_at")
+
+CREATE_STAGING_TABLE = """
+CREATE TEMPORARY TABLE task_import
+(
+    line                 INT  NOT NULL,
+    description          TEXT NOT NULL,
+    category_name        TEXT,
+    state                TEXT,
+    expected_finished_at TIMESTAMP,
+    created_at           TIMESTAMP
+) ON COMMIT DROP
+"""
+
+MERGE_CATEGORIES = """
+INSERT INTO categories (name, description)
+SELECT DISTINCT task_import.category_name, 'Imported category'
+FROM task_import
+WHERE task_import.category_name IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM categories WHERE categories.name = task_import.category_name)
+"""
+
+MERGE_TASKS = """
+INSERT INTO tasks (description, created_at, expected_finished_at, state, person_id, category_id)
+SELECT task_import.description,
+       COALESCE(task_import.created_at, CURRENT_TIMESTAMP),
+       task_import.expected_finished_at,
+       CAST(COALESCE(task_import.state, 'backlog') AS state),
+       :person_id,
+       category_ids.id
+FROM task_import
+         LEFT JOIN (SELECT DISTINCT ON (name) id, name FROM categories ORDER BY name, id) AS category_ids
+                   ON category_ids.name = task_import.category_name
+ORDER BY task_import.line
+"""
+
+STATES = {state.value for state in State}
+# Import files are decoded with errors="surrogateescape", every byte that is not UTF-8
+# becomes one of these, which decoded UTF-8 never contains
+UNDECODABLE = re.compile("[\udc80-\udcff]")
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    created_categories: int = 0
+    error_count: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+    def add_error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    if value in (None, ""):
+        return None
+    timestamp = datetime.fromisoformat(value)
+    # The columns are timestamps without time zone, which COPY cannot take an offset for
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def _parse_text(row: dict, name: str) -> Optional[str]:
+    value = (row.get(name) or "").strip()
+    # PostgreSQL text cannot hold NUL, one such value would fail the COPY of the whole batch
+    if "\x00" in value:
+        raise ValueError(f"{name} must not contain NUL characters")
+    return value or None
+
+
+def _to_record(line: int, row: dict) -> tuple:
+    # Checked first, the messages of the other checks may quote the value
+    if any(isinstance(value, str) and UNDECODABLE.search(value) for value in row.values()):
+        raise ValueError("the row is not valid UTF-8")
+    description = _parse_text(row, "description")
+    if not description:
+        raise ValueError("description is required")
+    state = row.get("state") or None
+    if state is not None and state not in STATES:
+        raise ValueError(f"state must be one of {', '.join(sorted(STATES))}")
+    return (
+        line,
+        description,
+        _parse_text(row, "category"),
+        state,
+        _parse_timestamp(row.get("expected_finished_at")),
+        _parse_timestamp(row.get("created_at")),
+    )
+
+
+def _csv_rows(stream: io.TextIOBase) -> Iterator[tuple[int, dict]]:
+    lines_read = 0
+
+    def lines() -> Iterator[str]:
+        nonlocal lines_read
+        for content in stream:
+            lines_read += 1
+            yield content
+
+    reader = csv.DictReader(lines())
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as error:
+            # e.g. a field over csv.field_size_limit, the reader goes on with the next line.
+            # Counted here, the reader does not count the line it failed on
+            yield lines_read, error
+            continue
+        yield reader.line_num, row
+
+
+def _ndjson_rows(stream: io.TextIOBase) -> Iterator[tuple[int, dict]]:
+    for line, content in enumerate(stream, start=1):
+        if not content.strip():
+            continue
+        try:
+            row = json.loads(content)
+        except json.JSONDecodeError as error:
+            yield line, error
+            continue
+        yield line, row if isinstance(row, dict) else ValueError("each line must be a JSON object")
+
+
+def parse_records(stream: io.TextIOBase, import_format: str, result: ImportResult) -> Iterator[tuple]:
+    """
+    Reads the import file row by row and yields the staging records of the valid ones,
+    recording why the others were skipped in `result`.
+
+    :param stream: Text stream with the CSV (with a header row) or NDJSON content.
+    :param import_format: Either "csv" or "ndjson".
+    :param result: Import result collecting the per-row errors.
+    :return: Iterator of records in `STAGING_COLUMNS` order.
+    """
+    rows: Iterable = _csv_rows(stream) if import_format == "csv" else _ndjson_rows(stream)
+    for line, row in rows:
+        if isinstance(row, Exception):
+            result.add_error(line, str(row))
+            continue
+        try:
+            yield _to_record(line, row)
+        except (ValueError, TypeError, AttributeError) as error:
+            result.add_error(line, str(error))
+
+
+def _copy_text_value(value) -> str:
+    # A field of the COPY text format
+    if value is None:
+        return "\\N"
+    value = value.isoformat() if isinstance(value, datetime) else str(value)
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class _CopyReader(io.TextIOBase):
+    """
+    The file `copy_expert` reads, fed from the records iterator as it is read, so the
+    whole file never sits in memory.
+    """
+
+    def __init__(self, records: Iterator[tuple]):
+        self._records = records
+        self._buffer = ""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            record = next(self._records, None)
+            if record is None:
+                break
+            self._buffer += "\t".join(_copy_text_value(value) for value in record) + "\n"
+        if size < 0:
+            size = len(self._buffer)
+        content, self._buffer = self._buffer[:size], self._buffer[size:]
+        return content
+
+
+def _copy_with_psycopg2(driver_connection, records: Iterator[tuple]):
+    with driver_connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY task_import ({', '.join(STAGING_COLUMNS)}) FROM STDIN", _CopyReader(records)
+        )
+
+
+async def import_tasks(
+        connection: AsyncConnection, person_id: int, stream: io.TextIOBase, import_format: str
+) -> ImportResult:
+    """
+    Imports the tasks of a CSV or NDJSON stream for a user. Valid rows are copied in
+    batches into a temporary staging table with `COPY FROM STDIN`, so memory stays flat
+    whatever the file size. Two set-based statements then create the categories that do
+    not exist yet and insert all staged tasks with their category ids resolved by name.
+    Invalid rows are reported in the result without aborting the import.
+
+    The caller owns the transaction and must commit it.
+
+    :param connection: Connection of `connection_scope`, asyncpg or psycopg2 underneath.
+    :param person_id: Owner of the imported tasks.
+    :param stream: Text stream with the file content.
+    :param import_format: Either "csv" or "ndjson".
+    :return: Counts of imported tasks and created categories, and the row errors.
+    """
+    if import_format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format {import_format}")
+    result = ImportResult()
+    await connection.execute(text(CREATE_STAGING_TABLE))
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+
+    records = parse_records(stream, import_format, result)
+
+    async def batches():
+        # Parsing reads the file, keep it off the event loop one batch at a time
+        while batch := await run_in_threadpool(lambda: list(islice(records, IMPORT_BATCH_SIZE))):
+            for record in batch:
+                yield record
+
+    if hasattr(driver_connection, "copy_records_to_table"):
+        await driver_connection.copy_records_to_table("task_import", records=batches(), columns=STAGING_COLUMNS)
+    else:
+        # psycopg2, with DATABASE_MODE=sync: the parsing and the COPY both run in the thread
+        await run_in_threadpool(_copy_with_psycopg2, driver_connection, records)
+    result.created_categories = (await connection.execute(text(MERGE_CATEGORIES))).rowcount
+    result.imported = (await connection.execute(text(MERGE_TASKS), {"person_id": person_id})).rowcount
+    return result
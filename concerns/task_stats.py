@@ -0,0 +1,59 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from concerns.category import category_cache
+from models.models import State
+from models.task_stats import AsyncQuerier
+
+
+def _empty_states() -> dict[str, int]:
+    return {state.value: 0 for state in State}
+
+
+@dataclass
+class CategoryTaskStats:
+    category_id: Optional[int]
+    name: str
+    states: dict[str, int] = field(default_factory=_empty_states)
+    total: int = 0
+
+
+@dataclass
+class TaskStats:
+    states: dict[str, int] = field(default_factory=_empty_states)
+    total: int = 0
+    categories: list[CategoryTaskStats] = field(default_factory=list)
+
+
+async def get_task_stats(connection: AsyncConnection, username: str) -> TaskStats:
+    """
+    Reads the task counts of a user per state and per category from `task_stats`, which
+    the triggers on `tasks` keep current, so the cost grows with the number of
+    categories rather than of tasks.
+
+    :param connection: Database connection used for the query.
+    :param username: Owner of the tasks.
+    :return: The totals per state, and per state of every category holding tasks, in
+        the order of the categories, those without a category last.
+    """
+    names = {category.id: category.name for category in await category_cache.get_all(connection)}
+    stats = TaskStats()
+    by_category: dict[Optional[int], CategoryTaskStats] = {}
+    async for row in AsyncQuerier(connection).get_task_stats_by_username(username=username):
+        category = by_category.get(row.category_id)
+        if category is None:
+            name = names.get(row.category_id, "No category")
+            category = by_category[row.category_id] = CategoryTaskStats(row.category_id, name)
+        # asyncpg returns the enum as its plain string value
+        state = State(row.state).value
+        category.states[state] += row.task_count
+        category.total += row.task_count
+        stats.states[state] += row.task_count
+        stats.total += row.task_count
+    position = {category_id: index for index, category_id in enumerate(names)}
+    stats.categories = sorted(
+        by_category.values(), key=lambda category: position.get(category.category_id, len(position))
+    )
+    return stats
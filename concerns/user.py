@@ -1,8 +1,52 @@
 import os
+import re
+from typing import Optional
 
-from config import PROFILE_PICS_DIR
+from jinja2 import pass_context
 
+from concerns.assets import asset_url
+from concerns.cache import LRUCache
+from concerns.images import image_directory
+from config import USER_CACHE_SIZE, USER_CACHE_TTL, templates, streaming_templates
 
-def get_profile_image_path(username: str, extension: str) -> str:
-    file_name = f"{username}.{extension}"
-    return os.path.join(PROFILE_PICS_DIR, file_name)
\ No newline at end of file
+DEFAULT_PROFILE_IMAGE = "static/resources/default.jpg"
+# Avatar urls change with the image, so browsers may keep them for as long as they like
+AVATAR_CACHE_CONTROL = "public, max-age=31536000, immutable"
+IMAGE_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+# Persons by username, shared by the requests of a worker. Writes to `persons` must call
+# `user_cache.evict(username)`, or `user_cache.invalidate()` for many users, after committing
+user_cache = LRUCache("users", max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def get_profile_image_path(image_path: Optional[str], size: str = "large") -> str:
+    """
+    Resolves the `image_path` of a user, the digest of the uploaded image, to the file of
+    one of its thumbnails (see `PROFILE_IMAGE_SIZES`). Images uploaded before thumbnails
+    existed are stored as a path and returned as is.
+    """
+    if not image_path:
+        return DEFAULT_PROFILE_IMAGE
+    if IMAGE_DIGEST.fullmatch(image_path):
+        return os.path.join(image_directory(image_path), f"{size}.jpg")
+    return image_path
+
+
+@pass_context
+def avatar_url(context, user, size: str = "large") -> str:
+    """
+    Template helper giving the url of a user's profile image. Uploaded images are served
+    by the `users:avatar` route under their digest, so a new upload changes the url and
+    the old one can be cached forever. Images uploaded before thumbnails existed are
+    served as static files, and users without an image get the default one.
+    """
+    image_path = user.image_path if user is not None else None
+    if image_path and IMAGE_DIGEST.fullmatch(image_path):
+        return str(context["request"].url_for("users:avatar", version=image_path, size=size))
+    if image_path:
+        return str(context["request"].url_for("static", path=image_path.removeprefix("static/")))
+    return asset_url(context, DEFAULT_PROFILE_IMAGE.removeprefix("static/"))
+
+
+for environment in (templates.env, streaming_templates.env):
+    environment.globals["avatar_url"] = avatar_url
@@ -6,12 +6,55 @@ from fastapi.templating import Jinja2Templates
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# "async" runs the handlers on asyncpg, "sync" on the psycopg2 engine in the thread pool
+DATABASE_MODE = os.getenv("DATABASE_MODE", "async")
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
+DATABASE_POOL_PRE_PING = os.getenv("DATABASE_POOL_PRE_PING", "false").lower() == "true"
+DATABASE_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", "-1"))
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "32"))
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+STATIC_DIR = "static"
+# Content hashed and precompressed copies written by `manage.py build-static`
+STATIC_BUILD_DIR = "static/dist"
 PROFILE_PICS_DIR = "static/profile_pics"
+PROFILE_IMAGE_MAX_BYTES = int(os.getenv("PROFILE_IMAGE_MAX_BYTES", str(5 * 1024 * 1024)))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "1"))
+IMAGE_QUEUE_SIZE = int(os.getenv("IMAGE_QUEUE_SIZE", "8"))
+MIGRATIONS_DIR = "db/migrations"
+CACHE_DIR = os.getenv("CACHE_DIR", "/tmp/entrega0-cache")
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+REVOKED_TOKENS_PRUNE_INTERVAL = float(os.getenv("REVOKED_TOKENS_PRUNE_INTERVAL", "600"))
 ENVIRONMENT = os.getenv("ENVIRONMENT")
 LOGIN_URL = "/users/login"
+TASKS_PAGE_SIZE = int(os.getenv("TASKS_PAGE_SIZE", "50"))
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "1000"))
+EXPORT_MAX_STREAMS = int(os.getenv("EXPORT_MAX_STREAMS", "4"))
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "500"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+LIVE_MAX_STREAMS = int(os.getenv("LIVE_MAX_STREAMS", "2000"))
+LIVE_MAX_PENDING = int(os.getenv("LIVE_MAX_PENDING", "100"))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "20"))
+LIVE_IDLE_SECONDS = float(os.getenv("LIVE_IDLE_SECONDS", "600"))
+LIVE_MAX_STREAM_SECONDS = float(os.getenv("LIVE_MAX_STREAM_SECONDS", "3600"))
+# Directory where every worker writes its metrics, read by prometheus_client itself
+METRICS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+SQL_LOG_SAMPLE_RATE = float(os.getenv("SQL_LOG_SAMPLE_RATE", "0.01"))
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "0.25"))
+SLOW_QUERY_EXPLAIN_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", "0.1"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "200"))
+# Users allowed to see the admin pages, comma separated
+ADMIN_USERNAMES = {username.strip() for username in os.getenv("ADMIN_USERNAMES", "").split(",") if username.strip()}
 
 templates = Jinja2Templates(directory="templates")
+# Same templates rendered with Jinja's async API, used to stream large pages
+streaming_templates = Jinja2Templates(directory="templates", enable_async=True)
 
@@ -0,0 +1,6 @@
+DROP INDEX tasks_category_id_idx;
+DROP INDEX tasks_person_id_category_id_created_at_id_idx;
+DROP INDEX tasks_person_id_created_at_id_idx;
+
+ALTER TABLE tasks
+    ALTER COLUMN created_at DROP NOT NULL;
@@ -0,0 +1,16 @@
+-- Keyset pagination walks tasks by (created_at, id), which requires created_at to be set
+UPDATE tasks
+SET created_at = CURRENT_TIMESTAMP
+WHERE created_at IS NULL;
+
+ALTER TABLE tasks
+    ALTER COLUMN created_at SET NOT NULL;
+
+-- GetTasksPageByUsername / GetTasksByUsername
+CREATE INDEX tasks_person_id_created_at_id_idx ON tasks (person_id, created_at, id);
+
+-- GetTasksPageByUsernameAndCategoryId / GetTaskUsernameAndByCategoryId
+CREATE INDEX tasks_person_id_category_id_created_at_id_idx ON tasks (person_id, category_id, created_at, id);
+
+-- Foreign key checks when a category is deleted
+CREATE INDEX tasks_category_id_idx ON tasks (category_id);
@@ -0,0 +1 @@
+DROP TABLE revoked_tokens;
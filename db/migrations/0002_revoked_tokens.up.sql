@@ -0,0 +1,8 @@
+-- Access tokens revoked on logout, shared by every worker until they expire
+CREATE TABLE revoked_tokens
+(
+    jti        TEXT PRIMARY KEY,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX revoked_tokens_expires_at_idx ON revoked_tokens (expires_at);
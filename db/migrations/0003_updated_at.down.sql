@@ -0,0 +1,11 @@
+DROP INDEX tasks_person_id_updated_at_id_idx;
+
+DROP TRIGGER categories_set_updated_at ON categories;
+DROP TRIGGER tasks_set_updated_at ON tasks;
+DROP FUNCTION set_updated_at();
+
+ALTER TABLE categories
+    DROP COLUMN updated_at;
+
+ALTER TABLE tasks
+    DROP COLUMN updated_at;
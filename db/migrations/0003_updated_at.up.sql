@@ -0,0 +1,31 @@
+-- Last modification time of every task and category, kept current by a trigger so that
+-- no query has to remember to set it. The pages use it to fingerprint what they show
+ALTER TABLE tasks
+    ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+ALTER TABLE categories
+    ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+CREATE FUNCTION set_updated_at() RETURNS trigger AS
+$$
+BEGIN
+    -- clock_timestamp, unlike CURRENT_TIMESTAMP, differs between the updates of one transaction
+    NEW.updated_at = clock_timestamp();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tasks_set_updated_at
+    BEFORE UPDATE
+    ON tasks
+    FOR EACH ROW
+EXECUTE FUNCTION set_updated_at();
+
+CREATE TRIGGER categories_set_updated_at
+    BEFORE UPDATE
+    ON categories
+    FOR EACH ROW
+EXECUTE FUNCTION set_updated_at();
+
+-- GetTaskPageFingerprint, read with an index only scan
+CREATE INDEX tasks_person_id_updated_at_id_idx ON tasks (person_id, updated_at, id);
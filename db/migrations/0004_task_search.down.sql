@@ -0,0 +1 @@
+DROP INDEX tasks_description_search_idx;
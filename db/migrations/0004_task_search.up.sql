@@ -0,0 +1,5 @@
+-- Full-text index of the task descriptions, used by SearchTasksByUsername. It indexes an
+-- expression rather than a stored tsvector column, which every `tasks.*` would return.
+-- The 'simple' configuration does not stem, so prefix queries match what was typed in
+-- any language
+CREATE INDEX tasks_description_search_idx ON tasks USING GIN (to_tsvector('simple', description));
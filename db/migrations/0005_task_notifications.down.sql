@@ -0,0 +1,2 @@
+DROP TRIGGER tasks_notify_change ON tasks;
+DROP FUNCTION notify_task_change();
@@ -0,0 +1,9 @@
+DROP TRIGGER tasks_stats_truncate ON tasks;
+DROP TRIGGER tasks_stats_delete ON tasks;
+DROP TRIGGER tasks_stats_update ON tasks;
+DROP TRIGGER tasks_stats_insert ON tasks;
+DROP FUNCTION rebuild_task_stats();
+DROP FUNCTION clear_task_stats();
+DROP FUNCTION apply_task_stats_delta();
+
+DROP TABLE task_stats;
@@ -0,0 +1,109 @@
+-- Number of tasks of every person per category and state, so the counts never need a
+-- GROUP BY over tasks. Statement level triggers apply the change of each statement as a
+-- delta, once per affected (person, category, state). Rows that drop to zero are kept.
+-- A task without a category is counted under a NULL category_id
+CREATE TABLE task_stats
+(
+    person_id   INT   NOT NULL,
+    category_id INT,
+    state       state NOT NULL,
+    task_count  INT   NOT NULL,
+    CONSTRAINT task_stats_person_id_category_id_state_key UNIQUE NULLS NOT DISTINCT (person_id, category_id, state)
+);
+
+CREATE FUNCTION apply_task_stats_delta() RETURNS trigger AS
+$$
+BEGIN
+    -- Rows are upserted in key order, so concurrent statements lock them in the same order
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO task_stats (person_id, category_id, state, task_count)
+        SELECT person_id, category_id, state, count(*)
+        FROM new_tasks
+        WHERE person_id IS NOT NULL
+        GROUP BY person_id, category_id, state
+        ORDER BY person_id, category_id, state
+        ON CONFLICT (person_id, category_id, state) DO UPDATE SET task_count = task_stats.task_count + excluded.task_count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO task_stats (person_id, category_id, state, task_count)
+        SELECT person_id, category_id, state, -count(*)
+        FROM old_tasks
+        WHERE person_id IS NOT NULL
+        GROUP BY person_id, category_id, state
+        ORDER BY person_id, category_id, state
+        ON CONFLICT (person_id, category_id, state) DO UPDATE SET task_count = task_stats.task_count + excluded.task_count;
+    ELSE
+        INSERT INTO task_stats (person_id, category_id, state, task_count)
+        SELECT person_id, category_id, state, sum(delta)
+        FROM (SELECT person_id, category_id, state, 1 AS delta
+              FROM new_tasks
+              UNION ALL
+              SELECT person_id, category_id, state, -1 AS delta
+              FROM old_tasks) AS changes
+        WHERE person_id IS NOT NULL
+        GROUP BY person_id, category_id, state
+        -- Updates that leave the three columns alone, e.g. of the description, write nothing
+        HAVING sum(delta) <> 0
+        ORDER BY person_id, category_id, state
+        ON CONFLICT (person_id, category_id, state) DO UPDATE SET task_count = task_stats.task_count + excluded.task_count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- A trigger with transition tables can only fire on one kind of event
+CREATE TRIGGER tasks_stats_insert
+    AFTER INSERT
+    ON tasks
+    REFERENCING NEW TABLE AS new_tasks
+    FOR EACH STATEMENT
+EXECUTE FUNCTION apply_task_stats_delta();
+
+CREATE TRIGGER tasks_stats_update
+    AFTER UPDATE
+    ON tasks
+    REFERENCING OLD TABLE AS old_tasks NEW TABLE AS new_tasks
+    FOR EACH STATEMENT
+EXECUTE FUNCTION apply_task_stats_delta();
+
+CREATE TRIGGER tasks_stats_delete
+    AFTER DELETE
+    ON tasks
+    REFERENCING OLD TABLE AS old_tasks
+    FOR EACH STATEMENT
+EXECUTE FUNCTION apply_task_stats_delta();
+
+CREATE FUNCTION clear_task_stats() RETURNS trigger AS
+$$
+BEGIN
+    DELETE FROM task_stats;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tasks_stats_truncate
+    AFTER TRUNCATE
+    ON tasks
+    FOR EACH STATEMENT
+EXECUTE FUNCTION clear_task_stats();
+
+-- Recounts every task, for the initial fill and for `manage.py task-stats --rebuild`.
+-- Writes to tasks wait until the transaction calling it ends, so no task is missed or
+-- counted twice
+CREATE FUNCTION rebuild_task_stats() RETURNS bigint AS
+$$
+DECLARE
+    inserted bigint;
+BEGIN
+    LOCK TABLE tasks IN SHARE ROW EXCLUSIVE MODE;
+    DELETE FROM task_stats;
+    INSERT INTO task_stats (person_id, category_id, state, task_count)
+    SELECT person_id, category_id, state, count(*)
+    FROM tasks
+    WHERE person_id IS NOT NULL
+    GROUP BY person_id, category_id, state;
+    GET DIAGNOSTICS inserted = ROW_COUNT;
+    RETURN inserted;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_task_stats();
@@ -0,0 +1,13 @@
+CREATE INDEX tasks_person_id_updated_at_id_idx ON tasks (person_id, updated_at, id);
+
+DROP TRIGGER categories_version ON categories;
+DROP TRIGGER tasks_versions_truncate ON tasks;
+DROP TRIGGER tasks_versions_delete ON tasks;
+DROP TRIGGER tasks_versions_update ON tasks;
+DROP TRIGGER tasks_versions_insert ON tasks;
+DROP FUNCTION bump_category_version();
+DROP FUNCTION bump_all_task_versions();
+DROP FUNCTION bump_task_versions();
+
+DROP TABLE category_versions;
+DROP TABLE task_versions;
@@ -0,0 +1,107 @@
+-- Versions of the data the task and category pages show, which their ETags are built
+-- from. Statement level triggers bump them in the transaction of the write, so a page
+-- reads them by primary key instead of hashing every task and category, and never sees
+-- a version before the rows it stands for are committed. A person without a row has
+-- never had a task written, their version is 0
+CREATE TABLE task_versions
+(
+    person_id INT PRIMARY KEY,
+    version   BIGINT NOT NULL
+);
+
+-- A single row, every write to categories shows on every page
+CREATE TABLE category_versions
+(
+    id      BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL
+);
+
+INSERT INTO category_versions (version)
+VALUES (0);
+
+CREATE FUNCTION bump_task_versions() RETURNS trigger AS
+$$
+BEGIN
+    -- Once per affected person, in key order like the task_stats upserts. An update moving
+    -- a task to another person bumps both
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO task_versions (person_id, version)
+        SELECT DISTINCT person_id, 1
+        FROM new_tasks
+        WHERE person_id IS NOT NULL
+        ORDER BY person_id
+        ON CONFLICT (person_id) DO UPDATE SET version = task_versions.version + 1;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO task_versions (person_id, version)
+        SELECT DISTINCT person_id, 1
+        FROM old_tasks
+        WHERE person_id IS NOT NULL
+        ORDER BY person_id
+        ON CONFLICT (person_id) DO UPDATE SET version = task_versions.version + 1;
+    ELSE
+        INSERT INTO task_versions (person_id, version)
+        SELECT person_id, 1
+        FROM (SELECT person_id
+              FROM new_tasks
+              UNION
+              SELECT person_id
+              FROM old_tasks) AS changes
+        WHERE person_id IS NOT NULL
+        ORDER BY person_id
+        ON CONFLICT (person_id) DO UPDATE SET version = task_versions.version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tasks_versions_insert
+    AFTER INSERT
+    ON tasks
+    REFERENCING NEW TABLE AS new_tasks
+    FOR EACH STATEMENT
+EXECUTE FUNCTION bump_task_versions();
+
+CREATE TRIGGER tasks_versions_update
+    AFTER UPDATE
+    ON tasks
+    REFERENCING OLD TABLE AS old_tasks NEW TABLE AS new_tasks
+    FOR EACH STATEMENT
+EXECUTE FUNCTION bump_task_versions();
+
+CREATE TRIGGER tasks_versions_delete
+    AFTER DELETE
+    ON tasks
+    REFERENCING OLD TABLE AS old_tasks
+    FOR EACH STATEMENT
+EXECUTE FUNCTION bump_task_versions();
+
+CREATE FUNCTION bump_all_task_versions() RETURNS trigger AS
+$$
+BEGIN
+    UPDATE task_versions SET version = version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tasks_versions_truncate
+    AFTER TRUNCATE
+    ON tasks
+    FOR EACH STATEMENT
+EXECUTE FUNCTION bump_all_task_versions();
+
+CREATE FUNCTION bump_category_version() RETURNS trigger AS
+$$
+BEGIN
+    UPDATE category_versions SET version = version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER categories_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+    ON categories
+    FOR EACH STATEMENT
+EXECUTE FUNCTION bump_category_version();
+
+-- Only the hashed fingerprint the versions replace read it
+DROP INDEX tasks_person_id_updated_at_id_idx;
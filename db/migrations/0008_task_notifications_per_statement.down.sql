@@ -0,0 +1,30 @@
+DROP TRIGGER tasks_notify_delete ON tasks;
+DROP TRIGGER tasks_notify_update ON tasks;
+DROP TRIGGER tasks_notify_insert ON tasks;
+DROP FUNCTION notify_task_changes();
+DROP FUNCTION task_changes_payload(int, int[], int[], int[]);
+
+CREATE FUNCTION notify_task_change() RETURNS trigger AS
+$$
+DECLARE
+    task RECORD;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        task = OLD;
+    ELSE
+        task = NEW;
+    END IF;
+    PERFORM pg_notify('task_changes', json_build_object('op', TG_OP, 'id', task.id, 'person_id', task.person_id)::text);
+    -- A task handed to another person disappears from the list of the previous owner
+    IF TG_OP = 'UPDATE' AND OLD.person_id IS DISTINCT FROM NEW.person_id THEN
+        PERFORM pg_notify('task_changes', json_build_object('op', 'DELETE', 'id', OLD.id, 'person_id', OLD.person_id)::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tasks_notify_change
+    AFTER INSERT OR UPDATE OR DELETE
+    ON tasks
+    FOR EACH ROW
+EXECUTE FUNCTION notify_task_change();
@@ -0,0 +1,74 @@
+-- Replaces the row level notifications of 0005, which sent one NOTIFY per task and
+-- flooded the listeners on bulk updates, bulk deletes and imports. Statement level
+-- triggers send one notification per person whose tasks a statement changed, with the
+-- ids created, updated and deleted. Past 500 ids, which may not fit in the 8000 bytes of
+-- a payload, only `stale` is sent and the pages ask for a reload
+DROP TRIGGER tasks_notify_change ON tasks;
+DROP FUNCTION notify_task_change();
+
+CREATE FUNCTION task_changes_payload(person_id int, inserted int[], updated int[], deleted int[]) RETURNS text AS
+$$
+SELECT CASE
+           WHEN coalesce(cardinality(inserted), 0) + coalesce(cardinality(updated), 0) +
+                coalesce(cardinality(deleted), 0) > 500
+               THEN json_build_object('person_id', person_id, 'stale', TRUE)
+           ELSE json_build_object('person_id', person_id,
+                                  'inserted', coalesce(inserted, '{}'),
+                                  'updated', coalesce(updated, '{}'),
+                                  'deleted', coalesce(deleted, '{}'))
+           END::text
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE FUNCTION notify_task_changes() RETURNS trigger AS
+$$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('task_changes', task_changes_payload(person_id, array_agg(id ORDER BY id), NULL, NULL))
+        FROM new_tasks
+        WHERE person_id IS NOT NULL
+        GROUP BY person_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('task_changes', task_changes_payload(person_id, NULL, NULL, array_agg(id ORDER BY id)))
+        FROM old_tasks
+        WHERE person_id IS NOT NULL
+        GROUP BY person_id;
+    ELSE
+        -- A task handed to another person disappears from the list of the previous owner
+        PERFORM pg_notify('task_changes', task_changes_payload(
+                person_id, NULL,
+                array_agg(id ORDER BY id) FILTER (WHERE NOT moved_away),
+                array_agg(id ORDER BY id) FILTER (WHERE moved_away)))
+        FROM (SELECT new_tasks.id, new_tasks.person_id, FALSE AS moved_away
+              FROM new_tasks
+              UNION ALL
+              SELECT old_tasks.id, old_tasks.person_id, TRUE AS moved_away
+              FROM old_tasks
+                       JOIN new_tasks ON new_tasks.id = old_tasks.id
+              WHERE old_tasks.person_id IS DISTINCT FROM new_tasks.person_id) AS changes
+        WHERE person_id IS NOT NULL
+        GROUP BY person_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tasks_notify_insert
+    AFTER INSERT
+    ON tasks
+    REFERENCING NEW TABLE AS new_tasks
+    FOR EACH STATEMENT
+EXECUTE FUNCTION notify_task_changes();
+
+CREATE TRIGGER tasks_notify_update
+    AFTER UPDATE
+    ON tasks
+    REFERENCING OLD TABLE AS old_tasks NEW TABLE AS new_tasks
+    FOR EACH STATEMENT
+EXECUTE FUNCTION notify_task_changes();
+
+CREATE TRIGGER tasks_notify_delete
+    AFTER DELETE
+    ON tasks
+    REFERENCING OLD TABLE AS old_tasks
+    FOR EACH STATEMENT
+EXECUTE FUNCTION notify_task_changes();
@@ -12,6 +12,11 @@ SELECT *
 FROM categories
 WHERE categories.id = $1;
 
+-- name: CategoryExists :one
+SELECT EXISTS(SELECT 1
+              FROM categories
+              WHERE id = $1);
+
 -- name: UpdateCategory :one
 UPDATE categories
 SET name        = $2,
@@ -23,4 +28,8 @@ RETURNING *;
 DELETE
 FROM categories
 WHERE id = $1
-RETURNING *;
\ No newline at end of file
+RETURNING *;
+
+-- name: GetCategoriesFingerprint :one
+SELECT version
+FROM category_versions;
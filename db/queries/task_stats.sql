@@ -0,0 +1,27 @@
+-- name: GetTaskStatsByUsername :many
+SELECT task_stats.category_id, task_stats.state, task_stats.task_count
+FROM task_stats
+         JOIN persons ON task_stats.person_id = persons.id AND persons.username = $1
+WHERE task_stats.task_count <> 0;
+
+-- name: CheckTaskStats :many
+-- Every count of task_stats that differs from a recount of tasks. Categories are
+-- compared through coalesce, FULL JOIN only accepts hashable or mergeable conditions
+SELECT coalesce(stored.person_id, actual.person_id)     AS person_id,
+       coalesce(stored.category_id, actual.category_id) AS category_id,
+       coalesce(stored.state, actual.state)             AS state,
+       coalesce(stored.task_count, 0)                   AS stored_count,
+       coalesce(actual.task_count, 0)                   AS actual_count
+FROM task_stats AS stored
+         FULL JOIN (SELECT person_id, category_id, state, count(*) AS task_count
+                    FROM tasks
+                    WHERE person_id IS NOT NULL
+                    GROUP BY person_id, category_id, state) AS actual
+                   ON stored.person_id = actual.person_id
+                       AND coalesce(stored.category_id, 0) = coalesce(actual.category_id, 0)
+                       AND stored.state = actual.state
+WHERE coalesce(stored.task_count, 0) <> coalesce(actual.task_count, 0)
+ORDER BY 1, 2, 3;
+
+-- name: RebuildTaskStats :one
+SELECT rebuild_task_stats();
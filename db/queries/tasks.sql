@@ -4,12 +4,27 @@ FROM tasks
          JOIN persons ON tasks.person_id = persons.id AND persons.username = $1;
 
 
+-- name: GetTasksPageByUsername :many
+SELECT tasks.*
+FROM tasks
+         JOIN persons ON tasks.person_id = persons.id AND persons.username = sqlc.arg(username)
+WHERE (tasks.created_at, tasks.id) < (CAST(sqlc.arg(before_created_at) AS timestamp), CAST(sqlc.arg(before_id) AS int))
+ORDER BY tasks.created_at DESC, tasks.id DESC
+LIMIT sqlc.arg(page_size);
+
+
 -- name: GetTaskById :one
 SELECT *
 FROM tasks
 WHERE id = $1;
 
 
+-- name: GetTasksByIds :many
+SELECT *
+FROM tasks
+WHERE id = ANY (CAST(sqlc.arg(ids) AS int[]));
+
+
 -- name: GetTaskUsernameAndByCategoryId :many
 SELECT tasks.*
 FROM tasks
@@ -17,9 +32,19 @@ FROM tasks
 WHERE tasks.category_id = $2;
 
 
+-- name: GetTasksPageByUsernameAndCategoryId :many
+SELECT tasks.*
+FROM tasks
+         JOIN persons ON tasks.person_id = persons.id AND persons.username = sqlc.arg(username)
+WHERE tasks.category_id = sqlc.arg(category_id)
+  AND (tasks.created_at, tasks.id) < (CAST(sqlc.arg(before_created_at) AS timestamp), CAST(sqlc.arg(before_id) AS int))
+ORDER BY tasks.created_at DESC, tasks.id DESC
+LIMIT sqlc.arg(page_size);
+
+
 -- name: CreateTask :one
-         INSERT INTO tasks (description, person_id, category_id)
-VALUES ($1, $2, $3) RETURNING *;
+INSERT INTO tasks (description, person_id, category_id, state, expected_finished_at)
+VALUES ($1, $2, $3, $4, $5) RETURNING *;
 
 
 -- name: UpdateTask :one
@@ -38,3 +63,105 @@ FROM tasks
 WHERE id = $1
 RETURNING *;
 
+
+
+-- name: GetTaskPageView :one
+WITH person AS (SELECT *
+                FROM persons
+                WHERE persons.username = sqlc.arg(username)),
+     page AS ((SELECT tasks.*
+               FROM tasks
+                        JOIN person ON tasks.person_id = person.id
+               WHERE CAST(sqlc.narg(category_id) AS int) IS NULL
+                 AND (tasks.created_at, tasks.id) < (CAST(sqlc.arg(before_created_at) AS timestamp), CAST(sqlc.arg(before_id) AS int))
+               ORDER BY tasks.created_at DESC, tasks.id DESC
+               LIMIT sqlc.arg(page_size))
+              UNION ALL
+              (SELECT tasks.*
+               FROM tasks
+                        JOIN person ON tasks.person_id = person.id
+               WHERE tasks.category_id = sqlc.narg(category_id)
+                 AND (tasks.created_at, tasks.id) < (CAST(sqlc.arg(before_created_at) AS timestamp), CAST(sqlc.arg(before_id) AS int))
+               ORDER BY tasks.created_at DESC, tasks.id DESC
+               LIMIT sqlc.arg(page_size)))
+SELECT person.id,
+       person.username,
+       person.email,
+       person.password_hash,
+       person.image_path,
+       (SELECT json_agg(categories ORDER BY categories.id) FROM categories)          AS categories,
+       (SELECT json_agg(page ORDER BY page.created_at DESC, page.id DESC) FROM page) AS tasks,
+       COALESCE(task_versions.version, 0)                                            AS task_version,
+       category_versions.version                                                     AS category_version
+FROM person
+         LEFT JOIN task_versions ON task_versions.person_id = person.id
+         CROSS JOIN category_versions;
+
+
+-- name: BulkSetTaskState :many
+UPDATE tasks
+SET state = sqlc.arg(state)
+WHERE id = ANY (CAST(sqlc.arg(ids) AS int[]))
+  AND person_id = sqlc.arg(person_id)
+RETURNING *;
+
+
+-- name: BulkMoveTasksToCategory :many
+UPDATE tasks
+SET category_id = sqlc.arg(category_id)
+WHERE id = ANY (CAST(sqlc.arg(ids) AS int[]))
+  AND person_id = sqlc.arg(person_id)
+RETURNING *;
+
+
+-- name: BulkDeleteTasks :many
+DELETE
+FROM tasks
+WHERE id = ANY (CAST(sqlc.arg(ids) AS int[]))
+  AND person_id = sqlc.arg(person_id)
+RETURNING id;
+
+
+-- name: ExportTasksByUsername :many
+SELECT tasks.description,
+       categories.name AS category,
+       tasks.state,
+       tasks.expected_finished_at,
+       tasks.created_at
+FROM tasks
+         JOIN persons ON tasks.person_id = persons.id AND persons.username = $1
+         LEFT JOIN categories ON tasks.category_id = categories.id
+ORDER BY tasks.created_at, tasks.id;
+
+
+-- name: GetTaskPageFingerprint :one
+SELECT persons.id,
+       COALESCE(task_versions.version, 0) AS task_version,
+       category_versions.version          AS category_version
+FROM persons
+         LEFT JOIN task_versions ON task_versions.person_id = persons.id
+         CROSS JOIN category_versions
+WHERE persons.username = $1;
+
+
+-- name: SearchTasksByUsername :many
+-- Ranked full-text search, paged by the (rank, id) keyset of the last result shown.
+-- Snippets are only built for the page, and mark the matches with \x02 and \x03
+WITH matches AS (SELECT tasks.id,
+                        ts_rank(to_tsvector('simple', tasks.description), query) AS rank
+                 FROM tasks
+                          JOIN persons ON tasks.person_id = persons.id AND persons.username = sqlc.arg(username),
+                      to_tsquery('simple', sqlc.arg(query)) AS query
+                 WHERE to_tsvector('simple', tasks.description) @@ query),
+     page AS (SELECT matches.id, matches.rank
+              FROM matches
+              WHERE (matches.rank, matches.id) < (CAST(sqlc.arg(before_rank) AS real), CAST(sqlc.arg(before_id) AS int))
+              ORDER BY matches.rank DESC, matches.id DESC
+              LIMIT sqlc.arg(page_size))
+SELECT tasks.*,
+       page.rank,
+       ts_headline('simple', tasks.description, to_tsquery('simple', sqlc.arg(query)),
+                   'MaxFragments=2, MaxWords=20, MinWords=8, StartSel=' || chr(2) || ', StopSel=' || chr(3)) AS snippet
+FROM page
+         JOIN tasks ON tasks.id = page.id
+ORDER BY page.rank DESC, page.id DESC;
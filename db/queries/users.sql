@@ -21,3 +21,19 @@ FROM persons
 WHERE username = $1;
 
 
+
+
+-- name: CountImagePathReferences :one
+SELECT count(*)
+FROM persons
+WHERE image_path = $1;
+
+-- name: GetImagePaths :many
+SELECT DISTINCT image_path
+FROM persons
+WHERE image_path IS NOT NULL;
+
+-- name: ReplaceImagePath :exec
+UPDATE persons
+SET image_path = $1
+WHERE image_path = $2;
@@ -0,0 +1,30 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
+
+from concerns.authentication import get_admin_username
+from concerns.slow_queries import slow_queries
+
+# Only the users listed in ADMIN_USERNAMES get past `get_admin_username`
+admin_router = APIRouter(prefix="/admin", tags=["Admin"], default_response_class=ORJSONResponse)
+
+
+@admin_router.get("/slow-queries", name="admin:slow_queries")
+async def read_slow_queries(
+        name: Optional[str] = None,
+        limit: int = Query(50, ge=1, le=1000),
+        username: str = Depends(get_admin_username)
+):
+    """
+    Lists the slowest recent statements of the worker process that serves the request,
+    newest first, with their sqlc name, duration, bind shapes and, for the sampled reads,
+    the `EXPLAIN (ANALYZE, BUFFERS)` plan.
+
+    :param name: Only list the statements with this sqlc name, e.g. `get_tasks_by_username`.
+    :param limit: How many statements to list at most.
+    :param username: The username of the authenticated admin.
+    :return: The log settings and counters, and the statements.
+    """
+    entries = [entry for entry in slow_queries.recent() if name is None or entry.name == name]
+    return ORJSONResponse({**slow_queries.stats(), "queries": entries[:limit]})
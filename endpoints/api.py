@@ -0,0 +1,273 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel
+
+from concerns.authentication import get_api_user, get_api_username, check_password, create_access_token
+from concerns.category import category_cache
+from concerns.task_stats import get_task_stats
+from config import TASKS_PAGE_SIZE
+from models import models
+from models.categories import AsyncQuerier as CategoryQuerier
+from models.connection import get_connection
+from models.models import State
+from models.tasks import AsyncQuerier as TaskQuerier, CreateTaskParams, UpdateTaskParams, GetTasksPageByUsernameAndCategoryIdParams
+from models.users import AsyncQuerier as UserQuerier
+
+# Responses are built from the sqlc dataclasses with orjson, which serializes dataclasses,
+# datetimes and enums natively, so no pydantic model is involved on the way out
+api_router = APIRouter(prefix="/api/v1", tags=["API"], default_response_class=ORJSONResponse)
+
+API_MAX_PAGE_SIZE = 500
+
+
+class TokenParameters(BaseModel):
+    username: str
+    password: str
+
+
+class TaskParameters(BaseModel):
+    description: str
+    expected_finished_at: Optional[datetime] = None
+    state: State = State.BACKLOG
+    category_id: Optional[int] = None
+
+
+class CategoryParameters(BaseModel):
+    name: str
+    description: str
+
+
+async def get_owned_task(task_id: int, connection, user: models.Person) -> models.Task:
+    task = await TaskQuerier(connection).get_task_by_id(id=task_id)
+    # Tasks of other users are reported as missing, not as forbidden
+    if task is None or task.person_id != user.id:
+        raise HTTPException(status_code=404, detail=f"Task with ID {task_id} not found.")
+    return task
+
+
+async def check_category(category_id: Optional[int], connection):
+    # Checked before writing, a missing category would otherwise fail the foreign key
+    if category_id is not None and not await CategoryQuerier(connection).category_exists(id=category_id):
+        raise HTTPException(status_code=404, detail=f"Category with ID {category_id} not found.")
+
+
+@api_router.post("/token", name="api:token")
+async def create_token(parameters: TokenParameters, connection=Depends(get_connection)):
+    """
+    Exchanges a username and password for a bearer token to use with the rest of the API.
+
+    :param parameters: The credentials of the user.
+    :param connection: The database connection dependency, used to query the user data.
+    :return: The access token and its type.
+    :raises HTTPException: 401 when the username or password is invalid.
+    """
+    password_hash = await UserQuerier(connection).get_password_hash(username=parameters.username)
+    if not password_hash or not await check_password(password_hash, parameters.password):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token = create_access_token(data={"sub": parameters.username})
+    return ORJSONResponse({"access_token": access_token, "token_type": "bearer"})
+
+
+@api_router.get("/tasks", name="api:tasks")
+async def list_tasks(
+        category_id: Optional[int] = None,
+        before_created_at: Optional[datetime] = None,
+        before_id: Optional[int] = None,
+        limit: int = Query(TASKS_PAGE_SIZE, ge=1, le=API_MAX_PAGE_SIZE),
+        connection=Depends(get_connection),
+        username: str = Depends(get_api_username)
+):
+    """
+    Lists the tasks of the current user, newest first, one keyset page at a time. The
+    `next` object of the response holds the `before_created_at` and `before_id`
+    parameters of the following page, and is null on the last one.
+
+    :param category_id: When given, only tasks of this category are listed.
+    :param before_created_at: Creation date of the last task of the previous page.
+    :param before_id: ID of the last task of the previous page.
+    :param limit: Maximum number of tasks in the page.
+    :param connection: The database connection dependency.
+    :param username: The username of the current authenticated user.
+    :return: The page of tasks and the cursor of the next one.
+    """
+    if before_created_at is None or before_id is None:
+        before_created_at, before_id = datetime.max, 0
+    querier = TaskQuerier(connection)
+    if category_id is None:
+        rows = querier.get_tasks_page_by_username(
+            username=username, before_created_at=before_created_at, before_id=before_id, page_size=limit + 1
+        )
+    else:
+        rows = querier.get_tasks_page_by_username_and_category_id(GetTasksPageByUsernameAndCategoryIdParams(
+            username=username,
+            category_id=category_id,
+            before_created_at=before_created_at,
+            before_id=before_id,
+            page_size=limit + 1,
+        ))
+    tasks = [task async for task in rows]
+    next_page = None
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        next_page = {"before_created_at": tasks[-1].created_at, "before_id": tasks[-1].id}
+    return ORJSONResponse({"tasks": tasks, "next": next_page})
+
+
+@api_router.get("/tasks/{task_id}", name="api:task")
+async def get_task(task_id: int, connection=Depends(get_connection), user=Depends(get_api_user)):
+    """
+    Returns one task of the current user.
+
+    :param task_id: The unique identifier of the task.
+    :param connection: The database connection dependency.
+    :param user: The current authenticated user.
+    :return: The task.
+    :raises HTTPException: 404 when the task does not exist or belongs to another user.
+    """
+    return ORJSONResponse(await get_owned_task(task_id, connection, user))
+
+
+@api_router.post("/tasks", name="api:create_task", status_code=201)
+async def create_task(parameters: TaskParameters, connection=Depends(get_connection), user=Depends(get_api_user)):
+    """
+    Creates a task for the current user.
+
+    :param parameters: Description, category and optionally state and expected finish date.
+    :param connection: The database connection dependency.
+    :param user: The current authenticated user, owner of the task.
+    :return: The created task.
+    :raises HTTPException: 404 when the category does not exist.
+    """
+    await check_category(parameters.category_id, connection)
+    task = await TaskQuerier(connection).create_task(CreateTaskParams(
+        description=parameters.description,
+        person_id=user.id,
+        category_id=parameters.category_id,
+        state=parameters.state,
+        expected_finished_at=parameters.expected_finished_at,
+    ))
+    return ORJSONResponse(task, status_code=201)
+
+
+@api_router.put("/tasks/{task_id}", name="api:update_task")
+async def update_task(
+        task_id: int,
+        parameters: TaskParameters,
+        connection=Depends(get_connection),
+        user=Depends(get_api_user)
+):
+    """
+    Replaces the description, expected finish date, state and category of a task of the
+    current user.
+
+    :param task_id: The unique identifier of the task.
+    :param parameters: The new values of the task.
+    :param connection: The database connection dependency.
+    :param user: The current authenticated user.
+    :return: The updated task.
+    :raises HTTPException: 404 when the task does not exist or belongs to another user, or
+        when the category does not exist.
+    """
+    await get_owned_task(task_id, connection, user)
+    await check_category(parameters.category_id, connection)
+    task = await TaskQuerier(connection).update_task(UpdateTaskParams(
+        id=task_id,
+        description=parameters.description,
+        expected_finished_at=parameters.expected_finished_at,
+        state=parameters.state,
+        category_id=parameters.category_id,
+    ))
+    return ORJSONResponse(task)
+
+
+@api_router.delete("/tasks/{task_id}", name="api:delete_task", status_code=204)
+async def delete_task(task_id: int, connection=Depends(get_connection), user=Depends(get_api_user)):
+    """
+    Deletes a task of the current user.
+
+    :param task_id: The unique identifier of the task.
+    :param connection: The database connection dependency.
+    :param user: The current authenticated user.
+    :raises HTTPException: 404 when the task does not exist or belongs to another user.
+    """
+    querier = TaskQuerier(connection)
+    deleted = [deleted_id async for deleted_id in querier.bulk_delete_tasks(ids=[task_id], person_id=user.id)]
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Task with ID {task_id} not found.")
+    return Response(status_code=204)
+
+
+@api_router.get("/categories", name="api:categories")
+async def list_categories(connection=Depends(get_connection), username: str = Depends(get_api_username)):
+    """
+    Lists all categories, served from the category cache.
+
+    :param connection: The database connection dependency, used when the cache is cold.
+    :param username: The username of the current authenticated user.
+    :return: The categories.
+    """
+    return ORJSONResponse({"categories": await category_cache.get_all(connection)})
+
+
+@api_router.get("/categories/{category_id}", name="api:category")
+async def get_category(
+        category_id: int,
+        connection=Depends(get_connection),
+        username: str = Depends(get_api_username)
+):
+    """
+    Returns one category.
+
+    :param category_id: The unique identifier of the category.
+    :param connection: The database connection dependency, used when the cache is cold.
+    :param username: The username of the current authenticated user.
+    :return: The category.
+    :raises HTTPException: 404 when the category does not exist.
+    """
+    category = await category_cache.get_by_id(connection, category_id)
+    if category is None:
+        raise HTTPException(status_code=404, detail=f"Category with ID {category_id} not found.")
+    return ORJSONResponse(category)
+
+
+@api_router.post("/categories", name="api:create_category", status_code=201)
+async def create_category(
+        parameters: CategoryParameters,
+        connection=Depends(get_connection),
+        username: str = Depends(get_api_username)
+):
+    """
+    Creates a category.
+
+    :param parameters: Name and description of the category.
+    :param connection: The database connection dependency.
+    :param username: The username of the current authenticated user.
+    :return: The created category.
+    """
+    category = await CategoryQuerier(connection).create_category(
+        name=parameters.name,
+        description=parameters.description,
+    )
+    await connection.commit()
+    category_cache.invalidate()
+    return ORJSONResponse(category, status_code=201)
+
+
+@api_router.get("/stats", name="api:stats")
+async def read_task_stats(connection=Depends(get_connection), username: str = Depends(get_api_username)):
+    """
+    Counts the tasks of the current user per state, overall and per category, from the
+    summary table the database keeps current.
+
+    :param connection: The database connection dependency, used to read the counts.
+    :param username: The username of the authenticated user.
+    :return: The totals and the counts of every category holding tasks.
+    """
+    return ORJSONResponse(await get_task_stats(connection, username))
@@ -5,8 +5,11 @@ from fastapi import Request
 from pydantic import BaseModel
 from fastapi.responses import HTMLResponse
 
+from concerns.category import category_cache
+from concerns.conditional import page_etag, is_not_modified, not_modified, cache_headers
+from concerns.rendering import stream_template
 from config import templates
-from models.categories import Querier
+from models.categories import AsyncQuerier as Querier
 from models.connection import get_connection
 
 category_router = APIRouter(prefix="/categories", tags=["Categories"])
@@ -39,10 +42,12 @@ async def create_category(
     :return: Rendered HTML response displaying the newly created category list item.
     """
     querier = Querier(connection)
-    category = querier.create_category(
+    category = await querier.create_category(
         name=parameters.name,
         description=parameters.description,
     )
+    await connection.commit()
+    category_cache.invalidate()
     return templates.TemplateResponse('categories/list_item.html', {
         'request': request, 'category': category
     })
@@ -62,8 +67,10 @@ async def delete_category(category_id: int, connection=Depends(get_connection)):
                 a 404 status code is raised.
     """
     querier = Querier(connection)
-    result = querier.delete_category(id=category_id)
+    result = await querier.delete_category(id=category_id)
     if result:
+        await connection.commit()
+        category_cache.invalidate()
         return {"message": f"Category with ID {category_id} has been deleted successfully."}
     return HTTPException(status_code=404, detail=f"Category with ID {category_id} not found.")
 
@@ -74,19 +81,27 @@ async def get_all_categories(request: Request, connection=Depends(get_connection
     Handles HTTP GET requests to fetch all categories and returns an HTML response
     rendered with the list of categories.
 
-    This function fetches all categories from the database using a `Querier` instance
-    and renders them using a specified HTML template. It is designed to work with
+    This function reads all categories through the category cache and streams them
+    rendered with a specified HTML template. It is designed to work with
     HTTP request handling and assumes appropriate dependencies for its parameters.
+    The ETag comes from the category version loaded with the cached list, and only a
+    conditional request runs the `GetCategoriesFingerprint` query, getting a 304 without
+    rendering the page when its ETag is still current.
 
     :param request: FastAPI Request object used to extract HTTP request data.
     :param connection: Database connection dependency provided through FastAPI's
         Depends feature.
     :return: HTMLResponse containing rendered template with all categories.
     """
-    querier = Querier(connection)
-    categories = querier.get_all_categories()
-    return templates.TemplateResponse(
-        "categories/index.html", {"request": request, "categories": categories}
+    if "if-none-match" in request.headers:
+        etag = page_etag(request, None, await Querier(connection).get_categories_fingerprint())
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+    categories = await category_cache.get_all(connection)
+    etag = page_etag(request, None, category_cache.fingerprint)
+    return stream_template(
+        "categories/index.html", {"request": request, "categories": categories},
+        headers=cache_headers(etag),
     )
 
 
@@ -116,12 +131,14 @@ async def update_category(
     :rtype: TemplateResponse or HTTPException
     """
     querier = Querier(connection)
-    updated_category = querier.update_category(
+    updated_category = await querier.update_category(
         id=category_id,
         name=parameters.name,
         description=parameters.description,
     )
     if updated_category:
+        await connection.commit()
+        category_cache.invalidate()
         return templates.TemplateResponse('categories/list_item.html', {
             'request': request, 'category': updated_category
         })
@@ -1,16 +1,29 @@
+import io
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Annotated, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, UploadFile, File
 from fastapi import Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, StreamingResponse
 
-from concerns.authentication import get_current_user
-from config import templates
-from models.categories import Querier as CategoryQuerier
+from concerns.authentication import get_current_user, get_current_username
+from concerns.category import category_cache
+from concerns.conditional import page_etag, is_not_modified, not_modified, cache_headers
+from concerns.live import task_changes, live_task_events
+from concerns.rendering import stream_template
+from concerns.search import search_query
+from concerns.task_stats import get_task_stats
+from concerns.task_export import ExportResponse, EXPORT_FORMATS
+from concerns.task_import import import_tasks, IMPORT_FORMATS
+from concerns.user import user_cache
+from config import templates, TASKS_PAGE_SIZE, LOGIN_URL
+from models import models
+from models.categories import AsyncQuerier as CategoryQuerier
 from models.connection import get_connection
 from models.models import State
-from models.tasks import Querier, UpdateTaskParams
+from models.tasks import AsyncQuerier as Querier, CreateTaskParams, UpdateTaskParams, GetTaskPageViewParams, \
+    SearchTasksByUsernameParams, SearchTasksByUsernameRow
 
 from fastapi import Depends
 from pydantic import BaseModel, field_validator
@@ -18,9 +31,163 @@ tasks_router = APIRouter(prefix="/tasks", tags=["Tasks"])
 
 
 
-def get_categories(connection=Depends(get_connection)):
-    category_querier = CategoryQuerier(connection)
-    return list(category_querier.get_all_categories())
+async def get_categories(connection=Depends(get_connection)):
+    return await category_cache.get_all(connection)
+
+
+class TaskPage:
+    """
+    One page of the user's tasks, newest first, using the (created_at, id) keyset of the
+    last task of the previous page as cursor, so every page costs the same no matter how
+    deep into the list it is. The page is read with one extra task to know whether
+    another page follows.
+
+    The tasks arrive already loaded, aggregated by `GetTaskPageView`, rather than pulled
+    from a server-side cursor while the page streams: a page holds at most
+    `TASKS_PAGE_SIZE` tasks, and the template still renders in streamed chunks.
+    """
+
+    def __init__(self, request: Request, tasks: list[models.Task], category_id: Optional[int] = None):
+        self.request = request
+        self.tasks = tasks[:TASKS_PAGE_SIZE]
+        self.has_more = len(tasks) > TASKS_PAGE_SIZE
+        self.category_id = category_id
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    @property
+    def next_page_url(self):
+        if not self.has_more:
+            return None
+        last_task = self.tasks[-1]
+        parameters = {"before_created_at": last_task.created_at.isoformat(), "before_id": last_task.id}
+        if self.category_id is not None:
+            parameters["category_id"] = self.category_id
+        return self.request.url_for("tasks:page").include_query_params(**parameters)
+
+
+class SearchPage:
+    """
+    One page of search results, best ranked first, using the (rank, id) keyset of the
+    last result of the previous page as cursor. Like `TaskPage`, it is read with one
+    extra result to know whether another page follows.
+    """
+
+    def __init__(self, request: Request, results: list[SearchTasksByUsernameRow], text: str):
+        self.request = request
+        self.tasks = results[:TASKS_PAGE_SIZE]
+        self.has_more = len(results) > TASKS_PAGE_SIZE
+        self.text = text
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    @property
+    def next_page_url(self):
+        if not self.has_more:
+            return None
+        last_result = self.tasks[-1]
+        return self.request.url_for("tasks:search").include_query_params(
+            q=self.text, before_rank=last_result.rank, before_id=last_result.id
+        )
+
+
+@dataclass
+class TaskPageView:
+    user: models.Person
+    categories: list[models.Category]
+    tasks: TaskPage
+    etag: str
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+async def get_task_page_view(
+        request: Request,
+        username: str,
+        connection,
+        category_id: Optional[int] = None,
+        before_created_at: Optional[datetime] = None,
+        before_id: Optional[int] = None
+) -> TaskPageView:
+    """
+    Loads everything a task page renders, the user, all categories and one page of
+    tasks, with the single `GetTaskPageView` statement, and decodes its JSON aggregates
+    into the model dataclasses. The user is also stored in the user cache. The same
+    statement returns the versions of the user's tasks and of the categories the page
+    ETag is built from.
+
+    :param request: The HTTP request object, used to build the next page url.
+    :param username: Owner of the tasks.
+    :param connection: Database connection used for the query.
+    :param category_id: When given, only tasks of this category are listed.
+    :param before_created_at: Creation date of the last task already shown, if any.
+    :param before_id: ID of the last task already shown, if any.
+    :return: The user, the categories and the page of tasks.
+    :raises HTTPException: Redirects to the login page if the user no longer exists.
+    """
+    if before_created_at is None or before_id is None:
+        before_created_at, before_id = datetime.max, 0
+    version = user_cache.version
+    querier = Querier(connection)
+    row = await querier.get_task_page_view(GetTaskPageViewParams(
+        username=username,
+        category_id=category_id,
+        before_created_at=before_created_at,
+        before_id=before_id,
+        page_size=TASKS_PAGE_SIZE + 1,
+    ))
+    if row is None:
+        raise HTTPException(status_code=307, headers={"Location": LOGIN_URL})
+    user = models.Person(
+        id=row.id,
+        username=row.username,
+        email=row.email,
+        password_hash=row.password_hash,
+        image_path=row.image_path,
+    )
+    user_cache.set(username, user, version)
+    categories = [
+        models.Category(**{**category, "updated_at": _parse_timestamp(category["updated_at"])})
+        for category in row.categories or []
+    ]
+    tasks = [
+        models.Task(**{
+            **task,
+            "state": models.State(task["state"]),
+            "created_at": _parse_timestamp(task["created_at"]),
+            "expected_finished_at": _parse_timestamp(task["expected_finished_at"]),
+            "updated_at": _parse_timestamp(task["updated_at"]),
+        })
+        for task in row.tasks or []
+    ]
+    etag = page_etag(request, username, row.task_version, row.category_version)
+    return TaskPageView(
+        user=user, categories=categories, tasks=TaskPage(request, tasks, category_id), etag=etag
+    )
+
+
+async def get_not_modified_response(request: Request, username: str, connection) -> Optional[Response]:
+    """
+    Answers a conditional request for a task page with 304 when the ETag the client
+    holds is still current. Only the `GetTaskPageFingerprint` statement runs, which reads
+    the versions the triggers keep, the page query and the template render are skipped.
+
+    :param request: The HTTP request object, with the `If-None-Match` header.
+    :param username: Owner of the tasks.
+    :param connection: Database connection used for the query.
+    :return: A 304 response, or None when the page must be rendered.
+    """
+    if "if-none-match" not in request.headers:
+        return None
+    row = await Querier(connection).get_task_page_fingerprint(username=username)
+    if row is None:
+        return None
+    etag = page_etag(request, username, row.task_version, row.category_version)
+    return not_modified(etag) if is_not_modified(request, etag) else None
 
 
 class CreateTaskParameters(BaseModel):
@@ -51,11 +218,13 @@ async def create_task(
         task, available categories, and state information
     """
     querier = Querier(connection)
-    task = querier.create_task(
+    task = await querier.create_task(CreateTaskParams(
         description=parameters.description,
         person_id=user.id,
         category_id=parameters.category_id,
-    )
+        state=State.BACKLOG,
+        expected_finished_at=None,
+    ))
     return templates.TemplateResponse('tasks/list_item.html', {
         'request': request, 'task': task, "categories": categories, 'states': State
     })
@@ -82,9 +251,9 @@ async def delete_task(
     :rtype: dict | HTTPException
     """
     querier = Querier(connection)
-    result = querier.delete_task(id=task_id)
+    result = await querier.delete_task(id=task_id)
     if result.person_id != user.id:
-        connection.rollback()
+        await connection.rollback()
         return HTTPException(status_code=403, detail="You are not authorized to delete this task.")
     if result:
         return HTTPException(status_code=404, detail=f"Task with ID {task_id} has been deleted successfully.")
@@ -95,31 +264,63 @@ async def delete_task(
 async def get_user_tasks(
         request: Request,
         connection=Depends(get_connection),
-        categories=Depends(get_categories),
-        user=Depends(get_current_user)
+        username: str = Depends(get_current_username)
 ):
     """
-    Fetches and displays the tasks associated with the current user. The endpoint
-    invokes the necessary dependencies to retrieve user-specific data, including
-    tasks, user information, and task categories. This data is then rendered
-    into an HTML template for presentation.
+    Fetches and displays the tasks associated with the current user. The user
+    information, the task categories and the first page of tasks are loaded with a
+    single query and then streamed rendered into an HTML template. A conditional request
+    whose ETag is still current gets a 304 without the page query nor the render.
 
     :param request: The HTTP request instance which provides details about
         the incoming user request.
-    :param connection: Database connection dependency, used for querying task details.
-    :param categories: A list of task categories fetched as an application dependency.
-    :param user: The current authenticated user whose tasks are to be retrieved.
+    :param connection: Database connection dependency, used for querying the page data.
+    :param username: The current authenticated username whose tasks are to be retrieved.
     :return: An `HTMLResponse` containing the rendered task list with user-specific
         details and associated categories.
     """
-    querier = Querier(connection)
-    tasks = querier.get_tasks_by_username(username=user.username)
-    return templates.TemplateResponse(
+    if response := await get_not_modified_response(request, username, connection):
+        return response
+    view = await get_task_page_view(request, username, connection)
+    return stream_template(
         "tasks/index.html", {
             "request": request, "title": "All tasks",
-            "tasks": tasks, "categories": categories,
-            "user": user, 'states': State
-        }
+            "tasks": view.tasks, "categories": view.categories,
+            "user": view.user, 'states': State
+        },
+        headers=cache_headers(view.etag),
+    )
+
+
+@tasks_router.get("/page", name="tasks:page", response_class=HTMLResponse)
+async def get_user_tasks_page(
+        request: Request,
+        before_created_at: datetime,
+        before_id: int,
+        category_id: Optional[int] = None,
+        connection=Depends(get_connection),
+        username: str = Depends(get_current_username)
+):
+    """
+    Renders the next page of the task list as a fragment of list items. It is requested
+    by htmx when the "load more" sentinel at the end of the list scrolls into view, and
+    the fragment carries its own sentinel while there are more tasks to load.
+
+    :param request: The HTTP request object.
+    :param before_created_at: Creation date of the last task already displayed.
+    :param before_id: ID of the last task already displayed.
+    :param category_id: Optional category the list is filtered by.
+    :param connection: Database connection dependency, used for querying the page data.
+    :param username: The current authenticated username whose tasks are listed.
+    :return: An `HTMLResponse` with the list items of the page.
+    """
+    # Fragments are loaded once per scroll and never revalidated, so they carry no ETag
+    view = await get_task_page_view(request, username, connection, category_id, before_created_at, before_id)
+    return stream_template(
+        "tasks/page.html", {
+            "request": request, "categories": view.categories, 'states': State,
+            "tasks": view.tasks,
+        },
     )
 
 
@@ -168,7 +369,7 @@ async def update_task(
     :raises HTTPException: If the current user is not authorized to update the task.
     """
     querier = Querier(connection)
-    task = querier.update_task(
+    task = await querier.update_task(
         arg=UpdateTaskParams(
             id=task_id,
             description=parameters.description,
@@ -178,19 +379,18 @@ async def update_task(
         )
     )
     if task.person_id != user.id:
-        connection.rollback()
+        await connection.rollback()
         return HTTPException(status_code=403, detail="You are not authorized to update this task.")
     return templates.TemplateResponse('tasks/list_item.html', {
         'request': request, 'task': task, "categories": categories, 'states': State
     })
 
 @tasks_router.get("/category/{category_id}", name="tasks:category", response_class=HTMLResponse)
-def get_tasks_by_category(
+async def get_tasks_by_category(
         request: Request,
         category_id: int,
         connection=Depends(get_connection),
-        categories=Depends(get_categories),
-        user=Depends(get_current_user)
+        username: str = Depends(get_current_username)
 ):
     """
     Retrieves tasks for a specific category, identified by its ID, and returns
@@ -203,28 +403,270 @@ def get_tasks_by_category(
     :type request: Request
     :param category_id: The ID of the category to fetch tasks for.
     :type category_id: int
-    :param connection: Database connection dependency for performing queries.
+    :param connection: Database connection dependency for performing the page query.
     :type connection: depends(get_connection)
-    :param categories: List of categories available in the system.
-    :type categories: depends(get_categories)
-    :param user: The currently authenticated user making the request.
-    :type user: depends(get_current_user)
+    :param username: The currently authenticated username making the request.
+    :type username: depends(get_current_username)
     :return: An HTML response displaying the tasks filtered by the category
         and other necessary information for the UI.
     :rtype: HTMLResponse
+    :raises HTTPException: If the category does not exist.
     """
-    querier = Querier(connection)
-    tasks = querier.get_task_username_and_by_category_id(
-        username=user.username,
-        category_id=category_id
-    )
-    category_querier = CategoryQuerier(connection)
-    category = category_querier.get_category_by_id(id=category_id)
-    return templates.TemplateResponse(
+    if response := await get_not_modified_response(request, username, connection):
+        return response
+    view = await get_task_page_view(request, username, connection, category_id)
+    category = next((category for category in view.categories if category.id == category_id), None)
+    if category is None:
+        raise HTTPException(status_code=404, detail=f"Category with ID {category_id} not found.")
+    return stream_template(
         "tasks/index.html", {
             "request": request, "title": f"Tasks in category {category.name}",
-            "tasks": tasks, "categories": categories,
-            "user": user, 'states': State
-        }
+            "tasks": view.tasks, "categories": view.categories,
+            "user": view.user, 'states': State
+        },
+        headers=cache_headers(view.etag),
     )
 
+
+@tasks_router.get("/search", name="tasks:search", response_class=HTMLResponse)
+async def search_tasks(
+        request: Request,
+        q: str = "",
+        before_rank: Optional[float] = None,
+        before_id: Optional[int] = None,
+        connection=Depends(get_connection),
+        user=Depends(get_current_user),
+        categories=Depends(get_categories)
+):
+    """
+    Searches the descriptions of the current user's tasks for every word typed, each
+    one matching as a prefix, using the full-text index. Results are ranked by
+    relevance and show the matching fragments of the description highlighted. The next
+    pages are loaded like the task list's, by the sentinel at the end of the results.
+
+    :param request: The HTTP request object.
+    :param q: The search text.
+    :param before_rank: Rank of the last result already displayed, for the next pages.
+    :param before_id: ID of the last result already displayed, for the next pages.
+    :param connection: Database connection dependency, used for the search query.
+    :param user: The current authenticated user.
+    :param categories: All categories, for the update forms of the results.
+    :return: The task list page with the results, or only the list items of the next
+        page. An empty search redirects to the task list.
+    """
+    query = search_query(q)
+    if query is None:
+        return RedirectResponse(request.url_for("tasks:index"), status_code=303)
+    is_next_page = before_rank is not None and before_id is not None
+    if not is_next_page:
+        before_rank, before_id = float("inf"), 0
+    querier = Querier(connection)
+    results = [result async for result in querier.search_tasks_by_username(SearchTasksByUsernameParams(
+        username=user.username,
+        query=query,
+        before_rank=before_rank,
+        before_id=before_id,
+        page_size=TASKS_PAGE_SIZE + 1,
+    ))]
+    tasks = SearchPage(request, results, q)
+    if is_next_page:
+        return templates.TemplateResponse("tasks/page.html", {
+            "request": request, "categories": categories, "states": State, "tasks": tasks,
+        })
+    return templates.TemplateResponse("tasks/index.html", {
+        "request": request, "title": f'Tasks matching "{q}"', "search": q,
+        "tasks": tasks, "categories": categories, "user": user, "states": State,
+    })
+
+
+@tasks_router.get("/stats", name="tasks:stats", response_class=HTMLResponse)
+async def get_user_task_stats(
+        request: Request,
+        connection=Depends(get_connection),
+        username: str = Depends(get_current_username)
+):
+    """
+    Renders the task counts of the current user per state and per category, shown as
+    badges in the sidebar. The counts come from the `task_stats` summary table, so the
+    cost does not depend on how many tasks the user has.
+
+    :param request: The HTTP request object.
+    :param connection: Database connection dependency, used to read the counts.
+    :param username: The current authenticated username.
+    :return: An `HTMLResponse` with the badges.
+    """
+    stats = await get_task_stats(connection, username)
+    return templates.TemplateResponse("tasks/stats.html", {"request": request, "stats": stats})
+
+
+@tasks_router.get("/live", name="tasks:live")
+async def live_task_updates(request: Request, user=Depends(get_current_user)):
+    """
+    Server-Sent Events stream of the changes to the current user's tasks, made in any
+    tab or by any worker. Every `task` event carries out of band swaps for the open
+    list: updated list items, deleted items and a notice when tasks were created. The
+    stream holds no database connection, the changes come from the worker's single
+    LISTEN connection.
+
+    :param request: The HTTP request object, used to render the list items.
+    :param user: The current authenticated user.
+    :return: A `text/event-stream` response.
+    :raises HTTPException: 503 when the worker serves `LIVE_MAX_STREAMS` streams already.
+    """
+    if user is None:
+        raise HTTPException(status_code=307, headers={"Location": LOGIN_URL})
+    task_changes.check_capacity()
+    return StreamingResponse(
+        live_task_events(request, user.id),
+        media_type="text/event-stream",
+        # Proxies must neither cache nor buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class BulkTaskParameters(BaseModel):
+    ids: list[int] = []
+
+
+class BulkStateParameters(BulkTaskParameters):
+    state: State
+
+
+class BulkCategoryParameters(BulkTaskParameters):
+    category_id: int
+
+
+def render_bulk_items(request: Request, tasks: list, categories: list, deleted_ids: list = ()):
+    return templates.TemplateResponse('tasks/bulk_items.html', {
+        'request': request, 'tasks': tasks, 'deleted_ids': deleted_ids,
+        'categories': categories, 'states': State, 'swap_oob': True
+    })
+
+
+@tasks_router.post("/bulk/state", name="tasks:bulk_state", response_class=HTMLResponse)
+async def bulk_set_task_state(
+        request: Request,
+        parameters: Annotated[BulkStateParameters, Form()],
+        connection=Depends(get_connection),
+        categories=Depends(get_categories),
+        user=Depends(get_current_user)
+):
+    """
+    Sets the state of many tasks of the current user with a single statement. Tasks that
+    do not belong to the user are left untouched.
+
+    :param request: The HTTP request object.
+    :param parameters: Form data with the selected task ids and the new state.
+    :param connection: The database connection dependency.
+    :param categories: The available task categories, used by the list item template.
+    :param user: The current authenticated user owning the tasks.
+    :return: The updated list items, swapped out of band by htmx.
+    """
+    querier = Querier(connection)
+    tasks = [task async for task in querier.bulk_set_task_state(
+        state=parameters.state, ids=parameters.ids, person_id=user.id
+    )]
+    return render_bulk_items(request, tasks, categories)
+
+
+@tasks_router.post("/bulk/category", name="tasks:bulk_category", response_class=HTMLResponse)
+async def bulk_move_tasks_to_category(
+        request: Request,
+        parameters: Annotated[BulkCategoryParameters, Form()],
+        connection=Depends(get_connection),
+        categories=Depends(get_categories),
+        user=Depends(get_current_user)
+):
+    """
+    Moves many tasks of the current user to another category with a single statement.
+    Tasks that do not belong to the user are left untouched.
+
+    :param request: The HTTP request object.
+    :param parameters: Form data with the selected task ids and the target category.
+    :param connection: The database connection dependency.
+    :param categories: The available task categories, used by the list item template.
+    :param user: The current authenticated user owning the tasks.
+    :return: The updated list items, swapped out of band by htmx.
+    :raises HTTPException: 404 when the target category does not exist.
+    """
+    if not await CategoryQuerier(connection).category_exists(id=parameters.category_id):
+        raise HTTPException(status_code=404, detail=f"Category with ID {parameters.category_id} not found.")
+    querier = Querier(connection)
+    tasks = [task async for task in querier.bulk_move_tasks_to_category(
+        category_id=parameters.category_id, ids=parameters.ids, person_id=user.id
+    )]
+    return render_bulk_items(request, tasks, categories)
+
+
+@tasks_router.post("/bulk/delete", name="tasks:bulk_delete", response_class=HTMLResponse)
+async def bulk_delete_tasks(
+        request: Request,
+        parameters: Annotated[BulkTaskParameters, Form()],
+        connection=Depends(get_connection),
+        user=Depends(get_current_user)
+):
+    """
+    Deletes many tasks of the current user with a single statement. Tasks that do not
+    belong to the user are left untouched.
+
+    :param request: The HTTP request object.
+    :param parameters: Form data with the selected task ids.
+    :param connection: The database connection dependency.
+    :param user: The current authenticated user owning the tasks.
+    :return: Out of band deletions of the removed list items.
+    """
+    querier = Querier(connection)
+    deleted_ids = [task_id async for task_id in querier.bulk_delete_tasks(ids=parameters.ids, person_id=user.id)]
+    return render_bulk_items(request, [], [], deleted_ids)
+
+
+@tasks_router.post("/import", name="tasks:import", response_class=HTMLResponse)
+async def import_tasks_file(
+        request: Request,
+        file: UploadFile = File(...),
+        import_format: Optional[str] = Form(None),
+        connection=Depends(get_connection),
+        user=Depends(get_current_user)
+):
+    """
+    Imports the tasks of an uploaded CSV (with a header row) or NDJSON file for the
+    current user. The columns are `description` (required), `category` (name),
+    `state`, `expected_finished_at` and `created_at`. Rows are streamed into the
+    database with COPY and categories that do not exist are created; invalid rows are
+    skipped and reported.
+
+    :param request: The HTTP request object.
+    :param file: The uploaded file.
+    :param import_format: "csv" or "ndjson", deduced from the file name when omitted.
+    :param connection: The database connection dependency.
+    :param user: The current authenticated user that will own the tasks.
+    :return: An HTML summary of the import with the skipped rows.
+    :raises HTTPException: If the format is not supported.
+    """
+    if import_format is None:
+        import_format = "ndjson" if (file.filename or "").endswith((".ndjson", ".jsonl")) else "csv"
+    if import_format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported import format {import_format}")
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", errors="surrogateescape", newline="")
+    result = await import_tasks(connection, user.id, stream, import_format)
+    await connection.commit()
+    if result.created_categories:
+        category_cache.invalidate()
+    return templates.TemplateResponse('tasks/import_result.html', {'request': request, 'result': result})
+
+
+@tasks_router.get("/export", name="tasks:export")
+async def export_tasks_file(export_format: str = "csv", username=Depends(get_current_username)):
+    """
+    Downloads all the tasks of the current user as CSV or NDJSON, in the columns the
+    import reads. The file is streamed from a server-side cursor while it is read.
+
+    :param export_format: "csv" or "ndjson".
+    :param username: The username of the current authenticated user.
+    :return: A streamed attachment with the tasks.
+    :raises HTTPException: If the format is not supported, or 503 when the worker already
+        streams `EXPORT_MAX_STREAMS` exports.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format {export_format}")
+    return ExportResponse(username, export_format)
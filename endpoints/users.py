@@ -1,19 +1,22 @@
-import shutil
+import os
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status, Form, UploadFile, File
 from fastapi import Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, Response
 from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
 from concerns.authentication import create_access_token, check_password, hash_password, get_current_username, \
     black_list_token, \
     get_current_token, get_current_user
-from concerns.user import get_profile_image_path
-from config import templates, LOGIN_URL
+from concerns.conditional import is_not_modified, not_modified_since
+from concerns.images import image_processor, save_upload, remove_images, PROFILE_IMAGE_SIZES
+from concerns.user import get_profile_image_path, user_cache, IMAGE_DIGEST, AVATAR_CACHE_CONTROL
+from config import templates, LOGIN_URL, PROFILE_IMAGE_MAX_BYTES
 from models.connection import get_connection
-from models.users import Querier
+from models.users import AsyncQuerier as Querier
 
 user_router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -30,9 +33,9 @@ def get_user_profile(request: Request, user=Depends(get_current_user)):
     Handles the retrieval of the user profile page.
 
     This function responds to the HTTP GET request for the user's profile page. It retrieves
-    the user's data from the `get_current_user` dependency, ensures the user has a valid
-    profile image path, and finally renders the user's profile page using the given
-    template.
+    the user's data from the `get_current_user` dependency and renders the user's profile
+    page using the given template, which links the profile image (or the default one)
+    with `avatar_url`.
 
     :param request: The HTTP request object, providing data about the incoming request.
     :type request: Request
@@ -41,11 +44,42 @@ def get_user_profile(request: Request, user=Depends(get_current_user)):
     :return: A rendered HTML response of the user's profile page.
     :rtype: HTMLResponse
     """
-    if not user.image_path:
-        user.image_path = "static/resources/default.jpg"
-    return templates.TemplateResponse(
-        "users/profile.html", {"request": request, "user": user, "get_profile_image_path": get_profile_image_path}
-    )
+    return templates.TemplateResponse("users/profile.html", {"request": request, "user": user})
+
+
+@user_router.get("/avatars/{version}/{size}.jpg", name="users:avatar", response_class=FileResponse)
+async def get_avatar(request: Request, version: str, size: str):
+    """
+    Serves a profile image thumbnail. The version is the digest saved as the user's
+    `image_path`, so the url changes whenever the image does and the response is cached
+    as immutable. Conditional requests are answered with 304, and byte ranges (including
+    `If-Range`) are handled by `FileResponse`.
+
+    :param request: The HTTP request object, carrying the conditional headers.
+    :type request: Request
+    :param version: The digest of the uploaded image.
+    :type version: str
+    :param size: One of `PROFILE_IMAGE_SIZES`.
+    :type size: str
+    :return: The thumbnail, or an empty 304 response.
+    :rtype: FileResponse
+    :raises HTTPException: 404 if there is no such image or size.
+    """
+    if not IMAGE_DIGEST.fullmatch(version) or size not in PROFILE_IMAGE_SIZES:
+        raise HTTPException(status_code=404, detail="Image not found")
+    path = get_profile_image_path(version, size)
+    try:
+        stat_result = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    # Strong, as the content never changes for a version, so it also works for If-Range
+    headers = {"ETag": f'"{version}-{size}"', "Cache-Control": AVATAR_CACHE_CONTROL}
+    if is_not_modified(request, headers["ETag"]) or (
+            "if-none-match" not in request.headers
+            and not_modified_since(request, stat_result.st_mtime)
+    ):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, stat_result=stat_result, headers=headers, media_type="image/jpeg")
 
 
 @user_router.get("/signin", name="users:signin", response_class=HTMLResponse)
@@ -84,11 +118,12 @@ async def create_user(
     :rtype: RedirectResponse
     """
     querier = Querier(connection)
-    querier.create_user(
+    await querier.create_user(
         username=parameters.username,
         email=parameters.email,
-        password_hash=hash_password(parameters.password),
+        password_hash=await hash_password(parameters.password),
     )
+    await connection.commit()
     return RedirectResponse(url=LOGIN_URL, status_code=303)
 
 
@@ -98,40 +133,60 @@ class ImageResponse:
         self.file_path = file_path
 
 
+# Images no longer referenced but written this recently may belong to an upload of the
+# same file by another user that is not committed yet
+REPLACED_IMAGE_MIN_AGE = 300
+# Cap on the whole upload request, enforced by BodySizeLimitMiddleware before the body is
+# parsed. The multipart overhead is small, a larger body cannot hold an accepted image
+UPLOAD_IMAGE_MAX_BODY_BYTES = PROFILE_IMAGE_MAX_BYTES + 64 * 1024
+
+
 @user_router.post("/upload-image", name="users:upload_image", response_class=RedirectResponse)
-async def upload_image(file: UploadFile = File(...), connection=Depends(get_connection),
-                       username: str = Depends(get_current_username)):
+async def upload_image(request: Request, file: UploadFile = File(...), connection=Depends(get_connection),
+                       user=Depends(get_current_user)):
     """
-    Handles the upload of a user profile image by saving it to the filesystem and updating
-    the database with the file path. It generates the destination path for the file based on
-    the username and file extension. This endpoint redirects the user to the "/users" page
-    after successfully uploading the image.
-
+    Handles the upload of a user profile image. The upload is copied to disk in chunks,
+    up to `PROFILE_IMAGE_MAX_BYTES`, and resized into the `PROFILE_IMAGE_SIZES` thumbnails
+    in the image worker pool. The thumbnails are stored under the SHA-256 of the upload,
+    which is saved as the user's `image_path`, so the same image uploaded again is not
+    processed twice. The previous image is deleted when no user references it anymore.
+    Bodies over `UPLOAD_IMAGE_MAX_BODY_BYTES` are refused with 413 by
+    `BodySizeLimitMiddleware` while they are received, before this handler runs.
+    This endpoint redirects the user to the "/users" page after a successful upload.
+
+    :param request: The HTTP request object.
+    :type request: Request
     :param file: An uploaded image file to be saved.
     :type file: UploadFile
     :param connection: A database connection dependency.
     :type connection: Depends
-    :param username: The current username extracted via the authentication process.
-    :type username: str
+    :param user: The current authenticated user.
+    :type user: Person
     :return: A redirect response to the "/users" page upon successful upload.
     :rtype: RedirectResponse
+    :raises HTTPException: 413 if the upload is too large, 400 if it is not an image.
     """
-    # Generate a path for the uploaded file
-
-    file_path = get_profile_image_path(username, file.filename.split(".")[-1])
+    upload_path, digest = await save_upload(file)
+    try:
+        image_path = await image_processor.store(upload_path, digest)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    finally:
+        await run_in_threadpool(os.remove, upload_path)
 
-    # Save the image file to the local filesystem
-    with open(file_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
-
-    # Store the file path in the database
     querier = Querier(connection)
-    querier.save_image_path(
-        username=username,
-        image_path=file_path,
+    await querier.save_image_path(
+        username=user.username,
+        image_path=image_path,
     )
+    await connection.commit()
+    user_cache.evict(user.username)
+
+    previous_image_path = user.image_path
+    if previous_image_path and previous_image_path != image_path and IMAGE_DIGEST.fullmatch(previous_image_path):
+        if await querier.count_image_path_references(image_path=previous_image_path) == 0:
+            await run_in_threadpool(remove_images, [previous_image_path], REPLACED_IMAGE_MIN_AGE)
 
-    # Return the filename and path where the image is saved
     return RedirectResponse(url="/users", status_code=303)
 
 
@@ -184,8 +239,8 @@ async def login(
         response status code.
     """
     querier = Querier(connection)
-    password_hash = querier.get_password_hash(username=username)
-    if not password_hash or not check_password(password_hash, password):
+    password_hash = await querier.get_password_hash(username=username)
+    if not password_hash or not await check_password(password_hash, password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
@@ -213,15 +268,18 @@ async def login(
 
 
 @user_router.post("/logout", name="users:logout", response_class=RedirectResponse)
-async def logout(token=Depends(get_current_token)):
+async def logout(token=Depends(get_current_token), connection=Depends(get_connection)):
     """
     Logs out the current user by invalidating and blacklisting the user's authentication
     token and redirects to the login page.
 
     :param token: The authentication token of the currently logged-in user, provided by
         `Depends(get_current_token)`.
+    :param connection: Database connection dependency, used to store the revoked token.
     :return: A `RedirectResponse` object redirecting the user to the login page with an
         HTTP 303 status code.
     """
-    black_list_token(token)
+    if isinstance(token, RedirectResponse):
+        return token
+    await black_list_token(token, connection)
     return RedirectResponse(url=LOGIN_URL, status_code=303)
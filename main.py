@@ -1,13 +1,47 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response
 
+from concerns.assets import PrecompressedStaticFiles
+from concerns.authentication import token_cache
+from concerns.body_size import BodySizeLimitMiddleware
+from concerns.category import category_cache
+from concerns.compression import CompressionMiddleware
+from concerns.images import image_processor
+from concerns.live import task_changes
+from concerns.metrics import MetricsMiddleware, mark_worker_stopped, render_metrics
+from concerns.passwords import password_hasher
+from concerns.revocation import token_blacklist
+from concerns.user import user_cache
+from endpoints.admin import admin_router
+from endpoints.api import api_router
 from endpoints.categories import category_router
 from endpoints.tasks import tasks_router
-from endpoints.users import user_router
+from endpoints.users import user_router, UPLOAD_IMAGE_MAX_BODY_BYTES
+from config import STATIC_DIR, COMPRESSION_MINIMUM_SIZE, GZIP_LEVEL, BROTLI_QUALITY
+from models.connection import get_pool_stats, async_engine, engine
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    prune_revoked_tokens = asyncio.create_task(token_blacklist.prune_periodically())
+    yield
+    prune_revoked_tokens.cancel()
+    password_hasher.shutdown()
+    image_processor.shutdown()
+    await task_changes.close()
+    await async_engine.dispose()
+    engine.dispose()
+    mark_worker_stopped()
+
+
+app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
+app.add_middleware(BodySizeLimitMiddleware, limits={"/users/upload-image": UPLOAD_IMAGE_MAX_BODY_BYTES})
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,10 +50,20 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MINIMUM_SIZE,
+    gzip_level=GZIP_LEVEL,
+    brotli_quality=BROTLI_QUALITY,
+)
+# Added last so it runs first and the latency includes the compression
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(user_router)
 app.include_router(tasks_router)
 app.include_router(category_router)
+app.include_router(api_router)
+app.include_router(admin_router)
 
 
 @app.get("/health-check")
@@ -27,6 +71,67 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/health-check/pool")
+def pool_health_check():
+    """
+    Reports the connection pool state of the worker process that serves the request:
+    live checked out / overflow connections plus the counters of connects, checkouts,
+    invalidations and the time spent waiting to acquire a connection.
+    """
+    return get_pool_stats()
+
+
+@app.get("/health-check/passwords")
+def passwords_health_check():
+    """
+    Reports the bcrypt process pool of the worker process that serves the request: queue
+    depth, rejected operations and hashing latency.
+    """
+    return password_hasher.stats()
+
+
+@app.get("/health-check/images")
+def images_health_check():
+    """
+    Reports the profile image process pool of the worker process that serves the request:
+    queue depth, rejected and deduplicated uploads and processing latency.
+    """
+    return image_processor.stats()
+
+
+@app.get("/health-check/live")
+def live_health_check():
+    """
+    Reports the live task streams of the worker process that serves the request: open
+    streams, whether the LISTEN connection is up and the notifications received.
+    """
+    return task_changes.stats()
+
+
+@app.get("/health-check/caches")
+def caches_health_check():
+    """
+    Reports the in-process caches of the worker process that serves the request.
+    """
+    return {
+        "pid": os.getpid(),
+        "users": user_cache.stats(),
+        "tokens": token_cache.stats(),
+        "categories": {"version": category_cache.version},
+    }
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus metrics of all the workers: request latency per route, database statements
+    per request and per statement, template render times and the requests and database
+    connections in use.
+    """
+    content, content_type = render_metrics()
+    return Response(content, media_type=content_type)
+
+
 @app.get("/")
 def read_root():
     return RedirectResponse(url="/tasks")
@@ -35,4 +140,4 @@ def read_root():
 
 
 print("Starting server...")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory=STATIC_DIR), name="static")
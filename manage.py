@@ -0,0 +1,193 @@
+"""
+Command line entry point for maintenance tasks.
+
+Usage:
+    python manage.py migrate up [--to VERSION]
+    python manage.py migrate down [--steps N]
+    python manage.py migrate status
+    python manage.py import-tasks --username USERNAME [--format csv|ndjson] FILE
+    python manage.py build-static [--refresh-vendor]
+    python manage.py gc-images [--min-age SECONDS]
+    python manage.py version-images
+    python manage.py task-stats [--rebuild]
+"""
+import argparse
+import asyncio
+import os
+
+from concerns.assets import build_assets, vendor_assets
+from concerns.category import category_cache
+from concerns.images import collect_garbage, file_digest, image_processor
+from concerns.task_import import import_tasks as run_import
+from concerns.user import IMAGE_DIGEST, user_cache
+from models import migrations
+from models.connection import connection_scope, async_engine
+from models.task_stats import AsyncQuerier as TaskStatsQuerier
+from models.users import AsyncQuerier as UserQuerier
+
+
+def migrate_up(args):
+    applied = migrations.migrate_up(target=args.to)
+    for migration in applied:
+        print(f"applied  {migration.version:04d}_{migration.name}")
+    if not applied:
+        print("schema is up to date")
+
+
+def migrate_down(args):
+    for migration in migrations.migrate_down(steps=args.steps):
+        print(f"reverted {migration.version:04d}_{migration.name}")
+
+
+def migrate_status(args):
+    for migration, applied_at in migrations.migration_status():
+        state = f"applied at {applied_at:%Y-%m-%d %H:%M:%S}" if applied_at else "pending"
+        print(f"{migration.version:04d}_{migration.name}: {state}")
+
+
+def import_tasks(args):
+    import_format = args.format or ("ndjson" if args.file.endswith((".ndjson", ".jsonl")) else "csv")
+
+    async def run():
+        async with connection_scope() as connection:
+            user = await UserQuerier(connection).get_user_by_username(username=args.username)
+            if user is None:
+                raise SystemExit(f"User {args.username} does not exist")
+            with open(args.file, encoding="utf-8", errors="surrogateescape", newline="") as stream:
+                result = await run_import(connection, user.id, stream, import_format)
+        await async_engine.dispose()
+        return result
+
+    result = asyncio.run(run())
+    if result.created_categories:
+        category_cache.invalidate()
+    print(f"imported {result.imported} tasks, created {result.created_categories} categories, "
+          f"skipped {result.error_count} rows")
+    for line, message in result.errors:
+        print(f"  line {line}: {message}")
+
+
+def build_static(args):
+    for path in vendor_assets(refresh=args.refresh_vendor):
+        print(f"vendored {path}")
+    built = build_assets()
+    compressed = sum(1 for entry in built.values() if entry["encodings"])
+    print(f"built {len(built)} assets, {compressed} with compressed variants")
+
+
+def gc_images(args):
+    async def referenced_images():
+        async with connection_scope() as connection:
+            image_paths = {image_path async for image_path in UserQuerier(connection).get_image_paths()}
+        await async_engine.dispose()
+        return image_paths
+
+    removed = collect_garbage(asyncio.run(referenced_images()), min_age=args.min_age)
+    print(f"removed {len(removed)} unreferenced profile images")
+
+
+def version_images(args):
+    async def run():
+        converted = 0
+        async with connection_scope() as connection:
+            querier = UserQuerier(connection)
+            legacy = [path async for path in querier.get_image_paths() if not IMAGE_DIGEST.fullmatch(path)]
+            for path in legacy:
+                if not os.path.isfile(path):
+                    print(f"  {path}: missing, left as is")
+                    continue
+                try:
+                    digest = await image_processor.store(path, file_digest(path))
+                except ValueError as error:
+                    print(f"  {path}: {error}")
+                    continue
+                await querier.replace_image_path(image_path=digest, image_path_2=path)
+                # Committed one by one, so the file is only removed once nothing points to it
+                await connection.commit()
+                os.remove(path)
+                converted += 1
+        await async_engine.dispose()
+        return converted
+
+    try:
+        converted = asyncio.run(run())
+    finally:
+        image_processor.shutdown()
+    user_cache.invalidate()
+    print(f"converted {converted} profile images to versioned thumbnails")
+
+
+def task_stats(args):
+    async def run():
+        async with connection_scope() as connection:
+            querier = TaskStatsQuerier(connection)
+            mismatches = [row async for row in querier.check_task_stats()]
+            rebuilt = None
+            if args.rebuild:
+                rebuilt = await querier.rebuild_task_stats()
+                await connection.commit()
+        await async_engine.dispose()
+        return mismatches, rebuilt
+
+    mismatches, rebuilt = asyncio.run(run())
+    for row in mismatches:
+        print(f"  person {row.person_id}, category {row.category_id}, {row.state}: "
+              f"stored {row.stored_count}, counted {row.actual_count}")
+    print(f"{len(mismatches)} task counts out of date")
+    if rebuilt is not None:
+        print(f"rebuilt task_stats with {rebuilt} rows")
+    elif mismatches:
+        raise SystemExit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate", help="Apply or revert the schema migrations in db/migrations")
+    migrate_commands = migrate.add_subparsers(dest="direction", required=True)
+    up = migrate_commands.add_parser("up", help="Apply pending migrations")
+    up.add_argument("--to", type=int, default=None, help="Last version to apply")
+    up.set_defaults(handler=migrate_up)
+    down = migrate_commands.add_parser("down", help="Revert applied migrations")
+    down.add_argument("--steps", type=int, default=1, help="How many migrations to revert")
+    down.set_defaults(handler=migrate_down)
+    status = migrate_commands.add_parser("status", help="List migrations and whether they are applied")
+    status.set_defaults(handler=migrate_status)
+
+    import_command = commands.add_parser("import-tasks", help="Import a CSV or NDJSON file of tasks for a user")
+    import_command.add_argument("--username", required=True, help="Owner of the imported tasks")
+    import_command.add_argument("--format", choices=("csv", "ndjson"), default=None,
+                                help="File format, deduced from the extension when omitted")
+    import_command.add_argument("file")
+    import_command.set_defaults(handler=import_tasks)
+
+    build_command = commands.add_parser(
+        "build-static", help="Vendor third party scripts and write hashed, precompressed static assets"
+    )
+    build_command.add_argument("--refresh-vendor", action="store_true",
+                               help="Download the vendored scripts again")
+    build_command.set_defaults(handler=build_static)
+
+    gc_command = commands.add_parser("gc-images", help="Delete the profile images no user references")
+    gc_command.add_argument("--min-age", type=float, default=3600,
+                            help="Seconds an unreferenced image is kept, to leave in-flight uploads alone")
+    gc_command.set_defaults(handler=gc_images)
+
+    version_command = commands.add_parser(
+        "version-images", help="Convert the profile images uploaded as <username>.<ext> to versioned thumbnails"
+    )
+    version_command.set_defaults(handler=version_images)
+
+    stats_command = commands.add_parser(
+        "task-stats", help="Compare task_stats with a count of the tasks, exiting with 1 when they differ"
+    )
+    stats_command.add_argument("--rebuild", action="store_true", help="Recompute task_stats from the tasks")
+    stats_command.set_defaults(handler=task_stats)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,10 +10,17 @@ import sqlalchemy.ext.asyncio
 from models import models
 
 
+CATEGORY_EXISTS = """-- name: category_exists \\:one
+SELECT EXISTS(SELECT 1
+              FROM categories
+              WHERE id = :p1)
+"""
+
+
 CREATE_CATEGORY = """-- name: create_category \\:one
 INSERT INTO categories (name, description)
 VALUES (:p1, :p2)
-RETURNING id, name, description
+RETURNING id, name, description, updated_at
 """
 
 
@@ -21,18 +28,24 @@ DELETE_CATEGORY = """-- name: delete_category \\:one
 DELETE
 FROM categories
 WHERE id = :p1
-RETURNING id, name, description
+RETURNING id, name, description, updated_at
 """
 
 
 GET_ALL_CATEGORIES = """-- name: get_all_categories \\:many
-SELECT id, name, description
+SELECT id, name, description, updated_at
 FROM categories
 """
 
 
+GET_CATEGORIES_FINGERPRINT = """-- name: get_categories_fingerprint \\:one
+SELECT version
+FROM category_versions
+"""
+
+
 GET_CATEGORY_BY_ID = """-- name: get_category_by_id \\:one
-SELECT id, name, description
+SELECT id, name, description, updated_at
 FROM categories
 WHERE categories.id = :p1
 """
@@ -43,7 +56,7 @@ UPDATE categories
 SET name        = :p2,
     description = :p3
 WHERE id = :p1
-RETURNING id, name, description
+RETURNING id, name, description, updated_at
 """
 
 
@@ -51,6 +64,12 @@ class Querier:
     def __init__(self, conn: sqlalchemy.engine.Connection):
         self._conn = conn
 
+    def category_exists(self, *, id: int) -> Optional[bool]:
+        row = self._conn.execute(sqlalchemy.text(CATEGORY_EXISTS), {"p1": id}).first()
+        if row is None:
+            return None
+        return row[0]
+
     def create_category(self, *, name: str, description: str) -> Optional[models.Category]:
         row = self._conn.execute(sqlalchemy.text(CREATE_CATEGORY), {"p1": name, "p2": description}).first()
         if row is None:
@@ -59,6 +78,7 @@ class Querier:
             id=row[0],
             name=row[1],
             description=row[2],
+            updated_at=row[3],
         )
 
     def delete_category(self, *, id: int) -> Optional[models.Category]:
@@ -69,6 +89,7 @@ class Querier:
             id=row[0],
             name=row[1],
             description=row[2],
+            updated_at=row[3],
         )
 
     def get_all_categories(self) -> Iterator[models.Category]:
@@ -78,8 +99,15 @@ class Querier:
                 id=row[0],
                 name=row[1],
                 description=row[2],
+                updated_at=row[3],
             )
 
+    def get_categories_fingerprint(self) -> Optional[int]:
+        row = self._conn.execute(sqlalchemy.text(GET_CATEGORIES_FINGERPRINT)).first()
+        if row is None:
+            return None
+        return row[0]
+
     def get_category_by_id(self, *, id: int) -> Optional[models.Category]:
         row = self._conn.execute(sqlalchemy.text(GET_CATEGORY_BY_ID), {"p1": id}).first()
         if row is None:
@@ -88,6 +116,7 @@ class Querier:
             id=row[0],
             name=row[1],
             description=row[2],
+            updated_at=row[3],
         )
 
     def update_category(self, *, id: int, name: str, description: str) -> Optional[models.Category]:
@@ -98,6 +127,7 @@ class Querier:
             id=row[0],
             name=row[1],
             description=row[2],
+            updated_at=row[3],
         )
 
 
@@ -105,6 +135,12 @@ class AsyncQuerier:
     def __init__(self, conn: sqlalchemy.ext.asyncio.AsyncConnection):
         self._conn = conn
 
+    async def category_exists(self, *, id: int) -> Optional[bool]:
+        row = (await self._conn.execute(sqlalchemy.text(CATEGORY_EXISTS), {"p1": id})).first()
+        if row is None:
+            return None
+        return row[0]
+
     async def create_category(self, *, name: str, description: str) -> Optional[models.Category]:
         row = (await self._conn.execute(sqlalchemy.text(CREATE_CATEGORY), {"p1": name, "p2": description})).first()
         if row is None:
@@ -113,6 +149,7 @@ class AsyncQuerier:
             id=row[0],
             name=row[1],
             description=row[2],
+            updated_at=row[3],
         )
 
     async def delete_category(self, *, id: int) -> Optional[models.Category]:
@@ -123,6 +160,7 @@ class AsyncQuerier:
             id=row[0],
             name=row[1],
             description=row[2],
+            updated_at=row[3],
         )
 
     async def get_all_categories(self) -> AsyncIterator[models.Category]:
@@ -132,8 +170,15 @@ class AsyncQuerier:
                 id=row[0],
                 name=row[1],
                 description=row[2],
+                updated_at=row[3],
             )
 
+    async def get_categories_fingerprint(self) -> Optional[int]:
+        row = (await self._conn.execute(sqlalchemy.text(GET_CATEGORIES_FINGERPRINT))).first()
+        if row is None:
+            return None
+        return row[0]
+
     async def get_category_by_id(self, *, id: int) -> Optional[models.Category]:
         row = (await self._conn.execute(sqlalchemy.text(GET_CATEGORY_BY_ID), {"p1": id})).first()
         if row is None:
@@ -142,6 +187,7 @@ class AsyncQuerier:
             id=row[0],
             name=row[1],
             description=row[2],
+            updated_at=row[3],
         )
 
     async def update_category(self, *, id: int, name: str, description: str) -> Optional[models.Category]:
@@ -152,4 +198,5 @@ class AsyncQuerier:
             id=row[0],
             name=row[1],
             description=row[2],
+            updated_at=row[3],
         )
@@ -1,19 +1,191 @@
-from sqlalchemy import create_engine
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Optional, Union
 
-from config import DATABASE_URL
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Connection, Engine, Result, Row, make_url
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from sqlalchemy.pool import NullPool, Pool
+from starlette.concurrency import run_in_threadpool
+
+from config import DATABASE_URL, DATABASE_MODE, DATABASE_POOL_SIZE, DATABASE_MAX_OVERFLOW, DATABASE_POOL_TIMEOUT, \
+    DATABASE_POOL_PRE_PING, DATABASE_POOL_RECYCLE
 
 import logging
 
 logging.basicConfig()
-logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
 
-engine = create_engine(DATABASE_URL)
+POOL_OPTIONS = {
+    "pool_size": DATABASE_POOL_SIZE,
+    "max_overflow": DATABASE_MAX_OVERFLOW,
+    "pool_timeout": DATABASE_POOL_TIMEOUT,
+    "pool_pre_ping": DATABASE_POOL_PRE_PING,
+    "pool_recycle": DATABASE_POOL_RECYCLE,
+}
+
+DATABASE_MODES = ("async", "sync")
+if DATABASE_MODE not in DATABASE_MODES:
+    raise ValueError(f"DATABASE_MODE must be one of {', '.join(DATABASE_MODES)}")
+
+# The application runs on the async engine, or on the sync one with DATABASE_MODE=sync,
+# which scripts and benchmarks also use. asyncpg is the only async driver: the live
+# updates LISTEN with it whatever the mode
+ASYNC_DATABASE_URL = make_url(DATABASE_URL).set(drivername="postgresql+asyncpg")
+engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **POOL_OPTIONS)
+# Long running streams hold their connection for as long as the client takes to read, they
+# get their own unpooled connections so they never starve the request handlers
+streaming_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+sync_streaming_engine = create_engine(DATABASE_URL, poolclass=NullPool)
+# The pool the request handlers take their connections from
+request_engine: Engine = engine if DATABASE_MODE == "sync" else async_engine.sync_engine
+# Rows a sync stream fetches per round trip when no `yield_per` is set
+SYNC_STREAM_BATCH_SIZE = 1000
+
+
+class SyncConnection:
+    """
+    The part of `AsyncConnection` the queriers and handlers use, over a connection of the
+    sync engine, for `DATABASE_MODE=sync`. Every call runs the blocking psycopg2 work in
+    the thread pool, so the handlers keep their `await`s and the event loop is never
+    stalled. `stream` reads from a server-side cursor one batch at a time.
+    """
+
+    def __init__(self, connection: Connection):
+        self.sync_connection = connection
+
+    async def execute(self, statement, parameters: Optional[Union[dict, list]] = None) -> Result:
+        return await run_in_threadpool(self.sync_connection.execute, statement, parameters)
+
+    async def exec_driver_sql(self, statement: str, parameters: Any = None) -> Result:
+        return await run_in_threadpool(self.sync_connection.exec_driver_sql, statement, parameters)
+
+    async def stream(self, statement, parameters: Optional[dict] = None) -> AsyncIterator[Row]:
+        batch_size = self.sync_connection.get_execution_options().get("yield_per") or SYNC_STREAM_BATCH_SIZE
+        result = await run_in_threadpool(
+            self.sync_connection.execute, statement, parameters, execution_options={"stream_results": True}
+        )
+        return _stream_rows(result, batch_size)
+
+    async def execution_options(self, **options) -> "SyncConnection":
+        self.sync_connection.execution_options(**options)
+        return self
+
+    def get_execution_options(self) -> dict:
+        return self.sync_connection.get_execution_options()
 
+    async def get_raw_connection(self):
+        return self.sync_connection.connection
 
-def get_connection() -> None:
-    connection = engine.connect()
+    async def commit(self):
+        await run_in_threadpool(self.sync_connection.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_connection.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_connection.close)
+
+
+async def _stream_rows(result: Result, batch_size: int) -> AsyncIterator[Row]:
+    try:
+        while rows := await run_in_threadpool(result.fetchmany, batch_size):
+            for row in rows:
+                yield row
+    finally:
+        result.close()
+
+
+async def _connect(async_source, sync_source: Engine) -> Union[AsyncConnection, SyncConnection]:
+    if DATABASE_MODE == "sync":
+        return SyncConnection(await run_in_threadpool(sync_source.connect))
+    return await async_source.connect()
+
+
+@dataclass
+class PoolStats:
+    """
+    Counters collected from the pool events of a single worker process. Together with the
+    live numbers reported by the pool itself they tell whether latency comes from waiting
+    for a connection or from the database.
+    """
+    connects: int = 0
+    checkouts: int = 0
+    invalidations: int = 0
+    acquire_count: int = 0
+    acquire_seconds_total: float = 0.0
+    acquire_seconds_max: float = 0.0
+
+    def record_acquire(self, seconds: float):
+        self.acquire_count += 1
+        self.acquire_seconds_total += seconds
+        self.acquire_seconds_max = max(self.acquire_seconds_max, seconds)
+
+    def snapshot(self, pool: Pool) -> dict:
+        return {
+            "pid": os.getpid(),
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "invalidations": self.invalidations,
+            "acquire_count": self.acquire_count,
+            "acquire_seconds_avg": self.acquire_seconds_total / self.acquire_count if self.acquire_count else 0.0,
+            "acquire_seconds_max": self.acquire_seconds_max,
+        }
+
+
+pool_stats = PoolStats()
+
+
+@event.listens_for(request_engine.pool, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_stats.connects += 1
+
+
+@event.listens_for(request_engine.pool, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats.checkouts += 1
+
+
+@event.listens_for(request_engine.pool, "invalidate")
+@event.listens_for(request_engine.pool, "soft_invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_stats.invalidations += 1
+
+
+def get_pool_stats() -> dict:
+    return pool_stats.snapshot(request_engine.pool)
+
+
+@asynccontextmanager
+async def connection_scope() -> AsyncIterator[AsyncConnection]:
+    start = time.perf_counter()
+    connection = await _connect(async_engine, engine)
+    pool_stats.record_acquire(time.perf_counter() - start)
+    try:
+        yield connection
+        await connection.commit()
+    finally:
+        await connection.close()
+
+
+@asynccontextmanager
+async def streaming_scope() -> AsyncIterator[AsyncConnection]:
+    connection = await _connect(streaming_engine, sync_streaming_engine)
     try:
         yield connection
-        connection.commit()
+        await connection.commit()
     finally:
-        connection.close()
+        await connection.close()
+
+
+async def get_connection() -> AsyncIterator[AsyncConnection]:
+    # FastAPI closes dependencies before a streamed body is sent, streaming responses
+    # must open their own `connection_scope`
+    async with connection_scope() as connection:
+        yield connection
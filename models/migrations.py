@@ -0,0 +1,144 @@
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from config import MIGRATIONS_DIR
+from models.connection import engine
+
+MIGRATION_FILE_PATTERN = re.compile(r"^(?P<version>\d+)_(?P<name>\w+)\.(?P<direction>up|down)\.sql$")
+
+# Arbitrary key for pg_advisory_lock so that two runners never migrate at the same time
+MIGRATIONS_LOCK_KEY = 7_340_001
+
+CREATE_HISTORY_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations
+(
+    version    INT PRIMARY KEY,
+    name       TEXT      NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    up_path: Optional[str] = None
+    down_path: Optional[str] = None
+
+    def read(self, direction: str) -> str:
+        path = self.up_path if direction == "up" else self.down_path
+        if path is None:
+            raise ValueError(f"Migration {self.version}_{self.name} has no {direction} script")
+        with open(path) as f:
+            return f.read()
+
+
+def discover_migrations(directory: str = MIGRATIONS_DIR) -> list[Migration]:
+    """
+    Collects the `<version>_<name>.up.sql` / `<version>_<name>.down.sql` pairs of the
+    migrations directory, ordered by version.
+
+    :param directory: Directory holding the migration scripts.
+    :return: The migrations found, ordered by version.
+    """
+    migrations: dict[int, Migration] = {}
+    for file_name in os.listdir(directory):
+        match = MIGRATION_FILE_PATTERN.match(file_name)
+        if match is None:
+            continue
+        version = int(match["version"])
+        migration = migrations.setdefault(version, Migration(version=version, name=match["name"]))
+        if migration.name != match["name"]:
+            raise ValueError(f"Migration version {version} is used by both {migration.name} and {match['name']}")
+        setattr(migration, f"{match['direction']}_path", os.path.join(directory, file_name))
+    return sorted(migrations.values(), key=lambda m: m.version)
+
+
+def get_applied_migrations(connection: Connection) -> dict[int, datetime]:
+    connection.execute(text(CREATE_HISTORY_TABLE))
+    rows = connection.execute(text("SELECT version, applied_at FROM schema_migrations"))
+    return {version: applied_at for version, applied_at in rows}
+
+
+def _apply(connection: Connection, migration: Migration, direction: str):
+    with connection.begin():
+        connection.exec_driver_sql(migration.read(direction))
+        if direction == "up":
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                {"version": migration.version, "name": migration.name},
+            )
+        else:
+            connection.execute(
+                text("DELETE FROM schema_migrations WHERE version = :version"), {"version": migration.version}
+            )
+
+
+def _locked_connection():
+    connection = engine.connect()
+    connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+    connection.commit()
+    return connection
+
+
+def _release(connection: Connection):
+    connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+    connection.commit()
+    connection.close()
+
+
+def migrate_up(target: Optional[int] = None) -> list[Migration]:
+    """
+    Applies every pending migration up to `target` (all of them by default). Each
+    migration runs in its own transaction together with its history row, so a failing
+    script leaves the schema at the last successful version.
+
+    :param target: Highest version to apply.
+    :return: The migrations that were applied.
+    """
+    connection = _locked_connection()
+    try:
+        with connection.begin():
+            applied = get_applied_migrations(connection)
+        pending = [
+            migration for migration in discover_migrations()
+            if migration.version not in applied and (target is None or migration.version <= target)
+        ]
+        for migration in pending:
+            _apply(connection, migration, "up")
+        return pending
+    finally:
+        _release(connection)
+
+
+def migrate_down(steps: int = 1) -> list[Migration]:
+    """
+    Reverts the `steps` most recently applied migrations, newest first.
+
+    :param steps: Number of migrations to revert.
+    :return: The migrations that were reverted.
+    """
+    connection = _locked_connection()
+    try:
+        with connection.begin():
+            applied = get_applied_migrations(connection)
+        reverting = [migration for migration in reversed(discover_migrations()) if migration.version in applied]
+        reverting = reverting[:steps]
+        for migration in reverting:
+            _apply(connection, migration, "down")
+        return reverting
+    finally:
+        _release(connection)
+
+
+def migration_status() -> list[tuple[Migration, Optional[datetime]]]:
+    with engine.begin() as connection:
+        applied = get_applied_migrations(connection)
+    return [(migration, applied.get(migration.version)) for migration in discover_migrations()]
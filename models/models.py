@@ -18,6 +18,7 @@ class Category:
     id: int
     name: str
     description: str
+    updated_at: datetime.datetime
 
 
 @dataclasses.dataclass()
@@ -29,12 +30,27 @@ class Person:
     image_path: Optional[str]
 
 
+@dataclasses.dataclass()
+class RevokedToken:
+    jti: str
+    expires_at: datetime.datetime
+
+
 @dataclasses.dataclass()
 class Task:
     id: int
     description: str
-    created_at: Optional[datetime.datetime]
+    created_at: datetime.datetime
     expected_finished_at: Optional[datetime.datetime]
     state: State
     person_id: Optional[int]
     category_id: Optional[int]
+    updated_at: datetime.datetime
+
+
+@dataclasses.dataclass()
+class TaskStat:
+    person_id: int
+    category_id: Optional[int]
+    state: State
+    task_count: int
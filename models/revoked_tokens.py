@@ -0,0 +1,86 @@
+# Code generated by sqlc. DO NOT EDIT.
+# versions:
+#   sqlc v1.27.0
+# source: revoked_tokens.sql
+import datetime
+from typing import AsyncIterator, Iterator, Optional
+
+import sqlalchemy
+import sqlalchemy.ext.asyncio
+
+from models import models
+
+
+DELETE_EXPIRED_REVOKED_TOKENS = """-- name: delete_expired_revoked_tokens \\:execrows
+DELETE
+FROM revoked_tokens
+WHERE expires_at <= CURRENT_TIMESTAMP
+"""
+
+
+GET_ACTIVE_REVOKED_TOKEN_IDS = """-- name: get_active_revoked_token_ids \\:many
+SELECT jti
+FROM revoked_tokens
+WHERE expires_at > CURRENT_TIMESTAMP
+"""
+
+
+IS_TOKEN_REVOKED = """-- name: is_token_revoked \\:one
+SELECT EXISTS(SELECT 1
+              FROM revoked_tokens
+              WHERE jti = :p1
+                AND expires_at > CURRENT_TIMESTAMP)
+"""
+
+
+REVOKE_TOKEN = """-- name: revoke_token \\:exec
+INSERT INTO revoked_tokens (jti, expires_at)
+VALUES (:p1, :p2)
+ON CONFLICT (jti) DO NOTHING
+"""
+
+
+class Querier:
+    def __init__(self, conn: sqlalchemy.engine.Connection):
+        self._conn = conn
+
+    def delete_expired_revoked_tokens(self) -> int:
+        result = self._conn.execute(sqlalchemy.text(DELETE_EXPIRED_REVOKED_TOKENS))
+        return result.rowcount
+
+    def get_active_revoked_token_ids(self) -> Iterator[str]:
+        result = self._conn.execute(sqlalchemy.text(GET_ACTIVE_REVOKED_TOKEN_IDS))
+        for row in result:
+            yield row[0]
+
+    def is_token_revoked(self, *, jti: str) -> Optional[bool]:
+        row = self._conn.execute(sqlalchemy.text(IS_TOKEN_REVOKED), {"p1": jti}).first()
+        if row is None:
+            return None
+        return row[0]
+
+    def revoke_token(self, *, jti: str, expires_at: datetime.datetime) -> None:
+        self._conn.execute(sqlalchemy.text(REVOKE_TOKEN), {"p1": jti, "p2": expires_at})
+
+
+class AsyncQuerier:
+    def __init__(self, conn: sqlalchemy.ext.asyncio.AsyncConnection):
+        self._conn = conn
+
+    async def delete_expired_revoked_tokens(self) -> int:
+        result = await self._conn.execute(sqlalchemy.text(DELETE_EXPIRED_REVOKED_TOKENS))
+        return result.rowcount
+
+    async def get_active_revoked_token_ids(self) -> AsyncIterator[str]:
+        result = await self._conn.stream(sqlalchemy.text(GET_ACTIVE_REVOKED_TOKEN_IDS))
+        async for row in result:
+            yield row[0]
+
+    async def is_token_revoked(self, *, jti: str) -> Optional[bool]:
+        row = (await self._conn.execute(sqlalchemy.text(IS_TOKEN_REVOKED), {"p1": jti})).first()
+        if row is None:
+            return None
+        return row[0]
+
+    async def revoke_token(self, *, jti: str, expires_at: datetime.datetime) -> None:
+        await self._conn.execute(sqlalchemy.text(REVOKE_TOKEN), {"p1": jti, "p2": expires_at})
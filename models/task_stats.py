@@ -0,0 +1,121 @@
+# Code generated by sqlc. DO NOT EDIT.
+# versions:
+#   sqlc v1.27.0
+# source: task_stats.sql
+import dataclasses
+from typing import AsyncIterator, Iterator, Optional
+
+import sqlalchemy
+import sqlalchemy.ext.asyncio
+
+from models import models
+
+
+CHECK_TASK_STATS = """-- name: check_task_stats \\:many
+SELECT coalesce(stored.person_id, actual.person_id)     AS person_id,
+       coalesce(stored.category_id, actual.category_id) AS category_id,
+       coalesce(stored.state, actual.state)             AS state,
+       coalesce(stored.task_count, 0)                   AS stored_count,
+       coalesce(actual.task_count, 0)                   AS actual_count
+FROM task_stats AS stored
+         FULL JOIN (SELECT person_id, category_id, state, count(*) AS task_count
+                    FROM tasks
+                    WHERE person_id IS NOT NULL
+                    GROUP BY person_id, category_id, state) AS actual
+                   ON stored.person_id = actual.person_id
+                       AND coalesce(stored.category_id, 0) = coalesce(actual.category_id, 0)
+                       AND stored.state = actual.state
+WHERE coalesce(stored.task_count, 0) <> coalesce(actual.task_count, 0)
+ORDER BY 1, 2, 3
+"""
+
+
+GET_TASK_STATS_BY_USERNAME = """-- name: get_task_stats_by_username \\:many
+SELECT task_stats.category_id, task_stats.state, task_stats.task_count
+FROM task_stats
+         JOIN persons ON task_stats.person_id = persons.id AND persons.username = :p1
+WHERE task_stats.task_count <> 0
+"""
+
+
+REBUILD_TASK_STATS = """-- name: rebuild_task_stats \\:one
+SELECT rebuild_task_stats()
+"""
+
+
+@dataclasses.dataclass()
+class CheckTaskStatsRow:
+    person_id: int
+    category_id: Optional[int]
+    state: models.State
+    stored_count: int
+    actual_count: int
+
+
+@dataclasses.dataclass()
+class GetTaskStatsByUsernameRow:
+    category_id: Optional[int]
+    state: models.State
+    task_count: int
+
+
+class Querier:
+    def __init__(self, conn: sqlalchemy.engine.Connection):
+        self._conn = conn
+
+    def check_task_stats(self) -> Iterator[CheckTaskStatsRow]:
+        result = self._conn.execute(sqlalchemy.text(CHECK_TASK_STATS))
+        for row in result:
+            yield CheckTaskStatsRow(
+                person_id=row[0],
+                category_id=row[1],
+                state=row[2],
+                stored_count=row[3],
+                actual_count=row[4],
+            )
+
+    def get_task_stats_by_username(self, *, username: str) -> Iterator[GetTaskStatsByUsernameRow]:
+        result = self._conn.execute(sqlalchemy.text(GET_TASK_STATS_BY_USERNAME), {"p1": username})
+        for row in result:
+            yield GetTaskStatsByUsernameRow(
+                category_id=row[0],
+                state=row[1],
+                task_count=row[2],
+            )
+
+    def rebuild_task_stats(self) -> Optional[int]:
+        row = self._conn.execute(sqlalchemy.text(REBUILD_TASK_STATS)).first()
+        if row is None:
+            return None
+        return row[0]
+
+
+class AsyncQuerier:
+    def __init__(self, conn: sqlalchemy.ext.asyncio.AsyncConnection):
+        self._conn = conn
+
+    async def check_task_stats(self) -> AsyncIterator[CheckTaskStatsRow]:
+        result = await self._conn.stream(sqlalchemy.text(CHECK_TASK_STATS))
+        async for row in result:
+            yield CheckTaskStatsRow(
+                person_id=row[0],
+                category_id=row[1],
+                state=row[2],
+                stored_count=row[3],
+                actual_count=row[4],
+            )
+
+    async def get_task_stats_by_username(self, *, username: str) -> AsyncIterator[GetTaskStatsByUsernameRow]:
+        result = await self._conn.stream(sqlalchemy.text(GET_TASK_STATS_BY_USERNAME), {"p1": username})
+        async for row in result:
+            yield GetTaskStatsByUsernameRow(
+                category_id=row[0],
+                state=row[1],
+                task_count=row[2],
+            )
+
+    async def rebuild_task_stats(self) -> Optional[int]:
+        row = (await self._conn.execute(sqlalchemy.text(REBUILD_TASK_STATS))).first()
+        if row is None:
+            return None
+        return row[0]
@@ -4,7 +4,7 @@
 # source: tasks.sql
 import dataclasses
 import datetime
-from typing import AsyncIterator, Iterator, Optional
+from typing import Any, AsyncIterator, Iterator, List, Optional
 
 import sqlalchemy
 import sqlalchemy.ext.asyncio
@@ -12,9 +12,36 @@ import sqlalchemy.ext.asyncio
 from models import models
 
 
+BULK_DELETE_TASKS = """-- name: bulk_delete_tasks \\:many
+DELETE
+FROM tasks
+WHERE id = ANY (CAST(:p1 AS int[]))
+  AND person_id = :p2
+RETURNING id
+"""
+
+
+BULK_MOVE_TASKS_TO_CATEGORY = """-- name: bulk_move_tasks_to_category \\:many
+UPDATE tasks
+SET category_id = :p1
+WHERE id = ANY (CAST(:p2 AS int[]))
+  AND person_id = :p3
+RETURNING id, description, created_at, expected_finished_at, state, person_id, category_id, updated_at
+"""
+
+
+BULK_SET_TASK_STATE = """-- name: bulk_set_task_state \\:many
+UPDATE tasks
+SET state = :p1
+WHERE id = ANY (CAST(:p2 AS int[]))
+  AND person_id = :p3
+RETURNING id, description, created_at, expected_finished_at, state, person_id, category_id, updated_at
+"""
+
+
 CREATE_TASK = """-- name: create_task \\:one
-         INSERT INTO tasks (description, person_id, category_id)
-VALUES (:p1, :p2, :p3) RETURNING id, description, created_at, expected_finished_at, state, person_id, category_id
+INSERT INTO tasks (description, person_id, category_id, state, expected_finished_at)
+VALUES (:p1, :p2, :p3, :p4, :p5) RETURNING id, description, created_at, expected_finished_at, state, person_id, category_id, updated_at
 """
 
 
@@ -22,32 +49,140 @@ DELETE_TASK = """-- name: delete_task \\:one
 DELETE
 FROM tasks
 WHERE id = :p1
-RETURNING id, description, created_at, expected_finished_at, state, person_id, category_id
+RETURNING id, description, created_at, expected_finished_at, state, person_id, category_id, updated_at
+"""
+
+
+EXPORT_TASKS_BY_USERNAME = """-- name: export_tasks_by_username \\:many
+SELECT tasks.description,
+       categories.name AS category,
+       tasks.state,
+       tasks.expected_finished_at,
+       tasks.created_at
+FROM tasks
+         JOIN persons ON tasks.person_id = persons.id AND persons.username = :p1
+         LEFT JOIN categories ON tasks.category_id = categories.id
+ORDER BY tasks.created_at, tasks.id
 """
 
 
 GET_TASK_BY_ID = """-- name: get_task_by_id \\:one
-SELECT id, description, created_at, expected_finished_at, state, person_id, category_id
+SELECT id, description, created_at, expected_finished_at, state, person_id, category_id, updated_at
 FROM tasks
 WHERE id = :p1
 """
 
 
+GET_TASK_PAGE_FINGERPRINT = """-- name: get_task_page_fingerprint \\:one
+SELECT persons.id,
+       COALESCE(task_versions.version, 0) AS task_version,
+       category_versions.version          AS category_version
+FROM persons
+         LEFT JOIN task_versions ON task_versions.person_id = persons.id
+         CROSS JOIN category_versions
+WHERE persons.username = :p1
+"""
+
+
+GET_TASK_PAGE_VIEW = """-- name: get_task_page_view \\:one
+WITH person AS (SELECT id, username, email, password_hash, image_path
+                FROM persons
+                WHERE persons.username = :p1),
+     page AS ((SELECT tasks.id, tasks.description, tasks.created_at, tasks.expected_finished_at, tasks.state, tasks.person_id, tasks.category_id, tasks.updated_at
+               FROM tasks
+                        JOIN person ON tasks.person_id = person.id
+               WHERE CAST(:p2 AS int) IS NULL
+                 AND (tasks.created_at, tasks.id) < (CAST(:p3 AS timestamp), CAST(:p4 AS int))
+               ORDER BY tasks.created_at DESC, tasks.id DESC
+               LIMIT :p5)
+              UNION ALL
+              (SELECT tasks.id, tasks.description, tasks.created_at, tasks.expected_finished_at, tasks.state, tasks.person_id, tasks.category_id, tasks.updated_at
+               FROM tasks
+                        JOIN person ON tasks.person_id = person.id
+               WHERE tasks.category_id = :p2
+                 AND (tasks.created_at, tasks.id) < (CAST(:p3 AS timestamp), CAST(:p4 AS int))
+               ORDER BY tasks.created_at DESC, tasks.id DESC
+               LIMIT :p5))
+SELECT person.id,
+       person.username,
+       person.email,
+       person.password_hash,
+       person.image_path,
+       (SELECT json_agg(categories ORDER BY categories.id) FROM categories)          AS categories,
+       (SELECT json_agg(page ORDER BY page.created_at DESC, page.id DESC) FROM page) AS tasks,
+       COALESCE(task_versions.version, 0)                                            AS task_version,
+       category_versions.version                                                     AS category_version
+FROM person
+         LEFT JOIN task_versions ON task_versions.person_id = person.id
+         CROSS JOIN category_versions
+"""
+
+
 GET_TASK_USERNAME_AND_BY_CATEGORY_ID = """-- name: get_task_username_and_by_category_id \\:many
-SELECT tasks.id, tasks.description, tasks.created_at, tasks.expected_finished_at, tasks.state, tasks.person_id, tasks.category_id
+SELECT tasks.id, tasks.description, tasks.created_at, tasks.expected_finished_at, tasks.state, tasks.person_id, tasks.category_id, tasks.updated_at
 FROM tasks
     JOIN persons ON tasks.person_id = persons.id AND persons.username = :p1
 WHERE tasks.category_id = :p2
 """
 
 
+GET_TASKS_BY_IDS = """-- name: get_tasks_by_ids \\:many
+SELECT id, description, created_at, expected_finished_at, state, person_id, category_id, updated_at
+FROM tasks
+WHERE id = ANY (CAST(:p1 AS int[]))
+"""
+
+
 GET_TASKS_BY_USERNAME = """-- name: get_tasks_by_username \\:many
-SELECT tasks.id, tasks.description, tasks.created_at, tasks.expected_finished_at, tasks.state, tasks.person_id, tasks.category_id
+SELECT tasks.id, tasks.description, tasks.created_at, tasks.expected_finished_at, tasks.state, tasks.person_id, tasks.category_id, tasks.updated_at
 FROM tasks
          JOIN persons ON tasks.person_id = persons.id AND persons.username = :p1
 """
 
 
+GET_TASKS_PAGE_BY_USERNAME = """-- name: get_tasks_page_by_username \\:many
+SELECT tasks.id, tasks.description, tasks.created_at, tasks.expected_finished_at, tasks.state, tasks.person_id, tasks.category_id, tasks.updated_at
+FROM tasks
+         JOIN persons ON tasks.person_id = persons.id AND persons.username = :p1
+WHERE (tasks.created_at, tasks.id) < (CAST(:p2 AS timestamp), CAST(:p3 AS int))
+ORDER BY tasks.created_at DESC, tasks.id DESC
+LIMIT :p4
+"""
+
+
+GET_TASKS_PAGE_BY_USERNAME_AND_CATEGORY_ID = """-- name: get_tasks_page_by_username_and_category_id \\:many
+SELECT tasks.id, tasks.description, tasks.created_at, tasks.expected_finished_at, tasks.state, tasks.person_id, tasks.category_id, tasks.updated_at
+FROM tasks
+         JOIN persons ON tasks.person_id = persons.id AND persons.username = :p1
+WHERE tasks.category_id = :p2
+  AND (tasks.created_at, tasks.id) < (CAST(:p3 AS timestamp), CAST(:p4 AS int))
+ORDER BY tasks.created_at DESC, tasks.id DESC
+LIMIT :p5
+"""
+
+
+SEARCH_TASKS_BY_USERNAME = """-- name: search_tasks_by_username \\:many
+WITH matches AS (SELECT tasks.id,
+                        ts_rank(to_tsvector('simple', tasks.description), query) AS rank
+                 FROM tasks
+                          JOIN persons ON tasks.person_id = persons.id AND persons.username = :p1,
+                      to_tsquery('simple', :p2) AS query
+                 WHERE to_tsvector('simple', tasks.description) @@ query),
+     page AS (SELECT matches.id, matches.rank
+              FROM matches
+              WHERE (matches.rank, matches.id) < (CAST(:p3 AS real), CAST(:p4 AS int))
+              ORDER BY matches.rank DESC, matches.id DESC
+              LIMIT :p5)
+SELECT tasks.id, tasks.description, tasks.created_at, tasks.expected_finished_at, tasks.state, tasks.person_id, tasks.category_id, tasks.updated_at,
+       page.rank,
+       ts_headline('simple', tasks.description, to_tsquery('simple', :p2),
+                   'MaxFragments=2, MaxWords=20, MinWords=8, StartSel=' || chr(2) || ', StopSel=' || chr(3)) AS snippet
+FROM page
+         JOIN tasks ON tasks.id = page.id
+ORDER BY page.rank DESC, page.id DESC
+"""
+
+
 UPDATE_TASK = """-- name: update_task \\:one
 UPDATE tasks
 SET description          = :p1,
@@ -55,10 +190,89 @@ SET description          = :p1,
     state                = :p3,
     category_id          = :p4
 WHERE id = :p5
-RETURNING id, description, created_at, expected_finished_at, state, person_id, category_id
+RETURNING id, description, created_at, expected_finished_at, state, person_id, category_id, updated_at
 """
 
 
+@dataclasses.dataclass()
+class CreateTaskParams:
+    description: str
+    person_id: Optional[int]
+    category_id: Optional[int]
+    state: models.State
+    expected_finished_at: Optional[datetime.datetime]
+
+
+@dataclasses.dataclass()
+class ExportTasksByUsernameRow:
+    description: str
+    category: Optional[str]
+    state: models.State
+    expected_finished_at: Optional[datetime.datetime]
+    created_at: datetime.datetime
+
+
+@dataclasses.dataclass()
+class GetTaskPageFingerprintRow:
+    id: int
+    task_version: int
+    category_version: int
+
+
+@dataclasses.dataclass()
+class GetTaskPageViewParams:
+    username: str
+    category_id: Optional[int]
+    before_created_at: datetime.datetime
+    before_id: int
+    page_size: int
+
+
+@dataclasses.dataclass()
+class GetTaskPageViewRow:
+    id: int
+    username: str
+    email: str
+    password_hash: str
+    image_path: Optional[str]
+    categories: Optional[Any]
+    tasks: Optional[Any]
+    task_version: int
+    category_version: int
+
+
+@dataclasses.dataclass()
+class GetTasksPageByUsernameAndCategoryIdParams:
+    username: str
+    category_id: Optional[int]
+    before_created_at: datetime.datetime
+    before_id: int
+    page_size: int
+
+
+@dataclasses.dataclass()
+class SearchTasksByUsernameParams:
+    username: str
+    query: str
+    before_rank: float
+    before_id: int
+    page_size: int
+
+
+@dataclasses.dataclass()
+class SearchTasksByUsernameRow:
+    id: int
+    description: str
+    created_at: datetime.datetime
+    expected_finished_at: Optional[datetime.datetime]
+    state: models.State
+    person_id: int
+    category_id: Optional[int]
+    updated_at: datetime.datetime
+    rank: float
+    snippet: str
+
+
 @dataclasses.dataclass()
 class UpdateTaskParams:
     description: str
@@ -72,8 +286,47 @@ class Querier:
     def __init__(self, conn: sqlalchemy.engine.Connection):
         self._conn = conn
 
-    def create_task(self, *, description: str, person_id: Optional[int], category_id: Optional[int]) -> Optional[models.Task]:
-        row = self._conn.execute(sqlalchemy.text(CREATE_TASK), {"p1": description, "p2": person_id, "p3": category_id}).first()
+    def bulk_delete_tasks(self, *, ids: List[int], person_id: Optional[int]) -> Iterator[int]:
+        result = self._conn.execute(sqlalchemy.text(BULK_DELETE_TASKS), {"p1": ids, "p2": person_id})
+        for row in result:
+            yield row[0]
+
+    def bulk_move_tasks_to_category(self, *, category_id: Optional[int], ids: List[int], person_id: Optional[int]) -> Iterator[models.Task]:
+        result = self._conn.execute(sqlalchemy.text(BULK_MOVE_TASKS_TO_CATEGORY), {"p1": category_id, "p2": ids, "p3": person_id})
+        for row in result:
+            yield models.Task(
+                id=row[0],
+                description=row[1],
+                created_at=row[2],
+                expected_finished_at=row[3],
+                state=row[4],
+                person_id=row[5],
+                category_id=row[6],
+                updated_at=row[7],
+            )
+
+    def bulk_set_task_state(self, *, state: models.State, ids: List[int], person_id: Optional[int]) -> Iterator[models.Task]:
+        result = self._conn.execute(sqlalchemy.text(BULK_SET_TASK_STATE), {"p1": state, "p2": ids, "p3": person_id})
+        for row in result:
+            yield models.Task(
+                id=row[0],
+                description=row[1],
+                created_at=row[2],
+                expected_finished_at=row[3],
+                state=row[4],
+                person_id=row[5],
+                category_id=row[6],
+                updated_at=row[7],
+            )
+
+    def create_task(self, arg: CreateTaskParams) -> Optional[models.Task]:
+        row = self._conn.execute(sqlalchemy.text(CREATE_TASK), {
+            "p1": arg.description,
+            "p2": arg.person_id,
+            "p3": arg.category_id,
+            "p4": arg.state,
+            "p5": arg.expected_finished_at,
+        }).first()
         if row is None:
             return None
         return models.Task(
@@ -84,6 +337,7 @@ class Querier:
             state=row[4],
             person_id=row[5],
             category_id=row[6],
+            updated_at=row[7],
         )
 
     def delete_task(self, *, id: int) -> Optional[models.Task]:
@@ -98,8 +352,20 @@ class Querier:
             state=row[4],
             person_id=row[5],
             category_id=row[6],
+            updated_at=row[7],
         )
 
+    def export_tasks_by_username(self, *, username: str) -> Iterator[ExportTasksByUsernameRow]:
+        result = self._conn.execute(sqlalchemy.text(EXPORT_TASKS_BY_USERNAME), {"p1": username})
+        for row in result:
+            yield ExportTasksByUsernameRow(
+                description=row[0],
+                category=row[1],
+                state=row[2],
+                expected_finished_at=row[3],
+                created_at=row[4],
+            )
+
     def get_task_by_id(self, *, id: int) -> Optional[models.Task]:
         row = self._conn.execute(sqlalchemy.text(GET_TASK_BY_ID), {"p1": id}).first()
         if row is None:
@@ -112,6 +378,39 @@ class Querier:
             state=row[4],
             person_id=row[5],
             category_id=row[6],
+            updated_at=row[7],
+        )
+
+    def get_task_page_fingerprint(self, *, username: str) -> Optional[GetTaskPageFingerprintRow]:
+        row = self._conn.execute(sqlalchemy.text(GET_TASK_PAGE_FINGERPRINT), {"p1": username}).first()
+        if row is None:
+            return None
+        return GetTaskPageFingerprintRow(
+            id=row[0],
+            task_version=row[1],
+            category_version=row[2],
+        )
+
+    def get_task_page_view(self, arg: GetTaskPageViewParams) -> Optional[GetTaskPageViewRow]:
+        row = self._conn.execute(sqlalchemy.text(GET_TASK_PAGE_VIEW), {
+            "p1": arg.username,
+            "p2": arg.category_id,
+            "p3": arg.before_created_at,
+            "p4": arg.before_id,
+            "p5": arg.page_size,
+        }).first()
+        if row is None:
+            return None
+        return GetTaskPageViewRow(
+            id=row[0],
+            username=row[1],
+            email=row[2],
+            password_hash=row[3],
+            image_path=row[4],
+            categories=row[5],
+            tasks=row[6],
+            task_version=row[7],
+            category_version=row[8],
         )
 
     def get_task_username_and_by_category_id(self, *, username: str, category_id: Optional[int]) -> Iterator[models.Task]:
@@ -125,6 +424,21 @@ class Querier:
                 state=row[4],
                 person_id=row[5],
                 category_id=row[6],
+                updated_at=row[7],
+            )
+
+    def get_tasks_by_ids(self, *, ids: List[int]) -> Iterator[models.Task]:
+        result = self._conn.execute(sqlalchemy.text(GET_TASKS_BY_IDS), {"p1": ids})
+        for row in result:
+            yield models.Task(
+                id=row[0],
+                description=row[1],
+                created_at=row[2],
+                expected_finished_at=row[3],
+                state=row[4],
+                person_id=row[5],
+                category_id=row[6],
+                updated_at=row[7],
             )
 
     def get_tasks_by_username(self, *, username: str) -> Iterator[models.Task]:
@@ -138,6 +452,68 @@ class Querier:
                 state=row[4],
                 person_id=row[5],
                 category_id=row[6],
+                updated_at=row[7],
+            )
+
+    def get_tasks_page_by_username(self, *, username: str, before_created_at: datetime.datetime, before_id: int, page_size: int) -> Iterator[models.Task]:
+        result = self._conn.execute(sqlalchemy.text(GET_TASKS_PAGE_BY_USERNAME), {
+            "p1": username,
+            "p2": before_created_at,
+            "p3": before_id,
+            "p4": page_size,
+        })
+        for row in result:
+            yield models.Task(
+                id=row[0],
+                description=row[1],
+                created_at=row[2],
+                expected_finished_at=row[3],
+                state=row[4],
+                person_id=row[5],
+                category_id=row[6],
+                updated_at=row[7],
+            )
+
+    def get_tasks_page_by_username_and_category_id(self, arg: GetTasksPageByUsernameAndCategoryIdParams) -> Iterator[models.Task]:
+        result = self._conn.execute(sqlalchemy.text(GET_TASKS_PAGE_BY_USERNAME_AND_CATEGORY_ID), {
+            "p1": arg.username,
+            "p2": arg.category_id,
+            "p3": arg.before_created_at,
+            "p4": arg.before_id,
+            "p5": arg.page_size,
+        })
+        for row in result:
+            yield models.Task(
+                id=row[0],
+                description=row[1],
+                created_at=row[2],
+                expected_finished_at=row[3],
+                state=row[4],
+                person_id=row[5],
+                category_id=row[6],
+                updated_at=row[7],
+            )
+
+    def search_tasks_by_username(self, arg: SearchTasksByUsernameParams) -> Iterator[SearchTasksByUsernameRow]:
+        result = self._conn.execute(sqlalchemy.text(SEARCH_TASKS_BY_USERNAME), {
+            "p1": arg.username,
+            "p2": arg.query,
+            "p3": arg.before_rank,
+            "p4": arg.before_id,
+            "p5": arg.page_size,
+        })
+        for row in result:
+            yield SearchTasksByUsernameRow(
+                id=row[0],
+                description=row[1],
+                created_at=row[2],
+                expected_finished_at=row[3],
+                state=row[4],
+                person_id=row[5],
+                category_id=row[6],
+                updated_at=row[7],
+                rank=row[8],
+                snippet=row[9],
             )
 
     def update_task(self, arg: UpdateTaskParams) -> Optional[models.Task]:
@@ -158,6 +534,7 @@ class Querier:
             state=row[4],
             person_id=row[5],
             category_id=row[6],
+            updated_at=row[7],
         )
 
 
@@ -165,8 +542,47 @@ class AsyncQuerier:
     def __init__(self, conn: sqlalchemy.ext.asyncio.AsyncConnection):
         self._conn = conn
 
-    async def create_task(self, *, description: str, person_id: Optional[int], category_id: Optional[int]) -> Optional[models.Task]:
-        row = (await self._conn.execute(sqlalchemy.text(CREATE_TASK), {"p1": description, "p2": person_id, "p3": category_id})).first()
+    async def bulk_delete_tasks(self, *, ids: List[int], person_id: Optional[int]) -> AsyncIterator[int]:
+        result = await self._conn.stream(sqlalchemy.text(BULK_DELETE_TASKS), {"p1": ids, "p2": person_id})
+        async for row in result:
+            yield row[0]
+
+    async def bulk_move_tasks_to_category(self, *, category_id: Optional[int], ids: List[int], person_id: Optional[int]) -> AsyncIterator[models.Task]:
+        result = await self._conn.stream(sqlalchemy.text(BULK_MOVE_TASKS_TO_CATEGORY), {"p1": category_id, "p2": ids, "p3": person_id})
+        async for row in result:
+            yield models.Task(
+                id=row[0],
+                description=row[1],
+                created_at=row[2],
+                expected_finished_at=row[3],
+                state=row[4],
+                person_id=row[5],
+                category_id=row[6],
+                updated_at=row[7],
+            )
+
+    async def bulk_set_task_state(self, *, state: models.State, ids: List[int], person_id: Optional[int]) -> AsyncIterator[models.Task]:
+        result = await self._conn.stream(sqlalchemy.text(BULK_SET_TASK_STATE), {"p1": state, "p2": ids, "p3": person_id})
+        async for row in result:
+            yield models.Task(
+                id=row[0],
+                description=row[1],
+                created_at=row[2],
+                expected_finished_at=row[3],
+                state=row[4],
+                person_id=row[5],
+                category_id=row[6],
+                updated_at=row[7],
+            )
+
+    async def create_task(self, arg: CreateTaskParams) -> Optional[models.Task]:
+        row = (await self._conn.execute(sqlalchemy.text(CREATE_TASK), {
+            "p1": arg.description,
+            "p2": arg.person_id,
+            "p3": arg.category_id,
+            "p4": arg.state,
+            "p5": arg.expected_finished_at,
+        })).first()
         if row is None:
             return None
         return models.Task(
@@ -177,6 +593,7 @@ class AsyncQuerier:
             state=row[4],
             person_id=row[5],
             category_id=row[6],
+            updated_at=row[7],
         )
 
     async def delete_task(self, *, id: int) -> Optional[models.Task]:
@@ -191,8 +608,20 @@ class AsyncQuerier:
             state=row[4],
             person_id=row[5],
             category_id=row[6],
+            updated_at=row[7],
         )
 
+    async def export_tasks_by_username(self, *, username: str) -> AsyncIterator[ExportTasksByUsernameRow]:
+        result = await self._conn.stream(sqlalchemy.text(EXPORT_TASKS_BY_USERNAME), {"p1": username})
+        async for row in result:
+            yield ExportTasksByUsernameRow(
+                description=row[0],
+                category=row[1],
+                state=row[2],
+                expected_finished_at=row[3],
+                created_at=row[4],
+            )
+
     async def get_task_by_id(self, *, id: int) -> Optional[models.Task]:
         row = (await self._conn.execute(sqlalchemy.text(GET_TASK_BY_ID), {"p1": id})).first()
         if row is None:
@@ -205,6 +634,39 @@ class AsyncQuerier:
             state=row[4],
             person_id=row[5],
             category_id=row[6],
+            updated_at=row[7],
+        )
+
+    async def get_task_page_fingerprint(self, *, username: str) -> Optional[GetTaskPageFingerprintRow]:
+        row = (await self._conn.execute(sqlalchemy.text(GET_TASK_PAGE_FINGERPRINT), {"p1": username})).first()
+        if row is None:
+            return None
+        return GetTaskPageFingerprintRow(
+            id=row[0],
+            task_version=row[1],
+            category_version=row[2],
+        )
+
+    async def get_task_page_view(self, arg: GetTaskPageViewParams) -> Optional[GetTaskPageViewRow]:
+        row = (await self._conn.execute(sqlalchemy.text(GET_TASK_PAGE_VIEW), {
+            "p1": arg.username,
+            "p2": arg.category_id,
+            "p3": arg.before_created_at,
+            "p4": arg.before_id,
+            "p5": arg.page_size,
+        })).first()
+        if row is None:
+            return None
+        return GetTaskPageViewRow(
+            id=row[0],
+            username=row[1],
+            email=row[2],
+            password_hash=row[3],
+            image_path=row[4],
+            categories=row[5],
+            tasks=row[6],
+            task_version=row[7],
+            category_version=row[8],
         )
 
     async def get_task_username_and_by_category_id(self, *, username: str, category_id: Optional[int]) -> AsyncIterator[models.Task]:
@@ -218,6 +680,21 @@ class AsyncQuerier:
                 state=row[4],
                 person_id=row[5],
                 category_id=row[6],
+                updated_at=row[7],
+            )
+
+    async def get_tasks_by_ids(self, *, ids: List[int]) -> AsyncIterator[models.Task]:
+        result = await self._conn.stream(sqlalchemy.text(GET_TASKS_BY_IDS), {"p1": ids})
+        async for row in result:
+            yield models.Task(
+                id=row[0],
+                description=row[1],
+                created_at=row[2],
+                expected_finished_at=row[3],
+                state=row[4],
+                person_id=row[5],
+                category_id=row[6],
+                updated_at=row[7],
             )
 
     async def get_tasks_by_username(self, *, username: str) -> AsyncIterator[models.Task]:
@@ -231,6 +708,68 @@ class AsyncQuerier:
                 state=row[4],
                 person_id=row[5],
                 category_id=row[6],
+                updated_at=row[7],
+            )
+
+    async def get_tasks_page_by_username(self, *, username: str, before_created_at: datetime.datetime, before_id: int, page_size: int) -> AsyncIterator[models.Task]:
+        result = await self._conn.stream(sqlalchemy.text(GET_TASKS_PAGE_BY_USERNAME), {
+            "p1": username,
+            "p2": before_created_at,
+            "p3": before_id,
+            "p4": page_size,
+        })
+        async for row in result:
+            yield models.Task(
+                id=row[0],
+                description=row[1],
+                created_at=row[2],
+                expected_finished_at=row[3],
+                state=row[4],
+                person_id=row[5],
+                category_id=row[6],
+                updated_at=row[7],
+            )
+
+    async def get_tasks_page_by_username_and_category_id(self, arg: GetTasksPageByUsernameAndCategoryIdParams) -> AsyncIterator[models.Task]:
+        result = await self._conn.stream(sqlalchemy.text(GET_TASKS_PAGE_BY_USERNAME_AND_CATEGORY_ID), {
+            "p1": arg.username,
+            "p2": arg.category_id,
+            "p3": arg.before_created_at,
+            "p4": arg.before_id,
+            "p5": arg.page_size,
+        })
+        async for row in result:
+            yield models.Task(
+                id=row[0],
+                description=row[1],
+                created_at=row[2],
+                expected_finished_at=row[3],
+                state=row[4],
+                person_id=row[5],
+                category_id=row[6],
+                updated_at=row[7],
+            )
+
+    async def search_tasks_by_username(self, arg: SearchTasksByUsernameParams) -> AsyncIterator[SearchTasksByUsernameRow]:
+        result = await self._conn.stream(sqlalchemy.text(SEARCH_TASKS_BY_USERNAME), {
+            "p1": arg.username,
+            "p2": arg.query,
+            "p3": arg.before_rank,
+            "p4": arg.before_id,
+            "p5": arg.page_size,
+        })
+        async for row in result:
+            yield SearchTasksByUsernameRow(
+                id=row[0],
+                description=row[1],
+                created_at=row[2],
+                expected_finished_at=row[3],
+                state=row[4],
+                person_id=row[5],
+                category_id=row[6],
+                updated_at=row[7],
+                rank=row[8],
+                snippet=row[9],
             )
 
     async def update_task(self, arg: UpdateTaskParams) -> Optional[models.Task]:
@@ -251,4 +790,5 @@ class AsyncQuerier:
             state=row[4],
             person_id=row[5],
             category_id=row[6],
+            updated_at=row[7],
         )
@@ -2,7 +2,7 @@
 # versions:
 #   sqlc v1.27.0
 # source: users.sql
-from typing import Optional
+from typing import AsyncIterator, Iterator, Optional
 
 import sqlalchemy
 import sqlalchemy.ext.asyncio
@@ -10,6 +10,13 @@ import sqlalchemy.ext.asyncio
 from models import models
 
 
+COUNT_IMAGE_PATH_REFERENCES = """-- name: count_image_path_references \\:one
+SELECT count(*)
+FROM persons
+WHERE image_path = :p1
+"""
+
+
 CREATE_USER = """-- name: create_user \\:one
 INSERT INTO persons (username, email, password_hash)
 VALUES (:p1, :p2, :p3)
@@ -17,6 +24,13 @@ RETURNING id, username, email, password_hash, image_path
 """
 
 
+GET_IMAGE_PATHS = """-- name: get_image_paths \\:many
+SELECT DISTINCT image_path
+FROM persons
+WHERE image_path IS NOT NULL
+"""
+
+
 GET_PASSWORD_HASH = """-- name: get_password_hash \\:one
 SELECT password_hash
 FROM persons
@@ -31,6 +45,13 @@ WHERE username = :p1
 """
 
 
+REPLACE_IMAGE_PATH = """-- name: replace_image_path \\:exec
+UPDATE persons
+SET image_path = :p1
+WHERE image_path = :p2
+"""
+
+
 SAVE_IMAGE_PATH = """-- name: save_image_path \\:exec
 
 UPDATE persons
@@ -43,6 +64,12 @@ class Querier:
     def __init__(self, conn: sqlalchemy.engine.Connection):
         self._conn = conn
 
+    def count_image_path_references(self, *, image_path: Optional[str]) -> Optional[int]:
+        row = self._conn.execute(sqlalchemy.text(COUNT_IMAGE_PATH_REFERENCES), {"p1": image_path}).first()
+        if row is None:
+            return None
+        return row[0]
+
     def create_user(self, *, username: str, email: str, password_hash: str) -> Optional[models.Person]:
         row = self._conn.execute(sqlalchemy.text(CREATE_USER), {"p1": username, "p2": email, "p3": password_hash}).first()
         if row is None:
@@ -55,6 +82,11 @@ class Querier:
             image_path=row[4],
         )
 
+    def get_image_paths(self) -> Iterator[Optional[str]]:
+        result = self._conn.execute(sqlalchemy.text(GET_IMAGE_PATHS))
+        for row in result:
+            yield row[0]
+
     def get_password_hash(self, *, username: str) -> Optional[str]:
         row = self._conn.execute(sqlalchemy.text(GET_PASSWORD_HASH), {"p1": username}).first()
         if row is None:
@@ -73,6 +105,9 @@ class Querier:
             image_path=row[4],
         )
 
+    def replace_image_path(self, *, image_path: Optional[str], image_path_2: Optional[str]) -> None:
+        self._conn.execute(sqlalchemy.text(REPLACE_IMAGE_PATH), {"p1": image_path, "p2": image_path_2})
+
     def save_image_path(self, *, image_path: Optional[str], username: str) -> None:
         self._conn.execute(sqlalchemy.text(SAVE_IMAGE_PATH), {"p1": image_path, "p2": username})
 
@@ -81,6 +116,12 @@ class AsyncQuerier:
     def __init__(self, conn: sqlalchemy.ext.asyncio.AsyncConnection):
         self._conn = conn
 
+    async def count_image_path_references(self, *, image_path: Optional[str]) -> Optional[int]:
+        row = (await self._conn.execute(sqlalchemy.text(COUNT_IMAGE_PATH_REFERENCES), {"p1": image_path})).first()
+        if row is None:
+            return None
+        return row[0]
+
     async def create_user(self, *, username: str, email: str, password_hash: str) -> Optional[models.Person]:
         row = (await self._conn.execute(sqlalchemy.text(CREATE_USER), {"p1": username, "p2": email, "p3": password_hash})).first()
         if row is None:
@@ -93,6 +134,11 @@ class AsyncQuerier:
             image_path=row[4],
         )
 
+    async def get_image_paths(self) -> AsyncIterator[Optional[str]]:
+        result = await self._conn.stream(sqlalchemy.text(GET_IMAGE_PATHS))
+        async for row in result:
+            yield row[0]
+
     async def get_password_hash(self, *, username: str) -> Optional[str]:
         row = (await self._conn.execute(sqlalchemy.text(GET_PASSWORD_HASH), {"p1": username})).first()
         if row is None:
@@ -111,5 +157,8 @@ class AsyncQuerier:
             image_path=row[4],
         )
 
+    async def replace_image_path(self, *, image_path: Optional[str], image_path_2: Optional[str]) -> None:
+        await self._conn.execute(sqlalchemy.text(REPLACE_IMAGE_PATH), {"p1": image_path, "p2": image_path_2})
+
     async def save_image_path(self, *, image_path: Optional[str], username: str) -> None:
         await self._conn.execute(sqlalchemy.text(SAVE_IMAGE_PATH), {"p1": image_path, "p2": username})